@@ -1,9 +1,19 @@
 """Decribe admin panel settings."""
+from collections import defaultdict
+from itertools import chain
+
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.db import transaction
 
+from recipes.documents import refresh_documents, refresh_related_documents
+from recipes.facets import invalidate_facets
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag, TagRecipe)
+                            RecipeRanking, ShoppingCart, Tag, TagRecipe)
+from recipes.pantry import invalidate_pantry_index
+from recipes.ranking import record_removals
+from recipes.shopping_list import (add_recipe_to_carts, add_recipes,
+                                   remove_recipe_from_carts, remove_recipes)
 from users.models import Follow
 
 User = get_user_model()
@@ -24,6 +34,41 @@ class UserAdmin(admin.ModelAdmin):
     list_filter = ('email', 'username')
     empty_value_display = '-empty-'
 
+    def save_model(self, request, obj, form, change):
+        """Refresh documents of recipes of a changed author."""
+        super().save_model(request, obj, form, change)
+        if change:
+            refresh_related_documents(author=obj)
+
+    def delete_model(self, request, obj):
+        """Drop recipes of a deleted user from carts and cached facets."""
+        self.delete_queryset(request, User.objects.filter(pk=obj.pk))
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        """Drop recipes of deleted users from carts and cached facets.
+
+        Rankings of recipes which lose their favorites and cart additions
+        are queued for recomputing.
+        """
+        for recipe_id in Recipe.objects.filter(
+            author__in=queryset,
+        ).values_list('pk', flat=True):
+            remove_recipe_from_carts(recipe_id)
+        record_removals(
+            chain(
+                Recipe.objects.filter(
+                    favorited_by__user__in=queryset,
+                ).values_list('pk', flat=True),
+                Recipe.objects.filter(
+                    added_to_cart__user__in=queryset,
+                ).values_list('pk', flat=True),
+            ),
+        )
+        super().delete_queryset(request, queryset)
+        invalidate_facets()
+        invalidate_pantry_index()
+
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
@@ -36,6 +81,7 @@ class FollowAdmin(admin.ModelAdmin):
         'following_username',
         'following_email',
     )
+    ordering = ('follower',)
     search_fields = (
         'follower__username',
         'follower__email',
@@ -72,6 +118,7 @@ class Favorite(admin.ModelAdmin):
         'email',
         'tags',
     )
+    ordering = ('user', 'favorite_recipe')
     search_fields = ('user__username', 'user__email', 'favorite_recipe__name')
     list_filter = ('favorite_recipe__tags',)
     empty_value_display = '-empty-'
@@ -88,6 +135,25 @@ class Favorite(admin.ModelAdmin):
         """Collect all tags and return a string of them."""
         return ' | '.join([tag.name for tag in obj.favorite_recipe.tags.all()])
 
+    def save_model(self, request, obj, form, change):
+        """Queue rankings of both recipes of a changed favorite."""
+        super().save_model(request, obj, form, change)
+        if change:
+            record_removals(
+                (form.initial['favorite_recipe'], obj.favorite_recipe_id),
+            )
+
+    def delete_model(self, request, obj):
+        """Queue a ranking of a recipe of a deleted favorite."""
+        self.delete_queryset(request, self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Queue rankings of recipes of deleted favorites."""
+        record_removals(
+            queryset.values_list('favorite_recipe_id', flat=True),
+        )
+        super().delete_queryset(request, queryset)
+
 
 class IngredientRecipeInline(admin.TabularInline):
     """Creates interface for ingredients in RecipeAdmin."""
@@ -124,6 +190,35 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('tags',)
     empty_value_display = '-empty-'
 
+    def save_related(self, request, form, formsets, change):
+        """Refresh denormalized tag slugs after inlines are saved.
+
+        Ingredients of a recipe in carts are replaced in shopping lists, a
+        new recipe gets a zero ranking.
+        """
+        if not change:
+            RecipeRanking.objects.create(recipe=form.instance)
+        remove_recipe_from_carts(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        add_recipe_to_carts(form.instance.pk)
+        Recipe.objects.filter(pk=form.instance.pk).sync_tag_slugs()
+        refresh_documents((form.instance.pk,))
+        invalidate_facets()
+        invalidate_pantry_index()
+
+    def delete_model(self, request, obj):
+        """Drop a deleted recipe from carts and cached facets."""
+        self.delete_queryset(request, Recipe.objects.filter(pk=obj.pk))
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        """Drop deleted recipes from carts and cached facets."""
+        for recipe_id in queryset.values_list('pk', flat=True):
+            remove_recipe_from_carts(recipe_id)
+        super().delete_queryset(request, queryset)
+        invalidate_facets()
+        invalidate_pantry_index()
+
     def added_to_favorites(self, obj):
         """Calculate how many users added a recipe to favorites."""
         return obj.favorited_by.count()
@@ -139,7 +234,13 @@ class RecipeAdmin(admin.ModelAdmin):
     def ingredient_list(self, obj):
         """Collect all ingredients and return a string of them."""
         return ' | '.join(
-            [ingredient.name for ingredient in obj.ingredients.all()],
+            [
+                ingredient.name
+                for ingredient in obj.ingredients.order_by(
+                    'name',
+                    'measurement_unit',
+                )
+            ],
         )
 
     def tag_list(self, obj):
@@ -163,6 +264,32 @@ class TagAdmin(admin.ModelAdmin):
     list_filter = ('color',)
     empty_value_display = '-empty-'
 
+    def save_model(self, request, obj, form, change):
+        """Refresh denormalized tag slugs, documents and facets."""
+        super().save_model(request, obj, form, change)
+        if change and 'slug' in form.changed_data:
+            Recipe.objects.filter(tags=obj).sync_tag_slugs()
+        if change:
+            refresh_related_documents(tags=obj)
+        invalidate_facets()
+
+    def delete_model(self, request, obj):
+        """Refresh denormalized tag slugs of recipes with a deleted tag."""
+        self.delete_queryset(request, Tag.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Refresh tag slugs, documents and facets of recipes of tags."""
+        recipe_ids = list(
+            Recipe.objects.filter(tags__in=queryset).values_list(
+                'pk',
+                flat=True,
+            ),
+        )
+        super().delete_queryset(request, queryset)
+        Recipe.objects.filter(pk__in=recipe_ids).sync_tag_slugs()
+        refresh_documents(recipe_ids)
+        invalidate_facets()
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -173,10 +300,43 @@ class IngredientAdmin(admin.ModelAdmin):
         'name',
         'measurement_unit',
     )
+    ordering = ('name', 'measurement_unit')
     search_fields = list_display
     list_filter = ('measurement_unit',)
     empty_value_display = '-empty-'
 
+    def save_model(self, request, obj, form, change):
+        """Refresh documents and facets of recipes with an ingredient."""
+        super().save_model(request, obj, form, change)
+        if change:
+            refresh_related_documents(ingredients=obj)
+            invalidate_facets()
+
+    def delete_model(self, request, obj):
+        """Refresh documents of recipes with a deleted ingredient."""
+        self.delete_queryset(request, Ingredient.objects.filter(pk=obj.pk))
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        """Refresh documents and facets of recipes with deleted ingredients.
+
+        Ingredients of those recipes are replaced in shopping lists.
+        """
+        recipe_ids = list(
+            Recipe.objects.filter(ingredients__in=queryset).values_list(
+                'pk',
+                flat=True,
+            ).distinct(),
+        )
+        for recipe_id in recipe_ids:
+            remove_recipe_from_carts(recipe_id)
+        super().delete_queryset(request, queryset)
+        for recipe_id in recipe_ids:
+            add_recipe_to_carts(recipe_id)
+        refresh_documents(recipe_ids)
+        invalidate_facets()
+        invalidate_pantry_index()
+
 
 @admin.register(IngredientRecipe)
 class IngredientRecipeAdmin(admin.ModelAdmin):
@@ -200,6 +360,46 @@ class IngredientRecipeAdmin(admin.ModelAdmin):
     list_filter = ('recipe__tags',)
     empty_value_display = '-empty-'
 
+    def save_model(self, request, obj, form, change):
+        """Refresh documents and facets of recipes with a changed ingredient.
+
+        An ingredient moved to another recipe leaves its previous recipe.
+        Ingredients of both recipes are replaced in shopping lists.
+        """
+        recipe_ids = [obj.recipe_id]
+        if change and 'recipe' in form.changed_data:
+            recipe_ids.append(form.initial['recipe'])
+        for recipe_id in recipe_ids:
+            remove_recipe_from_carts(recipe_id)
+        super().save_model(request, obj, form, change)
+        for recipe_id in recipe_ids:
+            add_recipe_to_carts(recipe_id)
+        refresh_documents(recipe_ids)
+        invalidate_facets()
+        invalidate_pantry_index()
+
+    def delete_model(self, request, obj):
+        """Refresh a document of a recipe with a deleted ingredient."""
+        self.delete_queryset(
+            request,
+            IngredientRecipe.objects.filter(pk=obj.pk),
+        )
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        """Refresh documents and facets of recipes with deleted ingredients."""
+        recipe_ids = list(
+            queryset.values_list('recipe_id', flat=True).distinct(),
+        )
+        for recipe_id in recipe_ids:
+            remove_recipe_from_carts(recipe_id)
+        super().delete_queryset(request, queryset)
+        for recipe_id in recipe_ids:
+            add_recipe_to_carts(recipe_id)
+        refresh_documents(recipe_ids)
+        invalidate_facets()
+        invalidate_pantry_index()
+
     def username(self, obj):
         """Represent a username field from User model."""
         return obj.recipe.author.username
@@ -224,10 +424,49 @@ class ShoppingCart(admin.ModelAdmin):
         'email',
         'tags',
     )
+    ordering = ('user', 'recipe_in_cart')
     search_fields = ('user__username', 'user__email', 'recipe_in_cart__name')
     list_filter = ('recipe_in_cart__tags',)
     empty_value_display = '-empty-'
 
+    def save_model(self, request, obj, form, change):
+        """Move ingredients of a changed cart row between shopping lists.
+
+        Rankings of both recipes of a changed row are queued.
+        """
+        if change:
+            remove_recipes(
+                form.initial['user'],
+                (form.initial['recipe_in_cart'],),
+            )
+        super().save_model(request, obj, form, change)
+        add_recipes(obj.user_id, (obj.recipe_in_cart_id,))
+        if change:
+            record_removals(
+                (form.initial['recipe_in_cart'], obj.recipe_in_cart_id),
+            )
+
+    def delete_model(self, request, obj):
+        """Subtract ingredients of a deleted cart row from a list."""
+        self.delete_queryset(request, self.model.objects.filter(pk=obj.pk))
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        """Subtract ingredients of deleted cart rows from shopping lists.
+
+        Rankings of their recipes are queued for recomputing.
+        """
+        carts = defaultdict(list)
+        for user_id, recipe_id in queryset.values_list(
+            'user_id',
+            'recipe_in_cart_id',
+        ):
+            carts[user_id].append(recipe_id)
+        super().delete_queryset(request, queryset)
+        for user_id, recipe_ids in carts.items():
+            remove_recipes(user_id, recipe_ids)
+        record_removals(chain.from_iterable(carts.values()))
+
     def username(self, obj):
         """Represent a username field from User model."""
         return obj.user.username
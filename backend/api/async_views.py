@@ -0,0 +1,174 @@
+"""Describe async variants of read-heavy views for an ASGI deployment."""
+import asyncio
+from weakref import WeakKeyDictionary
+
+from adrf.views import APIView
+from adrf.viewsets import ViewSetMixin
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from api import views
+from api.constants import HTTPMethods
+from api.fast_serializers import (SubscriptionReadSerializer,
+                                  UserReadSerializer, read_rows,
+                                  requested_row_fields)
+from api.mixins import MultiGetMixin
+from foodgram.settings import ASYNC_DB_CONCURRENCY
+
+User = get_user_model()
+
+database_slots = WeakKeyDictionary()
+
+
+def get_database_slots():
+    """Return a semaphore limiting requests of an event loop to a database.
+
+    Every request in progress holds a connection of its thread, so
+    requests over the limit wait in the loop instead of connecting.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in database_slots:
+        database_slots[loop] = asyncio.Semaphore(ASYNC_DB_CONCURRENCY)
+    return database_slots[loop]
+
+
+async def serializer_data(serializer):
+    """Render serializer data in a thread, fields may query a database."""
+    return await sync_to_async(lambda: serializer.data)()
+
+
+class AsyncReadMixin(ViewSetMixin, APIView):
+    """Serve list and retrieve actions of a viewset as coroutines.
+
+    Objects are fetched with the async ORM, filtering and serialization
+    run in a thread of a request. Other actions stay synchronous and are
+    run in a thread by adrf.
+    """
+
+    view_is_async = True
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        """Dispatch a request holding one of database slots of a worker."""
+        async with get_database_slots():
+            return await super().async_dispatch(request, *args, **kwargs)
+
+    async def afilter_queryset(self):
+        """Filter a queryset in a thread, filters may validate by queries."""
+        return await sync_to_async(self.filter_queryset)(self.get_queryset())
+
+    async def apaginate_queryset(self, queryset):
+        """Return a page of objects or None if pagination is disabled."""
+        if self.paginator is None:
+            return None
+        if hasattr(self.paginator, 'apaginate_queryset'):
+            return await self.paginator.apaginate_queryset(
+                queryset,
+                self.request,
+                view=self,
+            )
+        return await sync_to_async(self.paginate_queryset)(queryset)
+
+    async def aget_object(self):
+        """Retrieve an object by a lookup from an url with the async ORM."""
+        queryset = await self.afilter_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+            )
+        except (
+            queryset.model.DoesNotExist,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ):
+            raise Http404
+        await sync_to_async(self.check_object_permissions)(
+            self.request,
+            instance,
+        )
+        return instance
+
+    async def list(self, request, *args, **kwargs):
+        """Return a page of filtered objects or objects by their ids."""
+        if isinstance(self, MultiGetMixin) and 'ids' in request.query_params:
+            return await sync_to_async(self.multi_get)(request)
+        queryset = await self.afilter_queryset()
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(
+                await serializer_data(serializer),
+            )
+        serializer = self.get_serializer(
+            [instance async for instance in queryset],
+            many=True,
+        )
+        return Response(await serializer_data(serializer))
+
+    async def retrieve(self, request, *args, **kwargs):
+        """Return a single object."""
+        serializer = self.get_serializer(await self.aget_object())
+        return Response(await serializer_data(serializer))
+
+
+class TagViewSet(AsyncReadMixin, views.TagViewSet):
+    """Perform list and retrieve operations for a Tag model as coroutines."""
+
+    pass
+
+
+class IngredientViewSet(AsyncReadMixin, views.IngredientViewSet):
+    """Perform list and retrieve operations for an Ingredient model."""
+
+    pass
+
+
+class RecipeViewSet(AsyncReadMixin, views.RecipeViewSet):
+    """Perform CRUD operations for a Recipe model with async reads."""
+
+    pass
+
+
+class UserViewSet(AsyncReadMixin, views.UserViewSet):
+    """Perform CRUD operations for User model with async reads."""
+
+    @action(
+        (HTTPMethods.GET,),
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    async def me(self, request):
+        """Process './me' endpoint."""
+        serializer = UserReadSerializer(
+            request.user, context={'request': request},
+        )
+        return Response(
+            await serializer_data(serializer),
+            status=status.HTTP_200_OK,
+        )
+
+    @action(
+        (HTTPMethods.GET,),
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    async def subscriptions(self, request):
+        """Process './subscriptions' endpoint."""
+        page = await self.apaginate_queryset(
+            read_rows(
+                User.objects.filter(followings__follower=request.user),
+                requested_row_fields(SubscriptionReadSerializer, request),
+            ),
+        )
+        serializer = SubscriptionReadSerializer(
+            page,
+            many=True,
+            context={'request': request},
+        )
+        return self.get_paginated_response(await serializer_data(serializer))
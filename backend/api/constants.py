@@ -12,6 +12,17 @@ class HTTPMethods:
     PATCH = 'patch'
 
 
+class BatchStatus:
+    """Contain per object results of batch requests."""
+
+    ADDED = 'added'
+    ALREADY_EXISTS = 'exists'
+    DELETED = 'deleted'
+    NOTHING_TO_DELETE = 'missing'
+    NOT_FOUND = 'not_found'
+    FORBIDDEN = 'forbidden'
+
+
 class ErrorMessage:
     """Contain errors prompts."""
 
@@ -31,6 +42,7 @@ class ErrorMessage:
         f'or greater than {MAXIMUM_COOKING_TIME}).'
     )
     INGREDIENT_IS_NEED = 'At least one ingredient is needed.'
+    UNKNOWN_FIELDS = 'Unknown fields: {}.'
     MORE_THAN_ONE_INGREDIENT = (
         'Only one ingredient of exact type should be used'
     )
@@ -0,0 +1,570 @@
+"""Describe fast read serializers building representations from rows.
+
+They return the same data as read serializers of api.serializers, but
+read values() rows instead of model instances and fetch relations of a
+whole page with a query per relation instead of queries per object.
+Field maps are computed once, representations are plain dicts. Fast
+serializers are used when FAST_READ_SERIALIZERS is enabled.
+
+Recipe and user serializers return only fields named by a `fields`
+query parameter like read serializers of api.serializers. Requested
+relations are ids unless they are named by an `expand` parameter too,
+and rows, relations and viewer flags which are not returned are never
+queried. With RECIPE_DOCUMENTS recipes are read
+from their precomputed documents on PostgreSQL.
+"""
+from collections import defaultdict
+from functools import cached_property, reduce
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from api.serializers import (FavoriteRecipeSerializer, GetRecipeSerializer,
+                             GetUserSerializer, SubscriptionSerializer,
+                             requested_fields)
+from foodgram.settings import FAST_READ_SERIALIZERS, RECIPE_DOCUMENTS
+from perf.telemetry import span
+from recipes.documents import DOCUMENTS
+from recipes.models import (Favorite, IngredientRecipe, Recipe, ShoppingCart,
+                            TagRecipe)
+from users.models import Follow
+
+USER_ROW_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+RECIPE_ROW_FIELDS = (
+    'id',
+    'name',
+    'image',
+    'description',
+    'cooking_time',
+    'author_id',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+)
+FAVORITE_ROW_FIELDS = ('id', 'name', 'image', 'cooking_time')
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit', 'amount')
+AUTHOR_FIELDS = (
+    ('email', 'author__email'),
+    ('id', 'author_id'),
+    ('username', 'author__username'),
+    ('first_name', 'author__first_name'),
+    ('last_name', 'author__last_name'),
+)
+
+RECIPE_COLUMNS = (
+    ('name', 'name'),
+    ('image', 'image'),
+    ('text', 'description'),
+    ('cooking_time', 'cooking_time'),
+)
+RECIPE_COLUMNS_MAP = dict(RECIPE_COLUMNS)
+DOCUMENT_ROW_FIELD = 'document__data'
+
+image_storage = Recipe._meta.get_field('image').storage
+
+
+def row_value(instance, key):
+    """Read a field of a values() row key from a model instance."""
+    return reduce(getattr, key.split('__'), instance)
+
+
+def image_url(image, request):
+    """Return an image url like an ImageField of a serializer."""
+    name = getattr(image, 'name', image)
+    if not name:
+        return None
+    url = image_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+class FastSerializer:
+    """Represent rows or model instances with a serializer interface."""
+
+    row_fields = ()
+    output_fields = ()
+    expandable_fields = ()
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        """Remember objects and a context like a read serializer."""
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Return requested output fields and expanded relations."""
+        if not cls.output_fields:
+            return (), frozenset()
+        return requested_fields(
+            request,
+            cls.output_fields,
+            cls.expandable_fields,
+        )
+
+    @classmethod
+    def requested_row_fields(cls, request):
+        """Return values() fields of rows needed by requested fields."""
+        return cls.row_fields
+
+    @property
+    def request(self):
+        """Return a request of a context."""
+        return self.context.get('request')
+
+    @cached_property
+    def fieldset(self):
+        """Return output fields and expanded relations of a request."""
+        return self.requested_fields(self.request)
+
+    @property
+    def viewer(self):
+        """Return an authenticated user of a request or None."""
+        request = self.request
+        if request is None or not request.user.is_authenticated:
+            return None
+        return request.user
+
+    def as_row(self, instance):
+        """Convert a model instance to a values() row."""
+        if isinstance(instance, dict):
+            return instance
+        return {key: row_value(instance, key) for key in self.row_fields}
+
+    def represent(self, rows):
+        """Return representations of rows."""
+        raise NotImplementedError
+
+    @property
+    def data(self):
+        """Represent objects inside a serializer span."""
+        objects = list(self.instance) if self.many else [self.instance]
+        with span('serializer'):
+            data = self.represent([self.as_row(obj) for obj in objects])
+        return data if self.many else data[0]
+
+
+class FastFavoriteRecipeSerializer(FastSerializer):
+    """Represent short recipes like FavoriteRecipeSerializer."""
+
+    row_fields = FAVORITE_ROW_FIELDS
+
+    def represent(self, rows):
+        """Return short representations of recipes."""
+        request = self.request
+        return [
+            {
+                'id': row['id'],
+                'name': row['name'],
+                'image': image_url(row['image'], request),
+                'cooking_time': row['cooking_time'],
+            }
+            for row in rows
+        ]
+
+
+class FastUserSerializer(FastSerializer):
+    """Represent users like GetUserSerializer."""
+
+    row_fields = USER_ROW_FIELDS
+    output_fields = (*USER_ROW_FIELDS, 'is_subscribed')
+
+    @classmethod
+    def requested_row_fields(cls, request):
+        """Return id and requested columns of users."""
+        fields, _ = cls.requested_fields(request)
+        return (
+            'id',
+            *(
+                field for field in USER_ROW_FIELDS
+                if field != 'id' and field in fields
+            ),
+        )
+
+    def followed_ids(self, user_ids):
+        """Return ids of users followed by a viewer."""
+        viewer = self.viewer
+        if viewer is None or not user_ids:
+            return set()
+        return set(
+            Follow.objects.filter(
+                follower=viewer,
+                following_id__in=user_ids,
+            ).values_list('following_id', flat=True),
+        )
+
+    def represent(self, rows):
+        """Return representations of users with subscription flags."""
+        fields, _ = self.fieldset
+        columns = [field for field in USER_ROW_FIELDS if field in fields]
+        followed = (
+            self.followed_ids([row['id'] for row in rows])
+            if 'is_subscribed' in fields else set()
+        )
+        representations = []
+        for row in rows:
+            user = {field: row[field] for field in columns}
+            if 'is_subscribed' in fields:
+                user['is_subscribed'] = row['id'] in followed
+            representations.append(user)
+        return representations
+
+
+class FastSubscriptionSerializer(FastUserSerializer):
+    """Represent followed authors like SubscriptionSerializer."""
+
+    output_fields = (
+        *FastUserSerializer.output_fields,
+        'recipes',
+        'recipes_count',
+    )
+    expandable_fields = ('recipes',)
+
+    def recipes_limit(self):
+        """Parse an amount of shown recipes of every author."""
+        limit = self.request.query_params.get('recipes_limit')
+        return int(limit) if limit and limit.isdigit() else 1
+
+    def latest_recipes(self, author_ids, limit, expand=True):
+        """Return up to a limit of latest recipes or their ids by authors."""
+        recipes = defaultdict(list)
+        if not author_ids or not limit:
+            return recipes
+        rows = Recipe.objects.filter(author_id__in=author_ids).annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=Recipe._meta.ordering,
+            ),
+        ).filter(position__lte=limit)
+        if not expand:
+            for author_id, recipe_id in rows.values_list('author_id', 'id'):
+                recipes[author_id].append(recipe_id)
+            return recipes
+        rows = list(rows.values('author_id', *FAVORITE_ROW_FIELDS))
+        for row, recipe in zip(
+            rows,
+            FastFavoriteRecipeSerializer().represent(rows),
+        ):
+            recipes[row['author_id']].append(recipe)
+        return recipes
+
+    def represent(self, rows):
+        """Return authors with their latest recipes and recipe counts.
+
+        Without a request authors are not subscribed and have no recipes,
+        like in SubscriptionSerializer.
+        """
+        fields, expanded = self.fieldset
+        author_ids = [row['id'] for row in rows]
+        recipes = None
+        if self.request is not None and 'recipes' in fields:
+            recipes = self.latest_recipes(
+                author_ids,
+                self.recipes_limit(),
+                'recipes' in expanded,
+            )
+        counts = dict(
+            Recipe.objects.filter(author_id__in=author_ids).values(
+                'author_id',
+            ).annotate(count=Count('id')).order_by().values_list(
+                'author_id',
+                'count',
+            ),
+        ) if author_ids and 'recipes_count' in fields else {}
+        representations = super().represent(rows)
+        for row, author in zip(rows, representations):
+            if 'recipes' in fields:
+                author['recipes'] = (
+                    recipes[row['id']] if recipes is not None else None
+                )
+            if 'recipes_count' in fields:
+                author['recipes_count'] = counts.get(row['id'], 0)
+        return representations
+
+
+class FastRecipeSerializer(FastSerializer):
+    """Represent recipes like GetRecipeSerializer."""
+
+    row_fields = RECIPE_ROW_FIELDS
+    output_fields = (
+        'id',
+        'tags',
+        'author',
+        'ingredients',
+        'is_favorited',
+        'is_in_shopping_cart',
+        'name',
+        'image',
+        'text',
+        'cooking_time',
+    )
+    expandable_fields = ('tags', 'author')
+
+    @classmethod
+    def requested_row_fields(cls, request):
+        """Return id and columns of recipes needed by requested fields.
+
+        Only an expanded author joins users, an author id is enough
+        otherwise.
+        """
+        fields, expanded = cls.requested_fields(request)
+        row_fields = ['id']
+        row_fields.extend(
+            column for field, column in RECIPE_COLUMNS if field in fields
+        )
+        if 'author' in fields and 'author' in expanded:
+            row_fields.extend(key for _, key in AUTHOR_FIELDS)
+        elif 'author' in fields:
+            row_fields.append('author_id')
+        return tuple(row_fields)
+
+    def viewer_recipe_ids(self, relation_model, recipe_field, recipe_ids):
+        """Return ids of recipes related to a viewer by a relation model."""
+        viewer = self.viewer
+        if viewer is None:
+            return set()
+        return set(
+            relation_model.objects.filter(
+                user=viewer,
+                **{f'{recipe_field}_id__in': recipe_ids},
+            ).values_list(f'{recipe_field}_id', flat=True),
+        )
+
+    def tags(self, recipe_ids, expand=True):
+        """Return tags or tag ids of recipes ordered by tag names."""
+        tags = defaultdict(list)
+        relations = TagRecipe.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).order_by('tag__name')
+        if not expand:
+            for recipe_id, tag_id in relations.values_list(
+                'recipe_id',
+                'tag_id',
+            ):
+                tags[recipe_id].append(tag_id)
+            return tags
+        for recipe_id, *tag in relations.values_list(
+            'recipe_id',
+            'tag_id',
+            'tag__name',
+            'tag__color',
+            'tag__slug',
+        ):
+            tags[recipe_id].append(dict(zip(TAG_FIELDS, tag)))
+        return tags
+
+    def ingredients(self, recipe_ids):
+        """Return ingredients of recipes ordered by names and units."""
+        ingredients = defaultdict(list)
+        for recipe_id, *ingredient in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).order_by(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+        ).values_list(
+            'recipe_id',
+            'ingredient_id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'quantity',
+        ):
+            ingredients[recipe_id].append(
+                dict(zip(INGREDIENT_FIELDS, ingredient)),
+            )
+        return ingredients
+
+    def represent(self, rows):
+        """Return recipes with tags, ingredients, authors and viewer flags.
+
+        Tags are ordered by names like the Tag model, ingredients are
+        ordered by names and measurement units like GetRecipeSerializer.
+        """
+        if not rows:
+            return []
+        fields, expanded = self.fieldset
+        recipe_ids = [row['id'] for row in rows]
+        tags = (
+            self.tags(recipe_ids, 'tags' in expanded)
+            if 'tags' in fields else None
+        )
+        ingredients = (
+            self.ingredients(recipe_ids) if 'ingredients' in fields else None
+        )
+        expand_author = 'author' in fields and 'author' in expanded
+        followed = FastUserSerializer(context=self.context).followed_ids(
+            list({row['author_id'] for row in rows}),
+        ) if expand_author else set()
+        favorited = self.viewer_recipe_ids(
+            Favorite,
+            'favorite_recipe',
+            recipe_ids,
+        ) if 'is_favorited' in fields else set()
+        in_cart = self.viewer_recipe_ids(
+            ShoppingCart,
+            'recipe_in_cart',
+            recipe_ids,
+        ) if 'is_in_shopping_cart' in fields else set()
+        request = self.request
+        representations = []
+        for row in rows:
+            recipe = {}
+            for field in fields:
+                if field == 'id':
+                    recipe['id'] = row['id']
+                elif field == 'tags':
+                    recipe['tags'] = tags[row['id']]
+                elif field == 'author':
+                    recipe['author'] = {
+                        **{name: row[key] for name, key in AUTHOR_FIELDS},
+                        'is_subscribed': row['author_id'] in followed,
+                    } if expand_author else row['author_id']
+                elif field == 'ingredients':
+                    recipe['ingredients'] = ingredients[row['id']]
+                elif field == 'is_favorited':
+                    recipe['is_favorited'] = row['id'] in favorited
+                elif field == 'is_in_shopping_cart':
+                    recipe['is_in_shopping_cart'] = row['id'] in in_cart
+                elif field == 'image':
+                    recipe['image'] = image_url(row['image'], request)
+                else:
+                    recipe[field] = row[RECIPE_COLUMNS_MAP[field]]
+            representations.append(recipe)
+        return representations
+
+
+class DocumentRecipeSerializer(FastRecipeSerializer):
+    """Represent recipes from their denormalized documents.
+
+    A recipe is read with its document in one row, only viewer flags are
+    queried. Recipes without documents are represented from relations.
+    Requests which need neither tags, ingredients nor an expanded author
+    read columns of recipes instead of whole documents.
+    """
+
+    @staticmethod
+    def needs_document(fields, expanded):
+        """Check if requested fields are read from relations of recipes."""
+        return (
+            'tags' in fields
+            or 'ingredients' in fields
+            or ('author' in fields and 'author' in expanded)
+        )
+
+    @classmethod
+    def requested_row_fields(cls, request):
+        """Return id and a document or columns of recipes."""
+        fields, expanded = cls.requested_fields(request)
+        if cls.needs_document(fields, expanded):
+            return ('id', DOCUMENT_ROW_FIELD)
+        return super().requested_row_fields(request)
+
+    def represent_missing(self, recipe_ids):
+        """Return representations of recipes without documents by ids."""
+        rows = list(
+            Recipe.objects.filter(pk__in=recipe_ids).values(
+                *super().requested_row_fields(self.request),
+            ),
+        )
+        return {
+            row['id']: recipe
+            for row, recipe in zip(rows, super().represent(rows))
+        }
+
+    def represent(self, rows):
+        """Return recipes from documents with viewer flags."""
+        if not rows or DOCUMENT_ROW_FIELD not in rows[0]:
+            return super().represent(rows)
+        fields, expanded = self.fieldset
+        missing = self.represent_missing(
+            [row['id'] for row in rows if row[DOCUMENT_ROW_FIELD] is None],
+        )
+        documents = [
+            row[DOCUMENT_ROW_FIELD] for row in rows
+            if row[DOCUMENT_ROW_FIELD] is not None
+        ]
+        recipe_ids = [document['id'] for document in documents]
+        expand_author = 'author' in fields and 'author' in expanded
+        followed = FastUserSerializer(context=self.context).followed_ids(
+            list({document['author']['id'] for document in documents}),
+        ) if expand_author else set()
+        favorited = self.viewer_recipe_ids(
+            Favorite,
+            'favorite_recipe',
+            recipe_ids,
+        ) if 'is_favorited' in fields else set()
+        in_cart = self.viewer_recipe_ids(
+            ShoppingCart,
+            'recipe_in_cart',
+            recipe_ids,
+        ) if 'is_in_shopping_cart' in fields else set()
+        request = self.request
+        representations = []
+        for row in rows:
+            document = row[DOCUMENT_ROW_FIELD]
+            if document is None:
+                representations.append(missing[row['id']])
+                continue
+            recipe = {}
+            for field in fields:
+                if field == 'tags':
+                    recipe['tags'] = [
+                        {name: tag[name] for name in TAG_FIELDS}
+                        if 'tags' in expanded else tag['id']
+                        for tag in document['tags']
+                    ]
+                elif field == 'author':
+                    author = document['author']
+                    recipe['author'] = {
+                        **{name: author[name] for name, _ in AUTHOR_FIELDS},
+                        'is_subscribed': author['id'] in followed,
+                    } if expand_author else author['id']
+                elif field == 'ingredients':
+                    recipe['ingredients'] = [
+                        {name: ingredient[name] for name in INGREDIENT_FIELDS}
+                        for ingredient in document['ingredients']
+                    ]
+                elif field == 'is_favorited':
+                    recipe['is_favorited'] = document['id'] in favorited
+                elif field == 'is_in_shopping_cart':
+                    recipe['is_in_shopping_cart'] = document['id'] in in_cart
+                elif field == 'image':
+                    recipe['image'] = image_url(document['image'], request)
+                else:
+                    recipe[field] = document[field]
+            representations.append(recipe)
+        return representations
+
+
+def read_rows(queryset, fields):
+    """Return values() rows of a queryset if fast serializers are used."""
+    if FAST_READ_SERIALIZERS:
+        return queryset.values(*fields)
+    return queryset
+
+
+def requested_row_fields(serializer_class, request):
+    """Return values() fields which a read serializer needs for a request.
+
+    Read serializers of api.serializers take whole instances, so no
+    fields are needed for them.
+    """
+    if FAST_READ_SERIALIZERS:
+        return serializer_class.requested_row_fields(request)
+    return ()
+
+
+if FAST_READ_SERIALIZERS:
+    RecipeReadSerializer = (
+        DocumentRecipeSerializer if RECIPE_DOCUMENTS and DOCUMENTS
+        else FastRecipeSerializer
+    )
+    UserReadSerializer = FastUserSerializer
+    SubscriptionReadSerializer = FastSubscriptionSerializer
+    FavoriteReadSerializer = FastFavoriteRecipeSerializer
+else:
+    RecipeReadSerializer = GetRecipeSerializer
+    UserReadSerializer = GetUserSerializer
+    SubscriptionReadSerializer = SubscriptionSerializer
+    FavoriteReadSerializer = FavoriteRecipeSerializer
@@ -1,9 +1,12 @@
 """Describe filters for an Api app."""
 from django.contrib.auth import get_user_model
+from django.db.models import F
 from django_filters import rest_framework as df
 from rest_framework import filters
 
-from recipes.models import Recipe, Tag
+from foodgram.settings import RECIPE_TAG_SLUGS_FILTER
+from recipes.models import TAG_SLUGS, Recipe, Tag
+from recipes.ranking import RANKINGS
 
 User = get_user_model()
 
@@ -15,6 +18,7 @@ class RecipeFilter(df.FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
     )
     author = df.ModelChoiceFilter(
         field_name='author',
@@ -28,6 +32,21 @@ class RecipeFilter(df.FilterSet):
         field_name='added_to_cart__user',
         method='filter_user_lists',
     )
+    ordering = df.CharFilter(method='filter_ordering')
+
+    def filter_tags(self, queryset, name, value):
+        """Filter recipes which have at least one of requested tags.
+
+        Use an overlap with denormalized tag slugs when they are stored
+        and enabled.
+        """
+        if not value:
+            return queryset
+        if TAG_SLUGS and RECIPE_TAG_SLUGS_FILTER:
+            return queryset.filter(
+                tag_slugs__overlap=[tag.slug for tag in value],
+            )
+        return queryset.filter(tags__in=value).distinct()
 
     def filter_user_lists(self, queryset, name, value):
         """Change behavior of a filter.
@@ -38,11 +57,31 @@ class RecipeFilter(df.FilterSet):
             return queryset.filter(**{name: self.request.user})
         return queryset.exclude(**{name: self.request.user})
 
+    def filter_ordering(self, queryset, name, value):
+        """Annotate recipes with a score of a precomputed ranking.
+
+        Recipes are joined with their rankings, which are created along
+        with recipes, and ordered by the raw score column in
+        RankingPagination, so the ranking index serves the order. Unknown
+        rankings are ignored and the default ordering is kept.
+        """
+        if value not in RANKINGS:
+            return queryset
+        return queryset.filter(ranking__isnull=False).annotate(
+            ranking_score=F(f'ranking__{value}'),
+        )
+
     class Meta:
         """Define settings of RecipeFilter."""
 
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'tags',
+            'author',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'ordering',
+        )
 
 
 class IngredientSearchFilter(filters.SearchFilter):
@@ -1,5 +1,11 @@
 """Describe custom mixins for an Api app."""
-from rest_framework import mixins, viewsets
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.response import Response
+
+from api.constants import BatchStatus, ErrorMessage, HTTPMethods
+from api.queries import delete_returning, insert_ignore_conflicts
+from api.serializers import BatchSerializer, MultiGetSerializer
 
 
 class ListCreateRetrieveViewSet(
@@ -11,3 +17,181 @@ class ListCreateRetrieveViewSet(
     """Describe a custom ViewSet for List, Create and Retrieve methods."""
 
     pass
+
+
+class MultiGetMixin:
+    """Describe listing of objects by a list of their ids.
+
+    A list request with an `ids` query parameter returns requested
+    objects in the requested order with one query instead of a page.
+    Filters still apply, ids of absent or filtered out objects are
+    returned as missing.
+    """
+
+    def list(self, request, *args, **kwargs):
+        """Return requested objects or a page of objects."""
+        if 'ids' in request.query_params:
+            return self.multi_get(request)
+        return super().list(request, *args, **kwargs)
+
+    def multi_get(self, request):
+        """Return objects by ids and ids which are not found."""
+        serializer = MultiGetSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        objects = {
+            obj['id'] if isinstance(obj, dict) else obj.pk: obj
+            for obj in self.filter_queryset(self.get_queryset()).filter(
+                pk__in=ids,
+            ).order_by()
+        }
+        serializer = self.get_serializer(
+            [objects[pk] for pk in ids if pk in objects],
+            many=True,
+        )
+        return Response(
+            {
+                'results': serializer.data,
+                'missing': [pk for pk in ids if pk not in objects],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class RelationToggleMixin:
+    """Describe adding and deleting of user - object relations.
+
+    Each relation is added with a single INSERT ... ON CONFLICT DO NOTHING
+    and deleted with a single DELETE, affected rows define the response.
+    """
+
+    def relations_added(self, relation_model, target_ids):
+        """Perform actions after relations with targets are added."""
+        pass
+
+    def relations_deleted(self, relation_model, target_ids):
+        """Perform actions after relations with targets are deleted."""
+        pass
+
+    def toggle_relation(
+        self,
+        request,
+        pk,
+        relation_model,
+        user_field,
+        target_field,
+        target_queryset,
+        serializer_class,
+        already_exists_message,
+    ):
+        """Add a relation on POST request or delete it on DELETE request."""
+        relation = {user_field: request.user.pk, target_field: pk}
+
+        if request.method.lower() == HTTPMethods.DELETE:
+            deleted, _ = relation_model.objects.filter(**relation).delete()
+            if deleted:
+                self.relations_deleted(relation_model, [pk])
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(target_queryset, pk=pk)
+            raise serializers.ValidationError(
+                {'errors': ErrorMessage.NOTHING_TO_DELETE},
+            )
+
+        target = get_object_or_404(target_queryset, pk=pk)
+        relation[target_field] = target.pk
+        if not insert_ignore_conflicts(relation_model, [relation], user_field):
+            raise serializers.ValidationError(
+                {'errors': already_exists_message},
+            )
+        self.relations_added(relation_model, [target.pk])
+        return Response(
+            serializer_class(target, context={'request': request}).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    def toggle_relations(
+        self,
+        request,
+        relation_model,
+        user_field,
+        target_field,
+        target_queryset,
+        forbidden_ids=(),
+    ):
+        """Add or delete relations for a list of object ids.
+
+        Ids are validated with one query and relations are written with one
+        statement, the response contains a result for every requested id.
+        """
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        if request.method.lower() == HTTPMethods.DELETE:
+            deleted = set(
+                delete_returning(
+                    relation_model,
+                    target_field,
+                    **{user_field: request.user.pk, target_field: ids},
+                ),
+            )
+            if deleted:
+                self.relations_deleted(relation_model, list(deleted))
+            missing = set(ids) - deleted
+            if missing:
+                missing -= set(
+                    target_queryset.filter(pk__in=missing).values_list(
+                        'pk',
+                        flat=True,
+                    ),
+                )
+            results = {
+                pk: (
+                    BatchStatus.DELETED if pk in deleted
+                    else BatchStatus.NOT_FOUND if pk in missing
+                    else BatchStatus.NOTHING_TO_DELETE
+                )
+                for pk in ids
+            }
+        else:
+            existing = set(
+                target_queryset.filter(pk__in=ids).values_list(
+                    'pk',
+                    flat=True,
+                ),
+            )
+            allowed = [
+                pk for pk in ids
+                if pk in existing and pk not in forbidden_ids
+            ]
+            added = set(
+                insert_ignore_conflicts(
+                    relation_model,
+                    [
+                        {user_field: request.user.pk, target_field: pk}
+                        for pk in allowed
+                    ],
+                    target_field,
+                ),
+            )
+            if added:
+                self.relations_added(relation_model, list(added))
+            results = {
+                pk: (
+                    BatchStatus.NOT_FOUND if pk not in existing
+                    else BatchStatus.FORBIDDEN if pk in forbidden_ids
+                    else BatchStatus.ADDED if pk in added
+                    else BatchStatus.ALREADY_EXISTS
+                )
+                for pk in ids
+            }
+
+        return Response(
+            {
+                'results': [
+                    {'id': pk, 'status': result}
+                    for pk, result in results.items()
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -1,8 +1,128 @@
 """Describe custom pagination classes for an Api app."""
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
 
 
 class LimitPagination(PageNumberPagination):
     """Describe custom settings for LimitPagination."""
 
     page_size_query_param = 'limit'
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Paginate a queryset with the async ORM."""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number,
+                    message=str(exc),
+                ),
+            )
+
+        bottom = (number - 1) * page_size
+        objects = [obj async for obj in queryset[bottom:bottom + page_size]]
+        self.page = Page(objects, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return objects
+
+
+class FeedPagination(CursorPagination):
+    """Describe cursor pagination settings for a feed."""
+
+    ordering = ('-pub_date', '-recipe_id')
+    page_size_query_param = 'limit'
+
+
+class RankingPagination(CursorPagination):
+    """Describe keyset pagination over a `ranking_score` annotation.
+
+    A cursor holds a score and an id of a boundary recipe. Recipes are
+    inner joined with rankings and the score is a raw ranking column, so
+    a page of any depth is read as a range of a ranking index.
+    """
+
+    ordering = ('-ranking_score', '-pk')
+    page_size_query_param = 'limit'
+
+    def decode_position(self, position):
+        """Split a cursor position into a score and an id."""
+        try:
+            score, pk = position.split('_')
+            return float(score), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, recipe, reverse):
+        """Build a cursor with a position of a recipe or its row."""
+        if isinstance(recipe, dict):
+            score, pk = recipe['ranking_score'], recipe['id']
+        else:
+            score, pk = recipe.ranking_score, recipe.pk
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=reverse, position=f'{score!r}_{pk}'),
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return recipes following or preceding a cursor position."""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor.reverse)
+        self.has_position = bool(cursor and cursor.position)
+
+        if self.has_position:
+            score, pk = self.decode_position(cursor.position)
+            if self.reverse:
+                queryset = queryset.filter(
+                    Q(ranking_score__gt=score)
+                    | Q(ranking_score=score, pk__gt=pk),
+                    ranking_score__gte=score,
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(ranking_score__lt=score)
+                    | Q(ranking_score=score, pk__lt=pk),
+                    ranking_score__lte=score,
+                )
+        if self.reverse:
+            queryset = queryset.order_by('ranking_score', 'pk')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+        return self.page
+
+    def get_next_link(self):
+        """Return a link on a page after the last recipe."""
+        if not self.page or not (self.has_more or self.reverse):
+            return None
+        return self.encode_position(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """Return a link on a page before the first recipe."""
+        if not self.page or not (
+            self.has_more if self.reverse else self.has_position
+        ):
+            return None
+        return self.encode_position(self.page[0], reverse=True)
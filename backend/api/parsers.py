@@ -0,0 +1,44 @@
+"""Describe fast JSON and MessagePack parsers for an Api app."""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from api.renderers import (FastJSONRenderer, MessagePackRenderer, msgpack,
+                           orjson)
+
+UTF8_ENCODINGS = ('utf-8', 'utf8')
+
+
+class FastJSONParser(JSONParser):
+    """Parse UTF-8 JSON with orjson, other encodings with JSONParser."""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Parse a JSON request body."""
+        encoding = (parser_context or {}).get(
+            'encoding',
+            settings.DEFAULT_CHARSET,
+        )
+        if orjson is None or encoding.lower() not in UTF8_ENCODINGS:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackParser(BaseParser):
+    """Parse a MessagePack request body."""
+
+    media_type = MessagePackRenderer.media_type
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Parse a MessagePack request body."""
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError(
+                f'MessagePack parse error - {exc or type(exc).__name__}',
+            )
@@ -0,0 +1,67 @@
+"""Describe raw queries which can not be built with the ORM."""
+from django.db import connection
+from django.utils import timezone
+
+
+def insert_ignore_conflicts(model, rows, returning):
+    """Insert rows skipping existing ones in a single statement.
+
+    Return values of the `returning` field for rows which were inserted,
+    so callers know which rows already existed without extra queries.
+    Fields with auto_now_add are filled with the current time.
+    """
+    if not rows:
+        return []
+    quote_name = connection.ops.quote_name
+    now = timezone.now()
+    auto_now_add = {
+        field.name: now
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False) and field.name not in rows[0]
+    }
+    rows = [{**row, **auto_now_add} for row in rows]
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    row_placeholder = f'({", ".join(["%s"] * len(fields))})'
+    placeholders = ', '.join([row_placeholder] * len(rows))
+    returning_column = quote_name(model._meta.get_field(returning).column)
+    sql = (
+        f'INSERT INTO {quote_name(model._meta.db_table)} ({columns}) '
+        f'VALUES {placeholders} '
+        f'ON CONFLICT DO NOTHING RETURNING {returning_column}'
+    )
+    params = [row[field.name] for row in rows for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [inserted[0] for inserted in cursor.fetchall()]
+
+
+def delete_returning(model, returning, **lookups):
+    """Delete rows matching exact lookups in a single statement.
+
+    List values are matched with `IN`. Return values of the `returning`
+    field for rows which were deleted.
+    """
+    quote_name = connection.ops.quote_name
+    conditions = []
+    params = []
+    for name, value in lookups.items():
+        column = quote_name(model._meta.get_field(name).column)
+        if isinstance(value, (list, tuple)):
+            if not value:
+                return []
+            placeholders = ', '.join(['%s'] * len(value))
+            conditions.append(f'{column} IN ({placeholders})')
+            params.extend(value)
+        else:
+            conditions.append(f'{column} = %s')
+            params.append(value)
+    returning_column = quote_name(model._meta.get_field(returning).column)
+    sql = (
+        f'DELETE FROM {quote_name(model._meta.db_table)} '
+        f'WHERE {" AND ".join(conditions)} '
+        f'RETURNING {returning_column}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [deleted[0] for deleted in cursor.fetchall()]
@@ -0,0 +1,74 @@
+"""Describe fast JSON and MessagePack renderers for an Api app.
+
+JSON is rendered with orjson when it is installed, MessagePack is chosen
+by content negotiation with an Accept header of its media type.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Render compact JSON with orjson, same as JSONRenderer renders it.
+
+    Dates, decimals and other values unknown to orjson are converted by
+    the encoder of DRF. Indented or ASCII output and data which orjson can
+    not encode, like too big integers, are rendered by JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into JSON bytes."""
+        if data is None:
+            return b''
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=(
+                    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                ),
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return rendered.replace(LINE_SEPARATOR, b'\\u2028').replace(
+            PARAGRAPH_SEPARATOR,
+            b'\\u2029',
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render data into MessagePack for clients which accept it."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into MessagePack bytes."""
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data,
+            default=JSONEncoder().default,
+            use_bin_type=True,
+        )
@@ -8,16 +8,109 @@ from rest_framework.validators import UniqueValidator
 
 from api.constants import ErrorMessage
 from api.converters import Base64ImageField
-from foodgram.settings import (MAXIMUM_COOKING_TIME, MAXIMUM_INGREDIENT_AMOUNT,
-                               MINIMUM_COOKING_TIME, MINIMUM_INGREDIENT_AMOUNT)
+from foodgram.settings import (MAXIMUM_BATCH_SIZE, MAXIMUM_COOKING_TIME,
+                               MAXIMUM_INGREDIENT_AMOUNT, MINIMUM_COOKING_TIME,
+                               MINIMUM_INGREDIENT_AMOUNT,
+                               PANTRY_MAXIMUM_RESULTS)
+from perf.telemetry import TimedSerializerMixin
+from recipes.documents import refresh_documents
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            RecipeRanking, ShoppingCart, Tag)
+from recipes.shopping_list import add_recipe_to_carts, remove_recipe_from_carts
 from users.models import Follow
 
 User = get_user_model()
 
+FAVORITE_RECIPE_FIELDS = (
+    'id',
+    'name',
+    'image',
+    'cooking_time',
+)
+
+
+def split_parameter(request, name):
+    """Return comma separated values of a query parameter as a list."""
+    if request is None:
+        return []
+    value = request.query_params.get(name, '')
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def requested_fields(request, output_fields, expandable_fields):
+    """Return requested output fields and expanded relations.
+
+    Without a `fields` parameter all fields are returned with expanded
+    relations. Unknown fields and relations are validation errors.
+    """
+    fields = split_parameter(request, 'fields')
+    expand = split_parameter(request, 'expand')
+    errors = {}
+    unknown = set(fields) - set(output_fields)
+    if unknown:
+        errors['fields'] = ErrorMessage.UNKNOWN_FIELDS.format(
+            ', '.join(sorted(unknown)),
+        )
+    unknown = set(expand) - set(expandable_fields)
+    if unknown:
+        errors['expand'] = ErrorMessage.UNKNOWN_FIELDS.format(
+            ', '.join(sorted(unknown)),
+        )
+    if errors:
+        raise serializers.ValidationError(errors)
+    if not fields:
+        return tuple(output_fields), frozenset(expandable_fields)
+    return (
+        tuple(field for field in output_fields if field in fields),
+        frozenset(expand),
+    )
+
+
+class RequestedFieldsMixin:
+    """Return only fields named by a `fields` query parameter.
+
+    Relations which are not named by an `expand` parameter are returned
+    as ids. Only a serializer of a whole response is pruned, nested
+    serializers keep all their fields.
+    """
+
+    expandable_fields = ()
+
+    def get_fields(self):
+        """Prune fields and collapse relations of a request."""
+        fields = super().get_fields()
+        response = (
+            self.parent if isinstance(self.parent, serializers.ListSerializer)
+            else self
+        )
+        if response.parent is not None:
+            return fields
+        names, expanded = requested_fields(
+            self.context.get('request'),
+            tuple(fields),
+            self.expandable_fields,
+        )
+        return {
+            name: (
+                self.collapse_field(name, fields[name])
+                if name in self.expandable_fields and name not in expanded
+                else fields[name]
+            )
+            for name in names
+        }
+
+    def collapse_field(self, name, field):
+        """Return a field which represents a relation with ids."""
+        return serializers.PrimaryKeyRelatedField(
+            many=isinstance(field, serializers.ListSerializer),
+            read_only=True,
+        )
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serialize requests for Tag model."""
 
     class Meta:
@@ -32,7 +125,10 @@ class TagSerializer(serializers.ModelSerializer):
         )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serialize requests for Ingredients model."""
 
     amount = serializers.SerializerMethodField(method_name='get_amount')
@@ -98,7 +194,11 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         return super().to_representation(instance)
 
 
-class GetUserSerializer(serializers.ModelSerializer):
+class GetUserSerializer(
+    TimedSerializerMixin,
+    RequestedFieldsMixin,
+    serializers.ModelSerializer,
+):
     """Serialize GET request for a User model."""
 
     is_subscribed = serializers.SerializerMethodField(
@@ -136,9 +236,15 @@ class GetUserSerializer(serializers.ModelSerializer):
         )
 
 
-class GetRecipeSerializer(serializers.ModelSerializer):
+class GetRecipeSerializer(
+    TimedSerializerMixin,
+    RequestedFieldsMixin,
+    serializers.ModelSerializer,
+):
     """Serialize GET request for a Recipe model."""
 
+    expandable_fields = ('tags', 'author')
+
     tags = TagSerializer(many=True, read_only=True)
     ingredients = serializers.SerializerMethodField(
         method_name='get_ingredients',
@@ -202,13 +308,16 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     def get_ingredients(self, obj):
         """Retrive ingredients from an Ingredient model."""
         return IngredientSerializer(
-            obj.ingredients.all(),
+            obj.ingredients.order_by('name', 'measurement_unit'),
             many=True,
             context={'current_recipe_id': obj.id},
         ).data
 
 
-class PostRecipeSerializer(serializers.ModelSerializer):
+class PostRecipeSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serialize POST request for Recipe model."""
 
     tags = serializers.PrimaryKeyRelatedField(
@@ -287,12 +396,15 @@ class PostRecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags')
 
         recipe = Recipe.objects.create(**validated_data)
+        RecipeRanking.objects.create(recipe=recipe)
 
         self.add_ingredients(
             recipe=recipe,
             ingredients=ingredients,
         )
         recipe.tags.set(tags)
+        Recipe.objects.filter(pk=recipe.pk).sync_tag_slugs()
+        refresh_documents((recipe.pk,))
         return recipe
 
     @transaction.atomic
@@ -312,32 +424,37 @@ class PostRecipeSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredient_recipe')
         tags = validated_data.pop('tags')
 
+        remove_recipe_from_carts(instance.pk)
         instance.ingredients.clear()
         self.add_ingredients(
             recipe=instance,
             ingredients=ingredients,
         )
+        add_recipe_to_carts(instance.pk)
         instance.tags.set(tags)
         instance.save()
+        Recipe.objects.filter(pk=instance.pk).sync_tag_slugs()
+        refresh_documents((instance.pk,))
         return instance
 
 
-class FavoriteRecipeSerializer(serializers.ModelSerializer):
+class FavoriteRecipeSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serialize requests for FavoriteRecipe model."""
 
     class Meta:
         """Describe settings for FavoriteRecipeSerializer."""
 
         model = Recipe
-        fields = (
-            'id',
-            'name',
-            'image',
-            'cooking_time',
-        )
+        fields = FAVORITE_RECIPE_FIELDS
 
 
-class PostUserSerializer(serializers.ModelSerializer):
+class PostUserSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serialize POST request for a User model."""
 
     email = serializers.EmailField(
@@ -411,9 +528,81 @@ class GetTokenSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class BatchSerializer(serializers.Serializer):
+    """Serialize a list of object ids for batch requests."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAXIMUM_BATCH_SIZE,
+    )
+
+    def validate_ids(self, value):
+        """Remove repeated ids keeping their order."""
+        return list(dict.fromkeys(value))
+
+
+class MultiGetSerializer(serializers.Serializer):
+    """Serialize comma separated object ids of a multi-get request."""
+
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        """Parse ids, remove repeated ids keeping their order."""
+        ids = serializers.ListField(
+            child=serializers.IntegerField(min_value=1),
+            min_length=1,
+            max_length=MAXIMUM_BATCH_SIZE,
+        ).run_validation(
+            [pk.strip() for pk in value.split(',') if pk.strip()],
+        )
+        return list(dict.fromkeys(ids))
+
+
+class PantrySerializer(serializers.Serializer):
+    """Serialize query params of a pantry matching request."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAXIMUM_BATCH_SIZE,
+    )
+    exclude = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        default=list,
+        max_length=MAXIMUM_BATCH_SIZE,
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=PANTRY_MAXIMUM_RESULTS,
+        required=False,
+        default=20,
+    )
+
+
+class PantryRecipeSerializer(FavoriteRecipeSerializer):
+    """Serialize recipes matched by owned ingredients."""
+
+    coverage = serializers.FloatField(read_only=True)
+    matched = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        """Describe settings for PantryRecipeSerializer."""
+
+        model = Recipe
+        fields = FAVORITE_RECIPE_FIELDS + ('coverage', 'matched')
+
+
+class SubscriptionSerializer(
+    TimedSerializerMixin,
+    RequestedFieldsMixin,
+    serializers.ModelSerializer,
+):
     """Serialize requests for Subscription model."""
 
+    expandable_fields = ('recipes',)
+
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed',
     )
@@ -447,18 +636,32 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             following=obj,
         ).exists()
 
-    def get_recipes(self, obj):
-        """Gather all recipes from favorites."""
+    def collapse_field(self, name, field):
+        """Return ids of the latest recipes instead of recipes."""
+        return serializers.SerializerMethodField(method_name='get_recipe_ids')
+
+    def latest_recipes(self, obj):
+        """Return the latest recipes of an author or None without request."""
         request = self.context.get('request')
         if not request:
             return None
         limit = request.query_params.get('recipes_limit')
         limit = int(limit) if limit and limit.isdigit() else 1
-        serializer = FavoriteRecipeSerializer(
-            obj.recipes.all()[:limit],
-            many=True,
-        )
-        return serializer.data
+        return obj.recipes.all()[:limit]
+
+    def get_recipes(self, obj):
+        """Gather all recipes from favorites."""
+        recipes = self.latest_recipes(obj)
+        if recipes is None:
+            return None
+        return FavoriteRecipeSerializer(recipes, many=True).data
+
+    def get_recipe_ids(self, obj):
+        """Gather ids of the latest recipes of an author."""
+        recipes = self.latest_recipes(obj)
+        if recipes is None:
+            return None
+        return [recipe.pk for recipe in recipes]
 
     def get_recipes_count(self, obj):
         """Count user's recipes amount."""
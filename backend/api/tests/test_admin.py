@@ -0,0 +1,352 @@
+"""Describe tests of derived data kept in sync by admin writes."""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+
+from recipes.facets import VERSION_KEY, facets_version
+from recipes.models import (Ingredient, IngredientRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.pantry import PantryIndex, pantry_version
+from recipes.shopping_list import rebuild_shopping_lists
+
+User = get_user_model()
+
+
+class AdminMixin:
+    """Describe a logged in admin and a recipe of an author."""
+
+    def setUp(self):
+        """Log in an admin and create a recipe with a tag and ingredient."""
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='admin',
+        )
+        self.client.force_login(self.admin)
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        self.tag = Tag.objects.create(
+            name='Breakfast',
+            slug='breakfast',
+            color='#ffffff',
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='milk',
+            measurement_unit='ml',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author,
+            name='Porridge',
+            description='Cook oats.',
+            image='recipes/images/porridge.png',
+            cooking_time=10,
+        )
+        self.recipe.tags.add(self.tag)
+        self.relation = IngredientRecipe.objects.create(
+            ingredient=self.ingredient,
+            recipe=self.recipe,
+            quantity=200,
+        )
+
+
+class AdminTestCase(AdminMixin, TestCase):
+    """Run admin tests in a transaction rolled back after every test."""
+
+
+class AdminFacetsTests(AdminTestCase):
+    """Check that admin writes replace a version of cached facets."""
+
+    def assertInvalidates(self, url, data):
+        """Post an admin form and check that facets got a new version."""
+        version = facets_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(cache.get(VERSION_KEY), version)
+
+    def test_tag_writes(self):
+        """Creating, renaming and deleting tags invalidates facets."""
+        self.assertInvalidates(
+            '/admin/recipes/tag/add/',
+            {'name': 'Lunch', 'slug': 'lunch', 'color': '#00ff00'},
+        )
+        self.assertInvalidates(
+            f'/admin/recipes/tag/{self.tag.pk}/change/',
+            {'name': 'Morning', 'slug': 'morning', 'color': '#ffffff'},
+        )
+        self.assertInvalidates(
+            f'/admin/recipes/tag/{self.tag.pk}/delete/',
+            {'post': 'yes'},
+        )
+
+    def test_ingredient_relation_writes(self):
+        """Changing and deleting ingredients of recipes invalidates facets."""
+        self.assertInvalidates(
+            f'/admin/recipes/ingredientrecipe/{self.relation.pk}/change/',
+            {
+                'ingredient': self.ingredient.pk,
+                'recipe': self.recipe.pk,
+                'quantity': 100,
+            },
+        )
+        self.assertInvalidates(
+            f'/admin/recipes/ingredientrecipe/{self.relation.pk}/delete/',
+            {'post': 'yes'},
+        )
+
+    def test_user_delete(self):
+        """Deleting an author with recipes invalidates facets."""
+        self.assertInvalidates(
+            f'/admin/users/user/{self.author.pk}/delete/',
+            {'post': 'yes'},
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+
+class AdminPantryTests(AdminTestCase):
+    """Check that admin writes reach pantry indexes of other workers."""
+
+    def setUp(self):
+        """Build an index of a worker which did not handle writes."""
+        super().setUp()
+        self.worker = PantryIndex()
+        self.worker.build()
+        min_age = mock.patch('recipes.pantry.PANTRY_INDEX_MIN_AGE', 0)
+        min_age.start()
+        self.addCleanup(min_age.stop)
+
+    def test_ingredient_relation_write(self):
+        """A worker rebuilds its index after a version is replaced."""
+        salt = Ingredient.objects.create(name='salt', measurement_unit='g')
+        self.assertFalse(self.worker.is_stale(pantry_version()))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/admin/recipes/ingredientrecipe/add/',
+                {'ingredient': salt.pk, 'recipe': self.recipe.pk,
+                 'quantity': 2},
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.worker.is_stale(pantry_version()))
+        self.worker.build()
+        self.assertFalse(self.worker.is_stale(pantry_version()))
+        self.assertEqual(
+            self.worker.match((salt.pk,)),
+            [(self.recipe.pk, 0.5, 1)],
+        )
+
+    def test_writes_during_build(self):
+        """Writes during a build are not lost by the swap."""
+        salt = Ingredient.objects.create(name='salt', measurement_unit='g')
+        load_pairs = PantryIndex.load_pairs
+
+        def write_while_loading(queryset):
+            self.worker.load_pairs = load_pairs
+            pairs = load_pairs(queryset)
+            IngredientRecipe.objects.create(
+                ingredient=salt,
+                recipe=self.recipe,
+                quantity=2,
+            )
+            cache.set('pantry-index:version', 'written')
+            self.worker.refresh_recipes((self.recipe.pk,))
+            return pairs
+
+        with mock.patch.object(
+            self.worker,
+            'load_pairs',
+            write_while_loading,
+        ):
+            self.worker.build()
+        self.assertTrue(self.worker.is_stale(pantry_version()))
+        self.assertEqual(
+            self.worker.match((salt.pk,)),
+            [(self.recipe.pk, 0.5, 1)],
+        )
+
+
+class ShoppingListMixin(AdminMixin):
+    """Describe carts of readers with the recipe and another one."""
+
+    def setUp(self):
+        """Put the recipe and another one in carts of two readers."""
+        super().setUp()
+        self.salt = Ingredient.objects.create(
+            name='salt',
+            measurement_unit='g',
+        )
+        self.other_recipe = Recipe.objects.create(
+            author=self.author,
+            name='Soup',
+            description='Boil water.',
+            image='recipes/images/soup.png',
+            cooking_time=30,
+        )
+        IngredientRecipe.objects.create(
+            ingredient=self.salt,
+            recipe=self.other_recipe,
+            quantity=5,
+        )
+        self.readers = [
+            User.objects.create(
+                username=f'reader{number}',
+                email=f'reader{number}@example.com',
+            )
+            for number in range(2)
+        ]
+        for reader in self.readers:
+            ShoppingCart.objects.create(
+                user=reader,
+                recipe_in_cart=self.recipe,
+            )
+        ShoppingCart.objects.create(
+            user=self.readers[1],
+            recipe_in_cart=self.other_recipe,
+        )
+        rebuild_shopping_lists()
+
+    def shopping_lists(self):
+        """Return rows of all shopping lists."""
+        return sorted(
+            ShoppingListItem.objects.values_list(
+                'user_id',
+                'ingredient_id',
+                'total',
+                'recipes_count',
+            ),
+        )
+
+    def assertInSync(self, url, data):
+        """Post an admin form and compare lists with recomputed ones."""
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        lists = self.shopping_lists()
+        rebuild_shopping_lists()
+        self.assertEqual(lists, self.shopping_lists())
+
+
+class AdminShoppingListTests(ShoppingListMixin, TestCase):
+    """Check that admin writes keep shopping lists equal to carts."""
+
+    def test_ingredient_relation_writes(self):
+        """Added, changed, moved and deleted ingredients reach lists."""
+        self.assertInSync(
+            '/admin/recipes/ingredientrecipe/add/',
+            {
+                'ingredient': self.salt.pk,
+                'recipe': self.recipe.pk,
+                'quantity': 2,
+            },
+        )
+        self.assertInSync(
+            f'/admin/recipes/ingredientrecipe/{self.relation.pk}/change/',
+            {
+                'ingredient': self.ingredient.pk,
+                'recipe': self.recipe.pk,
+                'quantity': 300,
+            },
+        )
+        self.assertInSync(
+            f'/admin/recipes/ingredientrecipe/{self.relation.pk}/change/',
+            {
+                'ingredient': self.ingredient.pk,
+                'recipe': self.other_recipe.pk,
+                'quantity': 300,
+            },
+        )
+        self.assertInSync(
+            f'/admin/recipes/ingredientrecipe/{self.relation.pk}/delete/',
+            {'post': 'yes'},
+        )
+
+    def test_ingredient_delete(self):
+        """A deleted ingredient leaves lists of carts with its recipes."""
+        self.assertInSync(
+            f'/admin/recipes/ingredient/{self.salt.pk}/delete/',
+            {'post': 'yes'},
+        )
+
+    def test_cart_writes(self):
+        """Added, changed and deleted cart rows reach lists."""
+        self.assertInSync(
+            '/admin/recipes/shoppingcart/add/',
+            {
+                'user': self.readers[0].pk,
+                'recipe_in_cart': self.other_recipe.pk,
+            },
+        )
+        cart = ShoppingCart.objects.get(
+            user=self.readers[0],
+            recipe_in_cart=self.recipe,
+        )
+        self.assertInSync(
+            f'/admin/recipes/shoppingcart/{cart.pk}/change/',
+            {'user': self.admin.pk, 'recipe_in_cart': self.recipe.pk},
+        )
+        self.assertInSync(
+            f'/admin/recipes/shoppingcart/{cart.pk}/delete/',
+            {'post': 'yes'},
+        )
+        self.assertInSync(
+            '/admin/recipes/shoppingcart/',
+            {
+                'action': 'delete_selected',
+                '_selected_action': list(
+                    ShoppingCart.objects.values_list('pk', flat=True),
+                ),
+                'post': 'yes',
+            },
+        )
+        self.assertEqual(self.shopping_lists(), [])
+
+    def test_recipe_and_author_delete(self):
+        """Deleted recipes and authors leave lists of carts."""
+        self.assertInSync(
+            f'/admin/recipes/recipe/{self.other_recipe.pk}/delete/',
+            {'post': 'yes'},
+        )
+        self.assertInSync(
+            f'/admin/users/user/{self.author.pk}/delete/',
+            {'post': 'yes'},
+        )
+        self.assertEqual(self.shopping_lists(), [])
+
+
+class AdminActionTests(ShoppingListMixin, TransactionTestCase):
+    """Check changelist actions which run outside of a test transaction.
+
+    Django does not wrap the delete_selected action in a transaction, so
+    locks taken by admin hooks need their own one.
+    """
+
+    def setUp(self):
+        """Run background tasks in place."""
+        background = mock.patch('recipes.tasks.BACKGROUND_TASKS_SYNC', True)
+        background.start()
+        self.addCleanup(background.stop)
+        super().setUp()
+
+    def test_recipe_and_author_delete_selected(self):
+        """Recipes and authors deleted by an action leave lists of carts."""
+        self.assertInSync(
+            '/admin/recipes/recipe/',
+            {
+                'action': 'delete_selected',
+                '_selected_action': [self.other_recipe.pk],
+                'post': 'yes',
+            },
+        )
+        self.assertInSync(
+            '/admin/users/user/',
+            {
+                'action': 'delete_selected',
+                '_selected_action': [self.author.pk],
+                'post': 'yes',
+            },
+        )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.shopping_lists(), [])
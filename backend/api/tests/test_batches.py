@@ -0,0 +1,204 @@
+"""Describe tests of batch endpoints adding and deleting relations."""
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api.constants import BatchStatus
+from foodgram.settings import MAXIMUM_BATCH_SIZE
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingListItem)
+from recipes.shopping_list import rebuild_shopping_lists
+from users.models import Follow
+
+User = get_user_model()
+
+
+class BatchTests(APITestCase):
+    """Check per id statuses and side effects of batch requests."""
+
+    def setUp(self):
+        """Create two recipes with ingredients and a reader with a token."""
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        self.reader = User.objects.create(
+            username='reader',
+            email='reader@example.com',
+        )
+        milk = Ingredient.objects.create(name='milk', measurement_unit='ml')
+        salt = Ingredient.objects.create(name='salt', measurement_unit='g')
+        self.recipes = []
+        for number, ingredients in enumerate(((milk, salt), (milk,))):
+            recipe = Recipe.objects.create(
+                author=self.author,
+                name=f'Porridge {number}',
+                description='Cook oats.',
+                image='recipes/images/porridge.png',
+                cooking_time=10,
+            )
+            for ingredient in ingredients:
+                IngredientRecipe.objects.create(
+                    ingredient=ingredient,
+                    recipe=recipe,
+                    quantity=100 + number,
+                )
+            self.recipes.append(recipe)
+        self.missing_id = self.recipes[-1].pk + 1
+        token = Token.objects.create(user=self.reader)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def batch(self, method, url, ids, status=200):
+        """Send ids and return statuses of them by ids."""
+        response = getattr(self.client, method)(
+            url,
+            {'ids': ids},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status, response.data)
+        if status != 200:
+            return response.data
+        return {
+            result['id']: result['status']
+            for result in response.data['results']
+        }
+
+    def test_favorites(self):
+        """Favorites are added once and deleted only when they exist."""
+        first, second = (recipe.pk for recipe in self.recipes)
+        url = '/api/recipes/favorite/'
+        self.assertEqual(
+            self.batch('post', url, [first, first, self.missing_id]),
+            {first: BatchStatus.ADDED, self.missing_id: BatchStatus.NOT_FOUND},
+        )
+        self.assertEqual(
+            self.batch('post', url, [first, second]),
+            {first: BatchStatus.ALREADY_EXISTS, second: BatchStatus.ADDED},
+        )
+        self.assertEqual(
+            self.batch('delete', url, [first, self.missing_id]),
+            {
+                first: BatchStatus.DELETED,
+                self.missing_id: BatchStatus.NOT_FOUND,
+            },
+        )
+        self.assertEqual(
+            self.batch('delete', url, [first]),
+            {first: BatchStatus.NOTHING_TO_DELETE},
+        )
+        self.assertEqual(
+            list(
+                Favorite.objects.filter(user=self.reader).values_list(
+                    'favorite_recipe_id',
+                    flat=True,
+                ),
+            ),
+            [second],
+        )
+
+    def test_subscriptions(self):
+        """A user can not subscribe to oneself in a batch."""
+        url = '/api/users/subscribe/'
+        self.assertEqual(
+            self.batch(
+                'post',
+                url,
+                [self.author.pk, self.reader.pk, self.missing_id],
+            ),
+            {
+                self.author.pk: BatchStatus.ADDED,
+                self.reader.pk: BatchStatus.FORBIDDEN,
+                self.missing_id: BatchStatus.NOT_FOUND,
+            },
+        )
+        self.assertTrue(
+            Follow.objects.filter(
+                follower=self.reader,
+                following=self.author,
+            ).exists(),
+        )
+        self.assertEqual(
+            self.batch('delete', url, [self.author.pk, self.reader.pk]),
+            {
+                self.author.pk: BatchStatus.DELETED,
+                self.reader.pk: BatchStatus.NOTHING_TO_DELETE,
+            },
+        )
+
+    def test_shopping_cart(self):
+        """Batch cart writes keep a shopping list equal to a cart."""
+        first, second = (recipe.pk for recipe in self.recipes)
+        url = '/api/recipes/shopping_cart/'
+        self.batch('post', url, [first, second, self.missing_id])
+        self.assertShoppingList(
+            [('milk', 201, 2), ('salt', 100, 1)],
+        )
+        self.assertEqual(
+            self.batch('post', url, [second]),
+            {second: BatchStatus.ALREADY_EXISTS},
+        )
+        self.assertShoppingList(
+            [('milk', 201, 2), ('salt', 100, 1)],
+        )
+        self.batch('delete', url, [first, self.missing_id])
+        self.assertShoppingList([('milk', 101, 1)])
+        self.batch('delete', url, [second])
+        self.assertShoppingList([])
+
+    def assertShoppingList(self, expected):
+        """Compare a list of the reader with expected and recomputed rows."""
+        items = list(
+            ShoppingListItem.objects.filter(user=self.reader).order_by(
+                'ingredient__name',
+            ).values_list('ingredient__name', 'total', 'recipes_count'),
+        )
+        self.assertEqual(items, expected)
+        rebuild_shopping_lists()
+        self.assertEqual(
+            list(
+                ShoppingListItem.objects.filter(user=self.reader).order_by(
+                    'ingredient__name',
+                ).values_list('ingredient__name', 'total', 'recipes_count'),
+            ),
+            items,
+        )
+
+    def test_invalid_batches(self):
+        """Empty and too large batches are rejected."""
+        for url in (
+            '/api/recipes/favorite/',
+            '/api/recipes/shopping_cart/',
+            '/api/users/subscribe/',
+        ):
+            with self.subTest(url):
+                self.assertIn('ids', self.batch('post', url, [], status=400))
+                self.assertIn(
+                    'ids',
+                    self.batch(
+                        'post',
+                        url,
+                        list(range(1, MAXIMUM_BATCH_SIZE + 2)),
+                        status=400,
+                    ),
+                )
+        self.assertEqual(
+            len(
+                self.batch(
+                    'post',
+                    '/api/recipes/favorite/',
+                    list(range(1, MAXIMUM_BATCH_SIZE + 1)),
+                ),
+            ),
+            MAXIMUM_BATCH_SIZE,
+        )
+
+    def test_anonymous(self):
+        """Batches need an authenticated user."""
+        self.client.credentials()
+        self.batch(
+            'post',
+            '/api/recipes/favorite/',
+            [self.recipes[0].pk],
+            status=401,
+        )
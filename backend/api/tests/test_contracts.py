@@ -0,0 +1,424 @@
+"""Describe contract tests of read representations.
+
+Fast read serializers must return the same bytes as read serializers of
+api.serializers, and both must match docs/openapi-schema.yml. Every
+request is sent with each set of serializers, anonymously and with a
+token of a user who follows an author and has carted recipes.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+import yaml
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.fast_serializers import (DocumentRecipeSerializer,
+                                  FastFavoriteRecipeSerializer,
+                                  FastRecipeSerializer,
+                                  FastSubscriptionSerializer,
+                                  FastUserSerializer)
+from api.serializers import (FavoriteRecipeSerializer, GetRecipeSerializer,
+                             GetUserSerializer, SubscriptionSerializer)
+from foodgram.settings import BASE_DIR, DATABASE_REPLICAS
+from recipes.documents import DOCUMENTS, refresh_documents
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
+from users.models import Follow
+
+User = get_user_model()
+
+OPENAPI_SCHEMA = Path(BASE_DIR).parent / 'docs' / 'openapi-schema.yml'
+READ_SERIALIZERS = {
+    'drf': (
+        False,
+        GetRecipeSerializer,
+        GetUserSerializer,
+        SubscriptionSerializer,
+        FavoriteRecipeSerializer,
+    ),
+    'fast': (
+        True,
+        FastRecipeSerializer,
+        FastUserSerializer,
+        FastSubscriptionSerializer,
+        FastFavoriteRecipeSerializer,
+    ),
+}
+if DOCUMENTS:
+    READ_SERIALIZERS['documents'] = (
+        True,
+        DocumentRecipeSerializer,
+        *READ_SERIALIZERS['fast'][2:],
+    )
+JSON_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'integer': int,
+    'number': (int, float),
+    'boolean': bool,
+}
+
+
+def load_schema():
+    """Return the OpenAPI document of the API."""
+    with open(OPENAPI_SCHEMA, encoding='utf-8') as schema:
+        return yaml.safe_load(schema)
+
+
+@contextmanager
+def read_serializers(name):
+    """Make views represent objects with a named set of serializers."""
+    fast, recipe, user, subscription, favorite = READ_SERIALIZERS[name]
+    with mock.patch('api.fast_serializers.FAST_READ_SERIALIZERS', fast):
+        with mock.patch.multiple(
+            'api.views',
+            RecipeReadSerializer=recipe,
+            UserReadSerializer=user,
+            SubscriptionReadSerializer=subscription,
+            FavoriteReadSerializer=favorite,
+        ):
+            yield
+
+
+class ReadContractTests(TransactionTestCase):
+    """Compare read representations between serializers and a schema."""
+
+    databases = {DEFAULT_DB_ALIAS, *DATABASE_REPLICAS}
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the OpenAPI document once."""
+        super().setUpClass()
+        cls.openapi = load_schema()
+
+    def setUp(self):
+        """Create recipes of a followed author with a reader's relations.
+
+        Ingredients are added out of name order, one name has two
+        measurement units. Background tasks run synchronously, so they do
+        not outlive a test.
+        """
+        cache.clear()
+        background = mock.patch('recipes.tasks.BACKGROUND_TASKS_SYNC', True)
+        background.start()
+        self.addCleanup(background.stop)
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Anna',
+            last_name='Cook',
+        )
+        self.reader = User.objects.create(
+            username='reader',
+            email='reader@example.com',
+        )
+        Follow.objects.create(follower=self.reader, following=self.author)
+        tags = [
+            Tag.objects.create(name=name, slug=name.lower(), color=color)
+            for name, color in (('Lunch', '#00ff00'), ('Breakfast', '#fff'))
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('salt', 'g'),
+                ('milk', 'ml'),
+                ('flour', 'g'),
+                ('milk', 'g'),
+            )
+        ]
+        self.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=self.author,
+                name=f'Pancakes {number}',
+                description='Mix and fry.',
+                image=f'recipes/images/pancakes-{number}.png',
+                cooking_time=10 + number,
+            )
+            for tag in tags[number % 2:]:
+                TagRecipe.objects.create(tag=tag, recipe=recipe)
+            for quantity, ingredient in enumerate(
+                ingredients[number:],
+                start=1,
+            ):
+                IngredientRecipe.objects.create(
+                    ingredient=ingredient,
+                    recipe=recipe,
+                    quantity=quantity,
+                )
+            self.recipes.append(recipe)
+        Favorite.objects.create(
+            user=self.reader,
+            favorite_recipe=self.recipes[0],
+        )
+        ShoppingCart.objects.create(
+            user=self.reader,
+            recipe_in_cart=self.recipes[1],
+        )
+        refresh_documents()
+        self.clients = {'anonymous': APIClient(), 'reader': APIClient()}
+        token = Token.objects.create(user=self.reader)
+        self.clients['reader'].credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def component(self, name):
+        """Return a reference to a schema of components."""
+        return {'$ref': f'#/components/schemas/{name}'}
+
+    def response_schema(self, path, method, status):
+        """Return a schema of a JSON response of an operation."""
+        response = self.openapi['paths'][path][method]['responses'][status]
+        return response['content']['application/json']['schema']
+
+    def schema_errors(self, value, schema, location='response'):
+        """Return mismatches of a value against an OpenAPI schema.
+
+        Properties which the schema does not describe are mismatches too.
+        """
+        if '$ref' in schema:
+            target = self.openapi
+            for key in schema['$ref'].removeprefix('#/').split('/'):
+                target = target[key]
+            return self.schema_errors(value, target, location)
+        if value is None:
+            return [] if schema.get('nullable') else [f'{location} is null']
+        expected = schema.get('type')
+        if expected and (
+            not isinstance(value, JSON_TYPES[expected])
+            or (isinstance(value, bool) and expected != 'boolean')
+        ):
+            return [f'{location} is not {expected}']
+        errors = []
+        if 'enum' in schema and value not in schema['enum']:
+            errors.append(f'{location} is not one of {schema["enum"]}')
+        if 'minimum' in schema and value < schema['minimum']:
+            errors.append(f'{location} is less than {schema["minimum"]}')
+        if 'maxLength' in schema and len(value) > schema['maxLength']:
+            errors.append(f'{location} is longer than {schema["maxLength"]}')
+        if isinstance(value, dict):
+            properties = schema.get('properties', {})
+            errors.extend(
+                f'{location}.{name} is missing'
+                for name in schema.get('required', ()) if name not in value
+            )
+            for name, item in value.items():
+                if name not in properties:
+                    errors.append(f'{location}.{name} is not described')
+                else:
+                    errors.extend(
+                        self.schema_errors(
+                            item,
+                            properties[name],
+                            f'{location}.{name}',
+                        ),
+                    )
+        if isinstance(value, list):
+            for position, item in enumerate(value):
+                errors.extend(
+                    self.schema_errors(
+                        item,
+                        schema.get('items', {}),
+                        f'{location}[{position}]',
+                    ),
+                )
+        return errors
+
+    def assertContract(self, method, url, schema, status=200, data=None):
+        """Check a response of every set of serializers for every client.
+
+        Bytes of every response must equal those of DRF serializers and
+        match the schema. Relations added by a POST are deleted after it.
+        """
+        for client_name, client in self.clients.items():
+            if method == 'post' and client_name == 'anonymous':
+                continue
+            expected = None
+            for serializers_name in READ_SERIALIZERS:
+                with self.subTest(
+                    url=url,
+                    client=client_name,
+                    serializers=serializers_name,
+                ), read_serializers(serializers_name):
+                    response = getattr(client, method)(url, data)
+                    if method == 'post':
+                        client.delete(url)
+                    self.assertEqual(response.status_code, status)
+                    self.assertEqual(
+                        self.schema_errors(response.json(), schema),
+                        [],
+                    )
+                    if expected is None:
+                        expected = response.content
+                    self.assertEqual(response.content, expected)
+
+    def test_recipe_list(self):
+        """Pages of recipes match RecipeList items."""
+        schema = self.response_schema('/api/recipes/', 'get', '200')
+        self.assertContract('get', '/api/recipes/', schema)
+        self.assertContract('get', '/api/recipes/?limit=2&page=2', schema)
+
+    def test_recipe_detail(self):
+        """A recipe matches RecipeList."""
+        for recipe in self.recipes:
+            self.assertContract(
+                'get',
+                f'/api/recipes/{recipe.pk}/',
+                self.component('RecipeList'),
+            )
+
+    def test_recipes_by_ids(self):
+        """Recipes by ids keep requested order and report missing ids."""
+        ids = [self.recipes[2].pk, self.recipes[2].pk + 1, self.recipes[0].pk]
+        self.assertContract(
+            'get',
+            f'/api/recipes/?ids={",".join(map(str, ids))}',
+            {
+                'type': 'object',
+                'properties': {
+                    'results': {
+                        'type': 'array',
+                        'items': self.component('RecipeList'),
+                    },
+                    'missing': {'type': 'array', 'items': {'type': 'integer'}},
+                },
+                'required': ['results', 'missing'],
+            },
+        )
+
+    def test_users(self):
+        """Users match User."""
+        self.assertContract(
+            'get',
+            '/api/users/',
+            self.response_schema('/api/users/', 'get', '200'),
+        )
+        self.assertContract(
+            'get',
+            f'/api/users/{self.author.pk}/',
+            self.component('User'),
+        )
+
+    def test_subscriptions(self):
+        """Followed authors match UserWithRecipes items."""
+        del self.clients['anonymous']
+        schema = self.response_schema(
+            '/api/users/subscriptions/',
+            'get',
+            '200',
+        )
+        self.assertContract('get', '/api/users/subscriptions/', schema)
+        self.assertContract(
+            'get',
+            '/api/users/subscriptions/?recipes_limit=2',
+            schema,
+        )
+
+    def test_subscribe(self):
+        """A new subscription matches UserWithRecipes."""
+        Follow.objects.all().delete()
+        self.assertContract(
+            'post',
+            f'/api/users/{self.author.pk}/subscribe/',
+            self.component('UserWithRecipes'),
+            status=201,
+        )
+
+    def test_favorite_and_shopping_cart(self):
+        """Added favorites and carted recipes match RecipeMinified."""
+        for relation in ('favorite', 'shopping_cart'):
+            self.assertContract(
+                'post',
+                f'/api/recipes/{self.recipes[2].pk}/{relation}/',
+                self.component('RecipeMinified'),
+                status=201,
+            )
+
+    def assertSameResponse(self, url, status=200, client='reader'):
+        """Check that every set of serializers returns the same response.
+
+        Return JSON of the response.
+        """
+        expected = None
+        for serializers_name in READ_SERIALIZERS:
+            with self.subTest(
+                url=url,
+                serializers=serializers_name,
+            ), read_serializers(serializers_name):
+                response = self.clients[client].get(url)
+                self.assertEqual(response.status_code, status)
+                if expected is None:
+                    expected = response.content
+                self.assertEqual(response.content, expected)
+        return response.json()
+
+    def test_requested_recipe_fields(self):
+        """Recipes are pruned and have relation ids unless expanded."""
+        recipes = self.assertSameResponse(
+            '/api/recipes/?fields=name,tags,id,author',
+        )['results']
+        for recipe in recipes:
+            self.assertEqual(list(recipe), ['id', 'tags', 'author', 'name'])
+            self.assertEqual(recipe['author'], self.author.pk)
+            self.assertTrue(
+                all(isinstance(tag, int) for tag in recipe['tags']),
+            )
+        recipe = self.assertSameResponse(
+            f'/api/recipes/{self.recipes[0].pk}/?fields=id,tags,author'
+            '&expand=author',
+        )
+        self.assertEqual(recipe['author']['username'], self.author.username)
+        self.assertTrue(all(isinstance(tag, int) for tag in recipe['tags']))
+        recipe = self.assertSameResponse(
+            f'/api/recipes/{self.recipes[0].pk}/?fields=tags&expand=tags',
+        )
+        self.assertEqual(
+            [tag['name'] for tag in recipe['tags']],
+            ['Breakfast', 'Lunch'],
+        )
+
+    def test_requested_user_fields(self):
+        """Users and followed authors are pruned and expanded."""
+        users = self.assertSameResponse(
+            '/api/users/?fields=username,id',
+            client='anonymous',
+        )['results']
+        self.assertEqual(
+            [list(user) for user in users],
+            [['id', 'username']] * 2,
+        )
+        authors = self.assertSameResponse(
+            '/api/users/subscriptions/?fields=id,recipes&recipes_limit=2',
+        )['results']
+        self.assertEqual(
+            authors,
+            [
+                {
+                    'id': self.author.pk,
+                    'recipes': [self.recipes[2].pk, self.recipes[1].pk],
+                },
+            ],
+        )
+        authors = self.assertSameResponse(
+            '/api/users/subscriptions/?fields=recipes&expand=recipes',
+        )['results']
+        self.assertEqual(authors[0]['recipes'][0]['name'], 'Pancakes 2')
+
+    def test_unknown_requested_fields(self):
+        """Unknown fields and relations are rejected."""
+        for url, parameter in (
+            ('/api/recipes/?fields=id,secret', 'fields'),
+            ('/api/recipes/?expand=name', 'expand'),
+            (f'/api/recipes/{self.recipes[0].pk}/?expand=ingredients',
+             'expand'),
+            ('/api/users/?fields=password', 'fields'),
+            ('/api/users/subscriptions/?expand=email', 'expand'),
+        ):
+            self.assertIn(
+                parameter,
+                self.assertSameResponse(url, status=400),
+            )
@@ -0,0 +1,58 @@
+"""Describe tests of rebuilding feeds of followed authors."""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+
+class RebuildFeedsTests(APITestCase):
+    """Check that rebuild_feeds fills feeds missed by fan-outs."""
+
+    def setUp(self):
+        """Create a follower of an author whose recipes were not fanned out."""
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        self.reader = User.objects.create(
+            username='reader',
+            email='reader@example.com',
+        )
+        Follow.objects.create(follower=self.reader, following=self.author)
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author,
+                name=f'Porridge {number}',
+                description='Cook oats.',
+                image='recipes/images/porridge.png',
+                cooking_time=10,
+            )
+            for number in range(3)
+        ]
+        token = Token.objects.create(user=self.reader)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def feed(self):
+        """Return ids of recipes in a feed of the reader."""
+        response = self.client.get('/api/users/feed/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_rebuild_fills_feeds(self):
+        """Missing entries up to FEED_MAX_LENGTH are added by every run."""
+        self.assertEqual(self.feed(), [])
+        with mock.patch('recipes.feed.FEED_MAX_LENGTH', 2):
+            call_command('rebuild_feeds', stdout=mock.Mock())
+        self.assertEqual(
+            self.feed(),
+            [recipe.pk for recipe in reversed(self.recipes[1:])],
+        )
+        call_command('rebuild_feeds', stdout=mock.Mock())
+        self.assertEqual(FeedEntry.objects.count(), 3)
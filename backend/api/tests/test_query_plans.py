@@ -0,0 +1,109 @@
+"""Describe tests of indexes used by plans of hot queries.
+
+Plans are checked on PostgreSQL only, sequential scans are discouraged
+so small test tables still show which indexes a query is able to use.
+"""
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+
+from api.filters import RecipeFilter
+from recipes.models import (Favorite, FeedEntry, IngredientRecipe, Recipe,
+                            ShoppingCart, TagRecipe)
+from recipes.ranking import RANKINGS
+from users.models import Follow
+
+
+def ranking_page(ranking):
+    """Return a page of recipes ordered by a ranking after a cursor."""
+    return RecipeFilter(
+        {'ordering': ranking},
+        queryset=Recipe.objects.all(),
+    ).qs.filter(
+        Q(ranking_score__lt=1.0) | Q(ranking_score=1.0, pk__lt=1),
+        ranking_score__lte=1.0,
+    ).order_by('-ranking_score', '-pk')[:7]
+
+
+def hot_queries():
+    """Return hot queries with names of indexes they are expected to use."""
+    return (
+        (
+            'Recipes feed',
+            Recipe.objects.order_by('-pub_date', 'name')[:6],
+            'recipe_pub_date_name_idx',
+        ),
+        (
+            'Recipes of an author',
+            Recipe.objects.filter(author_id=1).order_by('-pub_date')[:6],
+            'recipe_author_pub_date_idx',
+        ),
+        (
+            'Recipes filtered by tags',
+            Recipe.objects.filter(
+                tag_slugs__overlap=['breakfast'],
+            ).order_by(),
+            'recipe_tag_slugs_gin',
+        ),
+        (
+            'Favorites of a user',
+            Favorite.objects.filter(user_id=1, favorite_recipe_id=1),
+            'unique_favorite',
+        ),
+        (
+            'Shopping cart of a user',
+            ShoppingCart.objects.filter(user_id=1),
+            'unique_good',
+        ),
+        (
+            'Subscription check',
+            Follow.objects.filter(follower_id=1, following_id=2),
+            'unique_follow',
+        ),
+        (
+            'Feed of a user',
+            FeedEntry.objects.filter(user_id=1).order_by(
+                '-pub_date',
+                '-recipe_id',
+            )[:6],
+            'feed_user_pub_date_idx',
+        ),
+        (
+            'Tags of a recipe',
+            TagRecipe.objects.filter(recipe_id=1),
+            'unique_tag_in_recipe',
+        ),
+        (
+            'Ingredient amount in a recipe',
+            IngredientRecipe.objects.filter(ingredient_id=1, recipe_id=1),
+            'unique_ingredient_in_recipe',
+        ),
+    )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Plans need PostgreSQL.')
+class HotQueryPlanTests(TestCase):
+    """Check that hot queries are able to use their indexes."""
+
+    def setUp(self):
+        """Discourage sequential scans until a test transaction ends."""
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_hot_queries_use_indexes(self):
+        """Every hot query is planned with its index."""
+        for name, queryset, index_name in hot_queries():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertIn(index_name, plan, f'{name} plan:\n{plan}')
+
+    def test_ranking_pages_read_index_ranges(self):
+        """Pages of rankings are read in index order without sorting."""
+        for ranking in RANKINGS:
+            with self.subTest(ranking):
+                plan = ranking_page(ranking).explain()
+                self.assertIn(f'ranking_{ranking}_idx', plan, plan)
+                self.assertIn(f'Index Cond: (({ranking} <=', plan, plan)
+                self.assertNotIn('Sort', plan, plan)
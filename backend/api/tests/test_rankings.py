@@ -0,0 +1,267 @@
+"""Describe tests of popular and trending rankings of recipes."""
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from foodgram.settings import DATABASE_REPLICAS, RANKING_CART_WEIGHT
+from recipes.models import (Favorite, Ingredient, RankingRemoval, Recipe,
+                            RecipeRanking, ShoppingCart, Tag)
+from recipes.ranking import HALF_LIFE, WATERMARK_LAG, refresh_rankings
+
+User = get_user_model()
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAAD'
+    'ElEQVR4nGNgYGAAAAAEAAH2FzhVAAAAAElFTkSuQmCC'
+)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+
+class RankingTestCase(TestCase):
+    """Describe recipes of an author and readers who rank them."""
+
+    def setUp(self):
+        """Create recipes and readers without relations."""
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author,
+                name=f'Porridge {number}',
+                description='Cook oats.',
+                image='recipes/images/porridge.png',
+                cooking_time=10,
+            )
+            for number in range(3)
+        ]
+        self.readers = [
+            User.objects.create(
+                username=f'reader{number}',
+                email=f'reader{number}@example.com',
+            )
+            for number in range(3)
+        ]
+
+    def favorite(self, reader, recipe, created=None):
+        """Favorite a recipe at a date old enough to pass a watermark."""
+        favorite = Favorite.objects.create(user=reader, favorite_recipe=recipe)
+        Favorite.objects.filter(pk=favorite.pk).update(
+            created=created or favorite.created - WATERMARK_LAG * 2,
+        )
+        return favorite
+
+    def scores(self):
+        """Return (popular, trending) scores of recipes."""
+        rankings = {
+            ranking.recipe_id: (ranking.popular, round(ranking.trending, 6))
+            for ranking in RecipeRanking.objects.all()
+        }
+        return [rankings.get(recipe.pk) for recipe in self.recipes]
+
+
+class RefreshRankingsTests(RankingTestCase):
+    """Check scores computed by refresh_rankings."""
+
+    def test_history_before_dates(self):
+        """Events dated before rankings count in popularity only."""
+        old = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        self.favorite(self.readers[0], self.recipes[0], created=old)
+        cart = ShoppingCart.objects.create(
+            user=self.readers[0],
+            recipe_in_cart=self.recipes[1],
+        )
+        ShoppingCart.objects.filter(pk=cart.pk).update(created=old)
+        self.favorite(self.readers[1], self.recipes[1])
+        refresh_rankings(full=True)
+        popular, trending = self.scores()[1]
+        self.assertEqual(self.scores()[0], (1.0, 0.0))
+        self.assertEqual(popular, 1.5)
+        self.assertAlmostEqual(
+            trending,
+            2 ** (-WATERMARK_LAG * 2 / HALF_LIFE),
+            places=3,
+        )
+
+
+class RankingRemovalTests(RankingTestCase):
+    """Check that lost favorites and cart additions leave rankings."""
+
+    def setUp(self):
+        """Rank a favorite and cart additions of readers."""
+        super().setUp()
+        lag = mock.patch('recipes.ranking.WATERMARK_LAG', timedelta(0))
+        lag.start()
+        self.addCleanup(lag.stop)
+        self.favorite(self.readers[0], self.recipes[0])
+        for reader in self.readers[:2]:
+            ShoppingCart.objects.create(
+                user=reader,
+                recipe_in_cart=self.recipes[1],
+            )
+        refresh_rankings()
+        self.expected = self.scores()
+        self.client = APIClient()
+        self.client.force_authenticate(self.readers[0])
+
+    def assertRanked(self, favorites, carts):
+        """Refresh rankings and compare popularity with relation counts."""
+        refresh_rankings()
+        self.assertEqual(
+            [popular for popular, trending in self.scores()],
+            [
+                favorites[number] + carts[number] * RANKING_CART_WEIGHT
+                for number in range(len(self.recipes))
+            ],
+        )
+        self.assertFalse(RankingRemoval.objects.exists())
+
+    def test_favorite_again(self):
+        """A favorite deleted and added again counts once."""
+        url = f'/api/recipes/{self.recipes[0].pk}/favorite/'
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertRanked((1, 0, 0), (0, 2, 0))
+        self.assertAlmostEqual(self.scores()[0][1], 1, places=3)
+
+    def test_api_removals(self):
+        """Deleted favorites and cleared carts leave rankings."""
+        self.client.delete(f'/api/recipes/{self.recipes[0].pk}/favorite/')
+        self.client.delete('/api/recipes/shopping_cart/clear/')
+        self.assertRanked((0, 0, 0), (0, 1, 0))
+        self.client.force_authenticate(self.readers[1])
+        self.client.delete(
+            '/api/recipes/shopping_cart/',
+            {'ids': [self.recipes[1].pk]},
+            format='json',
+        )
+        self.assertRanked((0, 0, 0), (0, 0, 0))
+
+    def test_admin_removals(self):
+        """Changed and deleted relations and readers leave rankings."""
+        self.client.force_login(
+            User.objects.create_superuser(
+                username='admin',
+                email='admin@example.com',
+                password='admin',
+            ),
+        )
+        favorite = Favorite.objects.get()
+        self.client.post(
+            f'/admin/recipes/favorite/{favorite.pk}/change/',
+            {
+                'user': self.readers[0].pk,
+                'favorite_recipe': self.recipes[2].pk,
+            },
+        )
+        self.assertRanked((0, 0, 1), (0, 2, 0))
+        self.client.post(
+            f'/admin/users/user/{self.readers[1].pk}/delete/',
+            {'post': 'yes'},
+        )
+        self.assertRanked((0, 0, 1), (0, 1, 0))
+        self.client.post(
+            f'/admin/recipes/favorite/{favorite.pk}/delete/',
+            {'post': 'yes'},
+        )
+        self.assertRanked((0, 0, 0), (0, 1, 0))
+
+
+@override_settings(STORAGES=STORAGES)
+class RankingPageTests(TransactionTestCase):
+    """Check keyset pages of recipes ordered by rankings."""
+
+    databases = {DEFAULT_DB_ALIAS, *DATABASE_REPLICAS}
+
+    def setUp(self):
+        """Rank recipes with ties and log in an author."""
+        background = mock.patch('recipes.tasks.BACKGROUND_TASKS_SYNC', True)
+        background.start()
+        self.addCleanup(background.stop)
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author,
+                name=f'Porridge {number}',
+                description='Cook oats.',
+                image='recipes/images/porridge.png',
+                cooking_time=10,
+            )
+            for number in range(5)
+        ]
+        refresh_rankings()
+        for recipe, popular in zip(self.recipes, (1, 3, 1, 0, 3)):
+            RecipeRanking.objects.filter(recipe=recipe).update(
+                popular=popular,
+            )
+        self.ingredient = Ingredient.objects.create(
+            name='oats',
+            measurement_unit='g',
+        )
+        self.tag = Tag.objects.create(
+            name='Breakfast',
+            slug='breakfast',
+            color='#ffffff',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def walk(self, url):
+        """Return ids of recipes of all pages after a first one."""
+        ids = []
+        while url:
+            page = self.client.get(url).json()
+            ids.extend(recipe['id'] for recipe in page['results'])
+            url = page['next']
+        return ids
+
+    def test_pages(self):
+        """Pages follow scores and ids and lead back with previous links."""
+        ids = [recipe.pk for recipe in self.recipes]
+        expected = [ids[4], ids[1], ids[2], ids[0], ids[3]]
+        self.assertEqual(
+            self.walk('/api/recipes/?ordering=popular&limit=2'),
+            expected,
+        )
+        page = self.client.get(
+            '/api/recipes/?ordering=popular&limit=2',
+        ).json()
+        page = self.client.get(page['next']).json()
+        page = self.client.get(page['previous']).json()
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']],
+            expected[:2],
+        )
+
+    def test_created_recipe(self):
+        """A created recipe is ranked before rankings are refreshed."""
+        response = self.client.post(
+            '/api/recipes/',
+            {
+                'ingredients': [{'id': self.ingredient.pk, 'amount': 10}],
+                'tags': [self.tag.pk],
+                'image': IMAGE,
+                'name': 'Oatmeal',
+                'text': 'Boil oats.',
+                'cooking_time': 5,
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(
+            Recipe.objects.latest('pk').pk,
+            self.walk('/api/recipes/?ordering=trending&limit=2'),
+        )
@@ -0,0 +1,124 @@
+"""Describe tests of routing reads to database replicas.
+
+Run with a replica which mirrors the primary in tests, for example
+`DB_REPLICAS=localhost:5432 python manage.py test api.tests.test_replicas`.
+"""
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram.replicas import STICKY_KEY
+from foodgram.settings import CACHES, DATABASE_REPLICAS
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+CACHE_TABLE = connections[DEFAULT_DB_ALIAS].ops.quote_name(
+    CACHES['default']['LOCATION'],
+)
+
+
+@skipUnless(DATABASE_REPLICAS, 'DB_REPLICAS is not set.')
+class ReplicaRoutingTests(TransactionTestCase):
+    """Check which database serves reads of API requests."""
+
+    databases = {DEFAULT_DB_ALIAS, *DATABASE_REPLICAS}
+
+    def setUp(self):
+        """Create users with tokens and a recipe."""
+        cache.clear()
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        self.reader = User.objects.create(
+            username='reader',
+            email='reader@example.com',
+        )
+        Tag.objects.create(name='Breakfast', slug='breakfast', color='#fff')
+        self.recipe = Recipe.objects.create(
+            author=self.author,
+            name='Porridge',
+            description='Cook oats.',
+            image='recipes/images/porridge.png',
+            cooking_time=10,
+        )
+
+    def client_of(self, user):
+        """Return a client authenticated with a token of a user."""
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}',
+        )
+        return client
+
+    def request(self, client, method, url):
+        """Send a request and return (status, primary, replica queries).
+
+        Queries of a database cache are not counted on the primary, a
+        replica must never serve them.
+        """
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(
+                connections[DATABASE_REPLICAS[0]],
+            ) as replica:
+                response = getattr(client, method)(url)
+        primary = [
+            query for query in primary if CACHE_TABLE not in query['sql']
+        ]
+        return response.status_code, len(primary), len(replica)
+
+    def test_anonymous_list_reads_replica(self):
+        """An opted in action of an anonymous request reads a replica."""
+        self.assertEqual(
+            self.request(APIClient(), 'get', '/api/tags/')[::2],
+            (200, 1),
+        )
+
+    def test_token_is_checked_on_primary(self):
+        """Authentication reads the primary, the action reads a replica."""
+        status, primary, replica = self.request(
+            self.client_of(self.reader),
+            'get',
+            f'/api/recipes/{self.recipe.pk}/',
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(primary, 1)
+        self.assertGreater(replica, 0)
+
+    def test_write_keeps_user_on_primary(self):
+        """Reads of a user who wrote go to the primary, others do not."""
+        writer = self.client_of(self.reader)
+        status, _, replica = self.request(
+            writer,
+            'post',
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+        )
+        self.assertEqual((status, replica), (201, 0))
+        self.assertTrue(cache.get(STICKY_KEY.format(self.reader.pk)))
+
+        status, _, replica = self.request(writer, 'get', '/api/recipes/')
+        self.assertEqual((status, replica), (200, 0))
+        status, _, replica = self.request(
+            self.client_of(self.author),
+            'get',
+            '/api/recipes/',
+        )
+        self.assertEqual(status, 200)
+        self.assertGreater(replica, 0)
+
+    def test_stickiness_expires(self):
+        """A user reads a replica again once a sticky entry expires."""
+        writer = self.client_of(self.reader)
+        self.request(
+            writer,
+            'post',
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+        )
+        cache.delete(STICKY_KEY.format(self.reader.pk))
+        self.assertGreater(self.request(writer, 'get', '/api/recipes/')[2], 0)
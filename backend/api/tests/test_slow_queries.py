@@ -0,0 +1,39 @@
+"""Describe tests of the slow query log."""
+import json
+import logging
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from perf.management.commands.slow_queries import read_entries
+from perf.slow_queries import ProcessRotatingFileHandler
+
+
+class ProcessRotatingFileHandlerTests(SimpleTestCase):
+    """Check that processes write slow queries to their own files."""
+
+    def test_forked_processes(self):
+        """A forked process switches to a file with its own pid."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'slow-queries.log'
+        with mock.patch('os.getpid', return_value=100):
+            handler = ProcessRotatingFileHandler(str(path), delay=True)
+        self.addCleanup(handler.close)
+        for pid in (101, 102, 101):
+            with mock.patch('os.getpid', return_value=pid):
+                handler.emit(
+                    logging.makeLogRecord(
+                        {'msg': json.dumps({'pid': pid})},
+                    ),
+                )
+        self.assertEqual(
+            sorted(file.name for file in Path(directory.name).iterdir()),
+            ['slow-queries.log.101', 'slow-queries.log.102'],
+        )
+        self.assertEqual(
+            sorted(entry['pid'] for entry in read_entries(path)),
+            [101, 101, 102],
+        )
@@ -2,8 +2,15 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
-                       UserViewSet, delete_token, get_token)
+from api.views import delete_token, get_token
+from foodgram.settings import ASYNC_READ_VIEWS
+
+if ASYNC_READ_VIEWS:
+    from api.async_views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                                 UserViewSet)
+else:
+    from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                           UserViewSet)
 
 router = routers.SimpleRouter()
 router.register(
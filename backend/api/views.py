@@ -1,7 +1,7 @@
 """Describe custom views for an Api app."""
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import check_password, make_password
-from django.db.models import Sum
+from django.db import transaction
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
@@ -13,43 +13,68 @@ from rest_framework.response import Response
 
 from api.constants import ErrorMessage, HTTPMethods
 from api.converters import convert_tuples_list_to_pdf
+from api.fast_serializers import (FAVORITE_ROW_FIELDS, FavoriteReadSerializer,
+                                  RecipeReadSerializer,
+                                  SubscriptionReadSerializer,
+                                  UserReadSerializer, read_rows,
+                                  requested_row_fields)
 from api.filters import IngredientSearchFilter, RecipeFilter
-from api.mixins import ListCreateRetrieveViewSet
-from api.pagination import LimitPagination
+from api.mixins import (ListCreateRetrieveViewSet, MultiGetMixin,
+                        RelationToggleMixin)
+from api.pagination import FeedPagination, LimitPagination, RankingPagination
 from api.permissions import AuthorOrReadOnly
-from api.serializers import (FavoriteRecipeSerializer, GetRecipeSerializer,
-                             GetTokenSerializer, GetUserSerializer,
-                             IngredientSerializer, PostRecipeSerializer,
+from api.queries import delete_returning
+from api.serializers import (FAVORITE_RECIPE_FIELDS, GetTokenSerializer,
+                             IngredientSerializer, PantryRecipeSerializer,
+                             PantrySerializer, PostRecipeSerializer,
                              PostUserSerializer, SetPasswordSerializer,
-                             SubscriptionSerializer, TagSerializer)
+                             TagSerializer)
+from foodgram.replicas import ReplicaReadMixin
 from foodgram.settings import PDF_FILE_NAME_SHOPPING_CART
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.facets import cached_facets, count_facets, invalidate_facets
+from recipes.feed import backfill_feed, clear_feed, fan_out_recipe
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.pantry import (get_pantry_index, invalidate_pantry_index,
+                            refresh_pantry_index)
+from recipes.ranking import RANKINGS, record_removals
+from recipes.shopping_list import (add_recipes, clear_list,
+                                   remove_recipe_from_carts, remove_recipes)
+from recipes.similarity import update_similar_recipes
+from recipes.tasks import run_in_background
 from users.models import Follow
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Perform list and retrieve operations for a Tag model."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
+    replica_actions = ('list', 'retrieve')
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Perform list and retrieve operations for an Ingredient model."""
 
-    queryset = Ingredient.objects.all()
+    queryset = Ingredient.objects.order_by('name', 'measurement_unit')
     filter_backends = (IngredientSearchFilter,)
     serializer_class = IngredientSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
+    replica_actions = ('list', 'retrieve')
     search_fields = ('name',)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ReplicaReadMixin,
+    MultiGetMixin,
+    RelationToggleMixin,
+    viewsets.ModelViewSet,
+):
     """Perform CRUD operations for a Recipe model."""
 
     queryset = Recipe.objects.all()
@@ -57,6 +82,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     permission_classes = (AuthorOrReadOnly,)
     filterset_class = RecipeFilter
+    replica_actions = ('list', 'retrieve')
     http_method_names = (
         HTTPMethods.GET,
         HTTPMethods.POST,
@@ -64,16 +90,77 @@ class RecipeViewSet(viewsets.ModelViewSet):
         HTTPMethods.DELETE,
     )
 
+    @property
+    def paginator(self):
+        """Use keyset pagination when recipes are ordered by a ranking."""
+        if not hasattr(self, '_paginator'):
+            if (
+                self.action == 'list'
+                and self.request.query_params.get('ordering') in RANKINGS
+            ):
+                self._paginator = RankingPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
     def perform_create(self, serializer):
         """Perform actions during save an instance of a user."""
-        serializer.save(
+        recipe = serializer.save(
             author=self.request.user,
         )
+        run_in_background(fan_out_recipe, recipe.pk)
+        run_in_background(update_similar_recipes, (recipe.pk,))
+        run_in_background(refresh_pantry_index, (recipe.pk,))
+        invalidate_pantry_index()
+        invalidate_facets()
+
+    def perform_update(self, serializer):
+        """Perform actions during update an instance of a recipe."""
+        recipe = serializer.save()
+        run_in_background(update_similar_recipes, (recipe.pk,))
+        run_in_background(refresh_pantry_index, (recipe.pk,))
+        invalidate_pantry_index()
+        invalidate_facets()
+
+    def perform_destroy(self, instance):
+        """Perform actions during delete an instance of a recipe."""
+        recipe_id = instance.pk
+        with transaction.atomic():
+            remove_recipe_from_carts(recipe_id)
+            instance.delete()
+        run_in_background(refresh_pantry_index, (recipe_id,))
+        invalidate_pantry_index()
+        invalidate_facets()
+
+    def get_queryset(self):
+        """Read rows of recipes for list and retrieve actions."""
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return read_rows(
+                queryset,
+                requested_row_fields(RecipeReadSerializer, self.request),
+            )
+        return queryset
+
+    def relations_added(self, relation_model, target_ids):
+        """Add ingredients of recipes added in a cart to a shopping list."""
+        if relation_model is ShoppingCart:
+            add_recipes(self.request.user.pk, target_ids)
+
+    def relations_deleted(self, relation_model, target_ids):
+        """Subtract ingredients of recipes deleted from a cart.
+
+        Rankings of recipes which lost favorites or cart additions are
+        queued for recomputing.
+        """
+        if relation_model is ShoppingCart:
+            remove_recipes(self.request.user.pk, target_ids)
+        record_removals(target_ids)
 
     def get_serializer_class(self):
         """Choose a serializer class depend on a method."""
         if self.action in ('list', 'retrieve'):
-            return GetRecipeSerializer
+            return RecipeReadSerializer
         return PostRecipeSerializer
 
     @action(
@@ -82,81 +169,177 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, pk=None):
         """Process requests for add in and delete from favorites."""
-        recipe = get_object_or_404(Recipe, pk=pk)
+        return self.toggle_relation(
+            request,
+            pk,
+            relation_model=Favorite,
+            user_field='user',
+            target_field='favorite_recipe',
+            target_queryset=Recipe.objects.only(*FAVORITE_RECIPE_FIELDS),
+            serializer_class=FavoriteReadSerializer,
+            already_exists_message=ErrorMessage.RECIPE_IN_FAVORITES,
+        )
 
-        favorite_chain = Favorite.objects.filter(
-            favorite_recipe=recipe,
-            user=request.user,
+    @action(
+        (HTTPMethods.POST, HTTPMethods.DELETE),
+        detail=True,
+    )
+    @transaction.atomic
+    def shopping_cart(self, request, pk=None):
+        """Process requests for add in and delete from shopping cart."""
+        return self.toggle_relation(
+            request,
+            pk,
+            relation_model=ShoppingCart,
+            user_field='user',
+            target_field='recipe_in_cart',
+            target_queryset=Recipe.objects.only(*FAVORITE_RECIPE_FIELDS),
+            serializer_class=FavoriteReadSerializer,
+            already_exists_message=ErrorMessage.ALREADY_IN_SHOPPING_CART,
         )
-        if (
-            request.method.lower() == HTTPMethods.DELETE
-            and favorite_chain.exists()
-        ):
-            favorite_chain.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if (
-            request.method.lower() == HTTPMethods.POST
-            and favorite_chain.exists()
-        ):
-            raise serializers.ValidationError(
-                {'errors': ErrorMessage.RECIPE_IN_FAVORITES},
-            )
+    @action(
+        (HTTPMethods.GET,),
+        detail=True,
+    )
+    def similar(self, request, pk=None):
+        """Process './similar' endpoint with precomputed similar recipes."""
+        similar_recipes = Recipe.objects.filter(
+            neighbour_of__recipe_id=pk,
+        ).order_by('-neighbour_of__score').only(*FAVORITE_RECIPE_FIELDS)
+        serializer = FavoriteReadSerializer(
+            read_rows(similar_recipes, FAVORITE_ROW_FIELDS),
+            many=True,
+        )
+        if not serializer.data:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-        if request.method.lower() == HTTPMethods.DELETE:
-            raise serializers.ValidationError(
-                {'errors': ErrorMessage.NOTHING_TO_DELETE},
-            )
+    def recipe_filterset(self, params):
+        """Return a validated filterset of recipes for query params."""
+        filterset = RecipeFilter(
+            params,
+            queryset=Recipe.objects.all(),
+            request=self.request,
+        )
+        if not filterset.is_valid():
+            raise serializers.ValidationError(filterset.errors)
+        return filterset
 
-        Favorite.objects.create(
-            favorite_recipe=recipe,
-            user=request.user,
+    @action(
+        (HTTPMethods.GET,),
+        detail=False,
+    )
+    def facets(self, request):
+        """Process './facets' endpoint with counts of tags and ingredients.
+
+        Counts depend on filters of a list except ordering. Facets which
+        are not filtered by favorites or shopping cart are cached.
+        """
+        params = request.query_params.copy()
+        params.pop('ordering', None)
+        filterset = self.recipe_filterset(params)
+        params.pop('tags', None)
+        untagged = self.recipe_filterset(params)
+
+        def count():
+            return count_facets(untagged.qs, filterset.qs)
+
+        filters = filterset.form.cleaned_data
+        if any(
+            filters.get(name) is not None
+            for name in ('is_favorited', 'is_in_shopping_cart')
+        ):
+            return Response(count(), status=status.HTTP_200_OK)
+        author = filters.get('author')
+        tags = sorted(tag.slug for tag in filters.get('tags') or ())
+        return Response(
+            cached_facets(
+                f'author={author.pk if author else ""}:tags={",".join(tags)}',
+                count,
+            ),
+            status=status.HTTP_200_OK,
+        )
+
+    @action(
+        (HTTPMethods.GET,),
+        detail=False,
+    )
+    def pantry(self, request):
+        """Process './pantry' endpoint with recipes from owned ingredients."""
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        matches = get_pantry_index().match(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data['exclude'],
+            serializer.validated_data['limit'],
         )
+        recipes = Recipe.objects.only(*FAVORITE_RECIPE_FIELDS).in_bulk(
+            [recipe_id for recipe_id, _, _ in matches],
+        )
+        matched_recipes = []
+        for recipe_id, coverage, matched in matches:
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.coverage = round(coverage, 4)
+                recipe.matched = matched
+                matched_recipes.append(recipe)
         return Response(
-            FavoriteRecipeSerializer(recipe).data,
-            status=status.HTTP_201_CREATED,
+            PantryRecipeSerializer(matched_recipes, many=True).data,
+            status=status.HTTP_200_OK,
         )
 
     @action(
         (HTTPMethods.POST, HTTPMethods.DELETE),
-        detail=True,
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
     )
-    def shopping_cart(self, request, pk=None):
-        """Process requests for add in and delete from favorites."""
-        recipe = get_object_or_404(Recipe, pk=pk)
-
-        recipe_in_shopping_cart = ShoppingCart.objects.filter(
-            recipe_in_cart=recipe,
-            user=request.user,
+    def favorite_batch(self, request):
+        """Process requests for add in and delete from favorites by ids."""
+        return self.toggle_relations(
+            request,
+            relation_model=Favorite,
+            user_field='user',
+            target_field='favorite_recipe',
+            target_queryset=Recipe.objects.all(),
         )
-        if (
-            request.method.lower() == HTTPMethods.DELETE
-            and recipe_in_shopping_cart.exists()
-        ):
-            recipe_in_shopping_cart.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if (
-            request.method.lower() == HTTPMethods.POST
-            and recipe_in_shopping_cart.exists()
-        ):
-            raise serializers.ValidationError(
-                {'errors': ErrorMessage.ALREADY_IN_SHOPPING_CART},
-            )
-
-        if request.method.lower() == HTTPMethods.DELETE:
-            raise serializers.ValidationError(
-                {'errors': ErrorMessage.NOTHING_TO_DELETE},
-            )
-
-        ShoppingCart.objects.create(
-            recipe_in_cart=recipe,
-            user=request.user,
+    @action(
+        (HTTPMethods.POST, HTTPMethods.DELETE),
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+    )
+    @transaction.atomic
+    def shopping_cart_batch(self, request):
+        """Process requests for add in and delete from shopping cart by ids."""
+        return self.toggle_relations(
+            request,
+            relation_model=ShoppingCart,
+            user_field='user',
+            target_field='recipe_in_cart',
+            target_queryset=Recipe.objects.all(),
         )
-        return Response(
-            FavoriteRecipeSerializer(recipe).data,
-            status=status.HTTP_201_CREATED,
+
+    @action(
+        (HTTPMethods.DELETE,),
+        detail=False,
+        url_path='shopping_cart/clear',
+        url_name='shopping-cart-clear',
+    )
+    @transaction.atomic
+    def clear_shopping_cart(self, request):
+        """Delete all recipes from shopping cart."""
+        record_removals(
+            delete_returning(
+                ShoppingCart,
+                'recipe_in_cart',
+                user=request.user.pk,
+            ),
         )
+        clear_list(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         (HTTPMethods.GET,),
@@ -164,16 +347,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def download_shopping_cart(self, request):
         """Process PDF downloading for ingredients in shopping cart."""
-        ingredients = Ingredient.objects.filter(
-            recipes__recipe__added_to_cart__user=request.user,
-        ).annotate(
-            amount=Sum('recipes__recipe__ingredient_recipe__quantity'),
-        )
-        ingredients = ingredients.values_list(
-            'name',
-            'amount',
-            'measurement_unit',
-        )
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user,
+        ).values_list(
+            'ingredient__name',
+            'total',
+            'ingredient__measurement_unit',
+        ).order_by('ingredient__name', 'ingredient__measurement_unit')
         pdf_ingredients = convert_tuples_list_to_pdf(
             ingredients,
             'Ingredients',
@@ -185,12 +365,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
 
-class UserViewSet(ListCreateRetrieveViewSet):
+class UserViewSet(
+    ReplicaReadMixin,
+    MultiGetMixin,
+    RelationToggleMixin,
+    ListCreateRetrieveViewSet,
+):
     """Perform CRUD operations for User model."""
 
     queryset = User.objects.all()
     pagination_class = LimitPagination
     permission_classes = (permissions.AllowAny,)
+    replica_actions = ('list', 'retrieve', 'subscriptions')
 
     @action(
         (HTTPMethods.GET,),
@@ -199,7 +385,7 @@ class UserViewSet(ListCreateRetrieveViewSet):
     )
     def me(self, request):
         """Process './me' endpoint."""
-        serializer = GetUserSerializer(
+        serializer = UserReadSerializer(
             request.user, context={'request': request},
         )
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -230,8 +416,13 @@ class UserViewSet(ListCreateRetrieveViewSet):
     def subscriptions(self, request):
         """Process './subscriptions' endpoint."""
         subscriptions = User.objects.filter(followings__follower=request.user)
-        page = self.paginate_queryset(subscriptions)
-        serializer = SubscriptionSerializer(
+        page = self.paginate_queryset(
+            read_rows(
+                subscriptions,
+                requested_row_fields(SubscriptionReadSerializer, request),
+            ),
+        )
+        serializer = SubscriptionReadSerializer(
             page,
             many=True,
             context={'request': request},
@@ -239,6 +430,45 @@ class UserViewSet(ListCreateRetrieveViewSet):
 
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        (HTTPMethods.GET,),
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Process './feed' endpoint with recipes of followed authors.
+
+        A page of entries is read by the feed index, recipes of the page
+        are read as rows like the recipe list.
+        """
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user).values(
+                'recipe_id',
+                'pub_date',
+            ),
+            request,
+            view=self,
+        )
+        recipes = {
+            recipe['id'] if isinstance(recipe, dict) else recipe.pk: recipe
+            for recipe in read_rows(
+                Recipe.objects.filter(
+                    pk__in=[entry['recipe_id'] for entry in page],
+                ).order_by(),
+                requested_row_fields(RecipeReadSerializer, request),
+            )
+        }
+        serializer = RecipeReadSerializer(
+            [
+                recipes[entry['recipe_id']] for entry in page
+                if entry['recipe_id'] in recipes
+            ],
+            many=True,
+            context={'request': request},
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         (HTTPMethods.POST, HTTPMethods.DELETE),
         detail=True,
@@ -246,56 +476,71 @@ class UserViewSet(ListCreateRetrieveViewSet):
     )
     def subscribe(self, request, pk=None):
         """Process requests for add in and delete from subscriptions."""
-        user_to_follow = get_object_or_404(User, id=pk)
-        follower_following_chain = Follow.objects.filter(
-            follower=request.user,
-            following=user_to_follow,
-        )
-
-        if (
-            request.method.lower() == HTTPMethods.DELETE
-            and follower_following_chain.exists()
-        ):
-            follower_following_chain.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-
         if (
             request.method.lower() == HTTPMethods.POST
-            and follower_following_chain.exists()
+            and str(request.user.pk) == pk
         ):
-            raise serializers.ValidationError(
-                {'errors': ErrorMessage.ALREADY_SUBSCRIBED},
-            )
-
-        if request.method.lower() == HTTPMethods.DELETE:
-            raise serializers.ValidationError(
-                {'errors': ErrorMessage.NOTHING_TO_DELETE},
-            )
-
-        if request.user == user_to_follow:
             raise serializers.ValidationError(
                 {'errors': ErrorMessage.CANNOT_FOLLOW_YOURSELF},
             )
-
-        Follow.objects.create(
-            follower=request.user,
-            following=user_to_follow,
+        return self.toggle_relation(
+            request,
+            pk,
+            relation_model=Follow,
+            user_field='follower',
+            target_field='following',
+            target_queryset=User.objects.all(),
+            serializer_class=SubscriptionReadSerializer,
+            already_exists_message=ErrorMessage.ALREADY_SUBSCRIBED,
         )
-        return Response(
-            SubscriptionSerializer(user_to_follow).data,
-            status=status.HTTP_201_CREATED,
+
+    @action(
+        (HTTPMethods.POST, HTTPMethods.DELETE),
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+        url_path='subscribe',
+        url_name='subscribe-batch',
+    )
+    def subscribe_batch(self, request):
+        """Process requests for add in and delete from subscriptions by ids."""
+        return self.toggle_relations(
+            request,
+            relation_model=Follow,
+            user_field='follower',
+            target_field='following',
+            target_queryset=User.objects.all(),
+            forbidden_ids=(request.user.pk,),
         )
 
+    def relations_added(self, relation_model, target_ids):
+        """Fill a feed with recipes of new followed authors."""
+        for author_id in target_ids:
+            run_in_background(backfill_feed, self.request.user.pk, author_id)
+
+    def relations_deleted(self, relation_model, target_ids):
+        """Delete recipes of unfollowed authors from a feed."""
+        clear_feed(self.request.user.pk, target_ids)
+
     def perform_create(self, serializer):
         """Perform actions during save an instance of a user."""
         serializer.save(
             password=make_password(serializer.validated_data['password']),
         )
 
+    def get_queryset(self):
+        """Read rows of users for list and retrieve actions."""
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return read_rows(
+                queryset,
+                requested_row_fields(UserReadSerializer, self.request),
+            )
+        return queryset
+
     def get_serializer_class(self):
         """Choose a serializer class depend on a method."""
         if self.action in ('list', 'retrieve'):
-            return GetUserSerializer
+            return UserReadSerializer
         return PostUserSerializer
 
 
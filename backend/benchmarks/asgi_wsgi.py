@@ -0,0 +1,133 @@
+"""Describe a load benchmark of WSGI and ASGI deployments of read views.
+
+Both deployments are started with gunicorn on local ports, then every
+deployment is loaded by 50, 200 and 1000 concurrent keep-alive clients
+requesting read endpoints round-robin. Throughput, latency percentiles
+and errors are printed as a table.
+
+Run from the backend directory with a configured database:
+
+    python -m benchmarks.asgi_wsgi --token <token> --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from benchmarks.load import load, start_server, stop_server
+
+DEFAULT_PATHS = (
+    '/api/recipes/?limit=6',
+    '/api/recipes/{recipe_id}/',
+    '/api/tags/',
+    '/api/ingredients/?name=a',
+)
+AUTHENTICATED_PATHS = (
+    '/api/users/me/',
+    '/api/users/subscriptions/?limit=6',
+)
+SERVERS = {
+    'wsgi': ('foodgram.wsgi',),
+    'asgi': (
+        'foodgram.asgi:application',
+        '--worker-class',
+        'uvicorn.workers.UvicornWorker',
+    ),
+}
+
+
+def start_interface(interface, port, workers, threads):
+    """Start gunicorn serving one of the interfaces."""
+    arguments = [*SERVERS[interface], '--workers', str(workers)]
+    if interface == 'wsgi':
+        arguments += [
+            '--worker-class',
+            'gthread' if threads > 1 else 'sync',
+            '--threads',
+            str(threads),
+        ]
+    return start_server(arguments, port, {'SERVER_INTERFACE': interface})
+
+
+def parse_arguments():
+    """Describe command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--interfaces',
+        nargs='+',
+        choices=tuple(SERVERS),
+        default=tuple(SERVERS),
+    )
+    parser.add_argument(
+        '--clients',
+        nargs='+',
+        type=int,
+        default=(50, 200, 1000),
+    )
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument(
+        '--threads',
+        type=int,
+        default=1,
+        help='Threads of every WSGI worker.',
+    )
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--recipe-id', type=int, default=1)
+    parser.add_argument(
+        '--token',
+        help='Auth token, authenticated endpoints are added with it.',
+    )
+    parser.add_argument('--output', help='Save results as JSON.')
+    return parser.parse_args()
+
+
+def main():
+    """Benchmark every interface with every amount of clients."""
+    arguments = parse_arguments()
+    paths = [
+        path.format(recipe_id=arguments.recipe_id) for path in DEFAULT_PATHS
+    ]
+    headers = {}
+    if arguments.token:
+        paths += AUTHENTICATED_PATHS
+        headers['Authorization'] = f'Token {arguments.token}'
+
+    results = []
+    for interface in arguments.interfaces:
+        process = start_interface(
+            interface,
+            arguments.port,
+            arguments.workers,
+            arguments.threads,
+        )
+        url = f'http://127.0.0.1:{arguments.port}'
+        try:
+            asyncio.run(
+                load(url, paths, 10, arguments.warmup, headers),
+            )
+            for clients in arguments.clients:
+                result = asyncio.run(
+                    load(url, paths, clients, arguments.duration, headers),
+                )
+                result['interface'] = interface
+                results.append(result)
+                print(
+                    f'{interface:5} {clients:5} clients '
+                    f'{result["rps"]:8} rps  '
+                    f'p50 {result["p50_ms"]} ms  '
+                    f'p99 {result["p99_ms"]} ms  '
+                    f'errors {result["errors"]}',
+                    flush=True,
+                )
+        finally:
+            stop_server(process)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
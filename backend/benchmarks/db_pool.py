@@ -0,0 +1,104 @@
+"""Describe a load benchmark of database connection handling.
+
+A WSGI deployment is started with gunicorn for every mode: a connection
+per request, persistent connections and a pool of connections of every
+worker. Every mode is loaded by concurrent keep-alive clients requesting
+read endpoints round-robin, throughput and latency percentiles are printed.
+
+Run from the backend directory with a configured database:
+
+    python -m benchmarks.db_pool --clients 20 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from benchmarks.load import load, start_server, stop_server
+
+PATHS = (
+    '/api/recipes/?limit=6',
+    '/api/recipes/{recipe_id}/',
+    '/api/tags/',
+    '/api/ingredients/?name=a',
+)
+MODES = {
+    'per-request': {'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_CONN_MAX_AGE': '60'},
+    'pool': {'DB_ENGINE': 'foodgram.postgresql_pool'},
+}
+
+
+def parse_arguments():
+    """Describe command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--modes',
+        nargs='+',
+        choices=tuple(MODES),
+        default=tuple(MODES),
+    )
+    parser.add_argument(
+        '--clients',
+        nargs='+',
+        type=int,
+        default=(20,),
+    )
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--recipe-id', type=int, default=1)
+    parser.add_argument('--output', help='Save results as JSON.')
+    return parser.parse_args()
+
+
+def main():
+    """Benchmark every mode with every amount of clients."""
+    arguments = parse_arguments()
+    paths = [path.format(recipe_id=arguments.recipe_id) for path in PATHS]
+    server = [
+        'foodgram.wsgi',
+        '--workers',
+        str(arguments.workers),
+        '--worker-class',
+        'gthread',
+        '--threads',
+        str(arguments.threads),
+    ]
+
+    results = []
+    for mode in arguments.modes:
+        process = start_server(
+            server,
+            arguments.port,
+            {'SERVER_INTERFACE': 'wsgi', **MODES[mode]},
+        )
+        url = f'http://127.0.0.1:{arguments.port}'
+        try:
+            asyncio.run(load(url, paths, 10, arguments.warmup, {}))
+            for clients in arguments.clients:
+                result = asyncio.run(
+                    load(url, paths, clients, arguments.duration, {}),
+                )
+                result['mode'] = mode
+                results.append(result)
+                print(
+                    f'{mode:12} {clients:5} clients '
+                    f'{result["rps"]:8} rps  '
+                    f'p50 {result["p50_ms"]} ms  '
+                    f'p99 {result["p99_ms"]} ms  '
+                    f'errors {result["errors"]}',
+                    flush=True,
+                )
+        finally:
+            stop_server(process)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
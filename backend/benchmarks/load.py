@@ -0,0 +1,141 @@
+"""Describe a keep-alive load generator shared by server benchmarks."""
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from statistics import quantiles
+from urllib.parse import urlsplit
+
+
+class Client:
+    """Describe a keep-alive HTTP/1.1 client connection."""
+
+    def __init__(self, host, port, headers):
+        """Remember a server address and extra request headers."""
+        self.host = host
+        self.port = port
+        self.headers = ''.join(
+            f'{name}: {value}\r\n' for name, value in headers.items()
+        )
+        self.reader = self.writer = None
+
+    async def close(self):
+        """Close a connection if it is open."""
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def get(self, path):
+        """Request a path and return a status code of a response."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host,
+                self.port,
+            )
+        self.writer.write(
+            (
+                f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\n'
+                f'{self.headers}\r\n'
+            ).encode(),
+        )
+        await self.writer.drain()
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {
+            name.lower(): value.strip()
+            for name, _, value in (line.partition(':') for line in lines[1:])
+        }
+        await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status
+
+
+async def run_client(client, paths, offset, deadline, latencies, errors):
+    """Request paths round-robin until a deadline."""
+    index = offset
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await client.get(paths[index % len(paths)])
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors.append(None)
+            await client.close()
+            await asyncio.sleep(0.01)
+            continue
+        if status >= 400:
+            errors.append(status)
+        else:
+            latencies.append(time.perf_counter() - started)
+        index += 1
+    await client.close()
+
+
+async def load(url, paths, clients, duration, headers):
+    """Load a server with concurrent clients and return statistics."""
+    address = urlsplit(url)
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(
+        *(
+            run_client(
+                Client(address.hostname, address.port, headers),
+                paths,
+                offset,
+                deadline,
+                latencies,
+                errors,
+            )
+            for offset in range(clients)
+        ),
+    )
+    percentiles = quantiles(latencies, n=100) if len(latencies) > 1 else []
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentiles[49] * 1000, 1) if percentiles else None,
+        'p99_ms': round(percentiles[98] * 1000, 1) if percentiles else None,
+    }
+
+
+def wait_for_port(port, timeout=30):
+    """Wait until a server accepts connections."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as probe:
+            if probe.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start.')
+
+
+def start_server(arguments, port, env=None):
+    """Start gunicorn in a new session and wait until it listens."""
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'gunicorn',
+            *arguments,
+            '--bind',
+            f'127.0.0.1:{port}',
+            '--log-level',
+            'warning',
+        ],
+        env={**os.environ, **(env or {})},
+        start_new_session=True,
+    )
+    wait_for_port(port)
+    return process
+
+
+def stop_server(process):
+    """Stop gunicorn and its workers."""
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=30)
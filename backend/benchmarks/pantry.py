@@ -0,0 +1,116 @@
+"""Describe a benchmark of matching recipes by owned ingredients.
+
+A synthetic index of recipes with power law distributed ingredients is
+built in memory, then random owned ingredient sets of every size are
+matched. Percentiles of a match time are printed against a target.
+
+Run from the backend directory, no database rows are needed:
+
+    python -m benchmarks.pantry --recipes 1000000 --owned 5 10 20 50
+"""
+import argparse
+import json
+import os
+import time
+
+import django
+import numpy as np
+
+
+def parse_arguments():
+    """Describe command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=1_000_000)
+    parser.add_argument('--ingredients', type=int, default=2200)
+    parser.add_argument(
+        '--recipe-size',
+        nargs=2,
+        type=int,
+        default=(3, 15),
+        help='Bounds of an amount of ingredients in a recipe.',
+    )
+    parser.add_argument(
+        '--owned',
+        nargs='+',
+        type=int,
+        default=(5, 10, 20, 50),
+        help='Sizes of owned ingredient sets.',
+    )
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--target-ms', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Save results as JSON.')
+    return parser.parse_args()
+
+
+def percentile_ms(durations, percent):
+    """Return a percentile of durations in milliseconds."""
+    return round(float(np.percentile(durations, percent)) * 1000, 2)
+
+
+def main():
+    """Build a synthetic index and time matching of owned ingredients."""
+    arguments = parse_arguments()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    from recipes.pantry import PantryIndex
+    from recipes.seed import power_law_weights, sample_pairs
+
+    rng = np.random.default_rng(arguments.seed)
+    weights = power_law_weights(rng, arguments.ingredients)
+    recipes, ingredients = sample_pairs(
+        rng,
+        arguments.recipes,
+        rng.integers(
+            *arguments.recipe_size,
+            endpoint=True,
+            size=arguments.recipes,
+        ),
+        weights,
+    )
+    index = PantryIndex()
+    started = time.perf_counter()
+    index.build_from_pairs(np.stack((recipes + 1, ingredients + 1), axis=1))
+    print(
+        f'built {len(index.recipe_ids)} recipes, {len(index.dense)} dense '
+        f'and {len(index.sparse)} sparse ingredients in '
+        f'{time.perf_counter() - started:.1f} s',
+        flush=True,
+    )
+
+    results = []
+    for owned_amount in arguments.owned:
+        durations = []
+        for _ in range(arguments.repeat):
+            owned = rng.choice(
+                arguments.ingredients,
+                size=owned_amount,
+                replace=False,
+                p=weights,
+            ) + 1
+            started = time.perf_counter()
+            index.match(owned.tolist(), limit=arguments.limit)
+            durations.append(time.perf_counter() - started)
+        result = {
+            'owned': owned_amount,
+            'p50_ms': percentile_ms(durations, 50),
+            'p95_ms': percentile_ms(durations, 95),
+            'p99_ms': percentile_ms(durations, 99),
+        }
+        result['within_target'] = result['p99_ms'] < arguments.target_ms
+        results.append(result)
+        print(
+            f'owned {owned_amount:3} p50 {result["p50_ms"]:7} ms '
+            f'p95 {result["p95_ms"]:7} ms p99 {result["p99_ms"]:7} ms'
+            + ('' if result['within_target'] else '  over target'),
+            flush=True,
+        )
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
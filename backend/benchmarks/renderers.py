@@ -0,0 +1,152 @@
+"""Describe a benchmark of JSON and MessagePack renderers and parsers.
+
+Pages of recipes and the whole ingredient list are read from a configured
+database and rendered by every renderer, a recipe with a base64 image is
+parsed by every parser. Mean times, sizes and whether fast JSON matches
+JSONRenderer byte for byte are printed.
+
+Run from the backend directory with a seeded database:
+
+    python -m benchmarks.renderers --recipes 20 100 --repeat 200
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import timeit
+
+import django
+
+
+def parse_arguments():
+    """Describe command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--recipes',
+        nargs='+',
+        type=int,
+        default=(20, 100),
+        help='Sizes of rendered pages of recipes.',
+    )
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument(
+        '--image-kib',
+        type=int,
+        default=256,
+        help='Size of an image of a parsed recipe.',
+    )
+    parser.add_argument('--output', help='Save results as JSON.')
+    return parser.parse_args()
+
+
+def payloads(recipe_amounts):
+    """Return list payloads by their names."""
+    from api.fast_serializers import RECIPE_ROW_FIELDS, FastRecipeSerializer
+    from api.serializers import IngredientSerializer
+    from recipes.models import Ingredient, Recipe
+
+    result = {}
+    for amount in recipe_amounts:
+        rows = Recipe.objects.values(*RECIPE_ROW_FIELDS)[:amount]
+        result[f'{amount} recipes'] = {
+            'count': amount,
+            'next': None,
+            'previous': None,
+            'results': FastRecipeSerializer(rows, many=True).data,
+        }
+    result['ingredients'] = IngredientSerializer(
+        Ingredient.objects.order_by('name', 'measurement_unit'),
+        many=True,
+    ).data
+    return result
+
+
+def recipe_body(image_kib):
+    """Return a recipe which is created with a base64 image."""
+    from recipes.models import Ingredient, Tag
+
+    image = base64.b64encode(os.urandom(image_kib * 1024)).decode()
+    return {
+        'name': 'Benchmark recipe',
+        'text': 'Benchmark recipe description.',
+        'cooking_time': 10,
+        'image': f'data:image/png;base64,{image}',
+        'tags': list(Tag.objects.values_list('pk', flat=True)[:2]),
+        'ingredients': [
+            {'id': pk, 'amount': 10}
+            for pk in Ingredient.objects.values_list('pk', flat=True)[:10]
+        ],
+    }
+
+
+def mean_ms(function, repeat):
+    """Return a mean time of a function call in milliseconds."""
+    return round(timeit.timeit(function, number=repeat) / repeat * 1000, 3)
+
+
+def main():
+    """Benchmark renderers on list payloads and parsers on a recipe."""
+    arguments = parse_arguments()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from api.parsers import FastJSONParser, MessagePackParser
+    from api.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+    renderers = {'json': JSONRenderer(), 'fast-json': FastJSONRenderer()}
+    parsers = {'json': JSONParser(), 'fast-json': FastJSONParser()}
+    if msgpack is not None:
+        renderers['msgpack'] = MessagePackRenderer()
+        parsers['msgpack'] = MessagePackParser()
+    results = []
+    for payload_name, data in payloads(arguments.recipes).items():
+        reference = renderers['json'].render(data)
+        for name, renderer in renderers.items():
+            rendered = renderer.render(data)
+            result = {
+                'payload': payload_name,
+                'renderer': name,
+                'render_ms': mean_ms(
+                    lambda: renderer.render(data),
+                    arguments.repeat,
+                ),
+                'bytes': len(rendered),
+                'identical': rendered == reference if 'json' in name else None,
+            }
+            results.append(result)
+            print(
+                f'render {payload_name:12} {name:10} '
+                f'{result["render_ms"]:8} ms {result["bytes"]:9} bytes'
+                + ('  identical' if result['identical'] else ''),
+                flush=True,
+            )
+
+    body = recipe_body(arguments.image_kib)
+    for name, parser in parsers.items():
+        content = renderers[name].render(body)
+        result = {
+            'payload': f'recipe with {arguments.image_kib} KiB image',
+            'parser': name,
+            'parse_ms': mean_ms(
+                lambda: parser.parse(io.BytesIO(content)),
+                arguments.repeat,
+            ),
+            'bytes': len(content),
+        }
+        results.append(result)
+        print(
+            f'parse  {name:10} {result["parse_ms"]:8} ms '
+            f'{result["bytes"]:9} bytes',
+            flush=True,
+        )
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
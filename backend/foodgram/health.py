@@ -0,0 +1,102 @@
+"""Describe liveness and readiness probes which do not touch the ORM."""
+import socket
+import time
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.apps import apps
+from django.db import connections
+from django.http import JsonResponse
+
+from foodgram.postgresql_pool import pooled_aliases
+from foodgram.settings import (DATABASES, HEALTH_CHECK_CACHE_SECONDS,
+                               HEALTH_CHECK_DATABASE_TIMEOUT,
+                               HEALTH_LIVENESS_PATH, HEALTH_POOL_PATH,
+                               HEALTH_READINESS_PATH)
+
+
+class HealthCheckMiddleware:
+    """Answer probes before host validation, sessions and authentication.
+
+    Liveness only shows that a worker serves requests. Readiness also
+    checks that apps are loaded and a database accepts TCP connections,
+    the database check is cached for HEALTH_CHECK_CACHE_SECONDS. Pool
+    statistics of a worker are exported for pooled databases.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Remember the next handler and adapt to its kind."""
+        self.get_response = get_response
+        self.database_checked_at = None
+        self.database_reachable = False
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_database_reachable(self):
+        """Connect to a database host and port without a database session."""
+        host = DATABASES['default'].get('HOST')
+        if not host:
+            return True
+        now = time.monotonic()
+        if (
+            self.database_checked_at is None
+            or now - self.database_checked_at > HEALTH_CHECK_CACHE_SECONDS
+        ):
+            try:
+                with socket.create_connection(
+                    (host, int(DATABASES['default'].get('PORT') or 5432)),
+                    timeout=HEALTH_CHECK_DATABASE_TIMEOUT,
+                ):
+                    self.database_reachable = True
+            except OSError:
+                self.database_reachable = False
+            self.database_checked_at = now
+        return self.database_reachable
+
+    def readiness(self):
+        """Build a readiness response."""
+        checks = {
+            'apps': apps.ready,
+            'database': self.is_database_reachable(),
+        }
+        return JsonResponse(
+            {'status': 'ok' if all(checks.values()) else 'fail', **checks},
+            status=200 if all(checks.values()) else 503,
+        )
+
+    def pool_stats(self):
+        """Build a response with statistics of database pools of a worker."""
+        return JsonResponse(
+            {
+                alias: connections[alias].get_pool_stats()
+                for alias in pooled_aliases()
+            },
+        )
+
+    def __call__(self, request):
+        """Answer a probe or pass a request further."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == HEALTH_LIVENESS_PATH:
+            return JsonResponse({'status': 'ok'})
+        if request.path == HEALTH_READINESS_PATH:
+            return self.readiness()
+        if request.path == HEALTH_POOL_PATH:
+            return self.pool_stats()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        """Answer a probe or pass a request further in an event loop."""
+        if request.path == HEALTH_LIVENESS_PATH:
+            return JsonResponse({'status': 'ok'})
+        if request.path == HEALTH_READINESS_PATH:
+            return await sync_to_async(
+                self.readiness,
+                thread_sensitive=False,
+            )()
+        if request.path == HEALTH_POOL_PATH:
+            return self.pool_stats()
+        return await self.get_response(request)
@@ -0,0 +1,29 @@
+"""Describe helpers of a pooled PostgreSQL backend.
+
+They do not import psycopg, so they are safe without a pool configured.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def pooled_aliases():
+    """Return aliases of databases which use a pooled backend."""
+    return [
+        alias for alias, database in settings.DATABASES.items()
+        if database['ENGINE'] == __name__
+    ]
+
+
+def warm_pools(timeout=10):
+    """Open pools and wait for their minimal amount of connections."""
+    for alias in pooled_aliases():
+        from psycopg_pool import PoolTimeout
+
+        try:
+            connections[alias].pool.wait(timeout=timeout)
+        except PoolTimeout:
+            logger.warning('Pool %s was not filled in %s s.', alias, timeout)
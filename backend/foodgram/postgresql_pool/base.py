@@ -0,0 +1,75 @@
+"""Describe a PostgreSQL backend which takes connections from a pool.
+
+A pool is shared by all threads of a process, Django connections take a
+connection on connect and put it back on close, so CONN_MAX_AGE must be 0.
+Pool options are read from OPTIONS['pool'].
+"""
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql.base import \
+    DatabaseWrapper as PostgreSQLDatabaseWrapper
+from django.db.backends.postgresql.base import is_psycopg3
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+    """Describe a PostgreSQL connection borrowed from a process pool."""
+
+    def __init__(self, settings_dict, alias=None):
+        """Check that psycopg 3 is used and connections are not persisted."""
+        super().__init__(settings_dict, alias)
+        if not is_psycopg3:
+            raise ImproperlyConfigured('Pooled connections require psycopg 3.')
+        if self.settings_dict['CONN_MAX_AGE']:
+            raise ImproperlyConfigured(
+                'Pooled connections require CONN_MAX_AGE to be 0.',
+            )
+
+    def get_connection_params(self):
+        """Return connection params without pool options."""
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    @property
+    def pool(self):
+        """Return a pool of an alias, it is opened on the first use."""
+        with pools_lock:
+            if self.alias not in pools:
+                pool = ConnectionPool(
+                    kwargs=self.get_connection_params(),
+                    check=ConnectionPool.check_connection,
+                    name=self.alias,
+                    open=False,
+                    **self.settings_dict['OPTIONS'].get('pool', {}),
+                )
+                pool.open()
+                pools[self.alias] = pool
+            return pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        """Take a connection from a pool instead of connecting."""
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = (
+            IsolationLevel.READ_COMMITTED if isolation_level is None
+            else IsolationLevel(isolation_level)
+        )
+        connection = self.pool.getconn()
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        """Put a connection back, a pool rolls back an open transaction."""
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+
+    def get_pool_stats(self):
+        """Return counters of a pool of this process."""
+        return self.pool.get_stats()
@@ -0,0 +1,103 @@
+"""Describe routing of reads of safe requests to database replicas.
+
+Replicas are listed in DB_REPLICAS, for example
+`DB_REPLICAS=replica-1:5432,localhost/foodgram_replica`. Views opt in
+with ReplicaReadMixin and a `replica_actions` attribute naming viewset
+actions which may read from a replica. Any other request, a write or a
+request of a user who wrote recently reads from the primary database.
+"""
+import random
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+
+from foodgram.settings import DATABASE_REPLICAS, REPLICA_STICKY_SECONDS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY = 'replica-sticky:{}'
+CACHE_APP_LABEL = 'django_cache'
+
+replica_alias = ContextVar('replica_alias', default=None)
+
+
+class ReplicaRouter:
+    """Send reads to a replica chosen for a request and writes to primary."""
+
+    def db_for_read(self, model, **hints):
+        """Return a replica of a request or None for the primary database.
+
+        Entries of a database cache are always read from the primary, so
+        sticky users and facet versions never lag behind.
+        """
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return None
+        return replica_alias.get()
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary even objects which were read from a replica."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations, replicas hold the same data as the primary."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Migrate only the primary, replicas follow it."""
+        return db == DEFAULT_DB_ALIAS
+
+
+def is_sticky(user):
+    """Check if a user wrote recently and has to read from the primary."""
+    return user.is_authenticated and bool(
+        cache.get(STICKY_KEY.format(user.pk)),
+    )
+
+
+class ReplicaReadMixin:
+    """Read opted in actions of safe requests from a replica.
+
+    A replica is chosen after authentication, so tokens are always checked
+    on the primary and a user who wrote recently keeps reading from it.
+    """
+
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        """Choose a replica for an opted in action of a safe request."""
+        super().initial(request, *args, **kwargs)
+        if (
+            DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            and not is_sticky(request.user)
+        ):
+            replica_alias.set(random.choice(DATABASE_REPLICAS))
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """Reset a database for reads of a request.
+
+    A successful unsafe request of an authenticated user keeps reads of
+    the user on the primary for REPLICA_STICKY_SECONDS, so the user sees
+    own writes on any worker while replicas catch up.
+    """
+
+    def process_request(self, request):
+        """Read from the primary unless a view allows a replica."""
+        replica_alias.set(None)
+
+    def process_response(self, request, response):
+        """Keep a user on the primary for a while after a write."""
+        replica_alias.set(None)
+        user = getattr(request, 'user', None)
+        if (
+            DATABASE_REPLICAS
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            cache.set(STICKY_KEY.format(user.pk), 1, REPLICA_STICKY_SECONDS)
+        return response
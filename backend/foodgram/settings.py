@@ -1,5 +1,7 @@
 """Django settings for foodgram project."""
 import os
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 
 from reportlab.pdfbase import pdfmetrics
@@ -27,15 +29,22 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'perf.apps.PerfConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.health.HealthCheckMiddleware',
+    'perf.telemetry.TelemetryMiddleware',
+    'perf.nplusone.NPlusOneMiddleware',
+    'perf.profiling.ProfilerMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,8 +85,40 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='localhost'),
         'PORT': os.getenv('DB_PORT', default=5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS',
+            default='true',
+        ).lower() in ('true', '1'),
     },
 }
+if DATABASES['default']['ENGINE'] == 'foodgram.postgresql_pool':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', default=2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', default=10)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', default=300)),
+        },
+    }
+
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', default='').split(',')),
+):
+    address, _, name = replica.strip().partition('/')
+    host, _, port = address.partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=10))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -118,8 +159,27 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(
+        1,
+        'api.renderers.MessagePackRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].insert(
+        1,
+        'api.parsers.MessagePackParser',
+    )
+
 
 class PDFFonts:
     """Describe fonts' names."""
@@ -138,3 +198,140 @@ MINIMUM_COOKING_TIME = 1
 
 MAXIMUM_INGREDIENT_AMOUNT = 32767
 MAXIMUM_COOKING_TIME = 32767
+
+MAXIMUM_BATCH_SIZE = 100
+
+BACKGROUND_TASKS_SYNC = os.getenv(
+    'BACKGROUND_TASKS_SYNC',
+    default='false',
+).lower() in ('true', '1')
+BACKGROUND_TASKS_WORKERS = int(os.getenv('BACKGROUND_TASKS_WORKERS', default=2))
+
+FEED_MAX_LENGTH = int(os.getenv('FEED_MAX_LENGTH', default=500))
+FEED_FANOUT_BATCH_SIZE = 1000
+
+SIMILAR_RECIPES_TOP_K = 10
+SIMILAR_RECIPES_METRIC = 'jaccard'
+SIMILAR_RECIPES_CHUNK_SIZE = 500
+
+PANTRY_INDEX_TTL = int(os.getenv('PANTRY_INDEX_TTL', default=300))
+PANTRY_INDEX_MIN_AGE = int(os.getenv('PANTRY_INDEX_MIN_AGE', default=10))
+PANTRY_MAXIMUM_RESULTS = 100
+
+RANKING_HALF_LIFE_HOURS = float(
+    os.getenv('RANKING_HALF_LIFE_HOURS', default=48),
+)
+RANKING_REBASE_HALF_LIVES = 64
+RANKING_WATERMARK_LAG_SECONDS = 60
+RANKING_FAVORITE_WEIGHT = 1.0
+RANKING_CART_WEIGHT = 0.5
+
+ASYNC_READ_VIEWS = os.getenv(
+    'ASYNC_READ_VIEWS',
+    default='false',
+).lower() in ('true', '1')
+ASYNC_DB_CONCURRENCY = int(os.getenv('ASYNC_DB_CONCURRENCY', default=20))
+
+HEALTH_LIVENESS_PATH = '/health/live/'
+HEALTH_READINESS_PATH = '/health/ready/'
+HEALTH_POOL_PATH = '/health/pool/'
+HEALTH_CHECK_CACHE_SECONDS = 5
+HEALTH_CHECK_DATABASE_TIMEOUT = 1
+
+TELEMETRY_ENABLED = os.getenv(
+    'TELEMETRY_ENABLED',
+    default='true',
+).lower() in ('true', '1')
+TELEMETRY_SERVER_TIMING = os.getenv(
+    'TELEMETRY_SERVER_TIMING',
+    default='false',
+).lower() in ('true', '1')
+TELEMETRY_METRICS_PATH = '/metrics'
+TELEMETRY_METRICS_DIR = os.getenv('TELEMETRY_METRICS_DIR')
+TELEMETRY_FLUSH_SECONDS = 2
+
+NPLUSONE_DETECTOR = os.getenv(
+    'NPLUSONE_DETECTOR',
+    default='false',
+).lower() in ('true', '1')
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', default=3))
+
+PROFILER_ENABLED = os.getenv(
+    'PROFILER_ENABLED',
+    default='false',
+).lower() in ('true', '1')
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', default=0))
+PROFILER_LATENCY_THRESHOLD = int(
+    os.getenv('PROFILER_LATENCY_THRESHOLD', default=0),
+)
+PROFILER_HEADER = 'X-Profile'
+PROFILER_SIGNATURE_MAX_AGE = 3600
+PROFILER_SAMPLE_INTERVAL = 0.005
+PROFILER_DIR = os.getenv(
+    'PROFILER_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram-profiles'),
+)
+PROFILER_MAX_CAPTURES = int(os.getenv('PROFILER_MAX_CAPTURES', default=200))
+
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', default=0))
+SLOW_QUERY_EXPLAIN = os.getenv(
+    'SLOW_QUERY_EXPLAIN',
+    default='false',
+).lower() in ('true', '1')
+SLOW_QUERY_LOG_PATH = os.getenv(
+    'SLOW_QUERY_LOG_PATH',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram-slow-queries.log'),
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'perf.slow_queries.ProcessRotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_PATH,
+            'maxBytes': 10 * 2 ** 20,
+            'backupCount': 4,
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'perf.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+RECIPE_TAG_SLUGS_FILTER = os.getenv(
+    'RECIPE_TAG_SLUGS_FILTER',
+    default='true',
+).lower() in ('true', '1')
+
+FAST_READ_SERIALIZERS = os.getenv(
+    'FAST_READ_SERIALIZERS',
+    default='true',
+).lower() in ('true', '1')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.db.DatabaseCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram_cache'),
+    },
+}
+
+RECIPE_FACETS_TTL = int(os.getenv('RECIPE_FACETS_TTL', default=300))
+RECIPE_FACETS_INGREDIENTS = 20
+
+RECIPE_DOCUMENTS = os.getenv(
+    'RECIPE_DOCUMENTS',
+    default='true',
+).lower() in ('true', '1')
@@ -0,0 +1,61 @@
+"""Describe gunicorn settings of a production deployment.
+
+Workers and threads are sized from available CPUs unless environment
+variables set them. The application is preloaded in a master process so
+workers share imported code copy-on-write, and workers are recycled after
+a jittered amount of requests. Workers share request metrics through
+files in TELEMETRY_METRICS_DIR.
+"""
+import os
+import shutil
+
+cpu_count = (
+    len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity')
+    else os.cpu_count()
+)
+asgi = os.getenv('SERVER_INTERFACE', default='wsgi').lower() == 'asgi'
+
+if asgi:
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    default_workers, default_threads = cpu_count, 1
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = 'gthread'
+    default_workers, default_threads = cpu_count * 2 + 1, 4
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', default=default_workers))
+threads = int(os.getenv('GUNICORN_THREADS', default=default_threads))
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default=2000))
+max_requests_jitter = int(
+    os.getenv('GUNICORN_MAX_REQUESTS_JITTER', default=max_requests // 10),
+)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default=30))
+graceful_timeout = timeout
+keepalive = 5
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+os.environ.setdefault(
+    'TELEMETRY_METRICS_DIR',
+    os.path.join(worker_tmp_dir or '/tmp', 'foodgram-metrics'),
+)
+
+
+def on_starting(server):
+    """Drop metrics of workers of a previous run."""
+    shutil.rmtree(os.environ['TELEMETRY_METRICS_DIR'], ignore_errors=True)
+
+
+def pre_fork(server, worker):
+    """Close connections opened by a master, workers must not share them."""
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    """Fill database pools of a worker before it accepts requests."""
+    from foodgram.postgresql_pool import warm_pools
+
+    warm_pools()
@@ -0,0 +1,22 @@
+"""Describe Perf app settings."""
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class PerfConfig(AppConfig):
+    """Config for Perf app."""
+
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'perf'
+
+    def ready(self):
+        """Record queries of every database connection."""
+        from foodgram.settings import SLOW_QUERY_THRESHOLD
+        from perf.nplusone import install_query_collector
+        from perf.slow_queries import install_slow_query_recorder
+        from perf.telemetry import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
+        connection_created.connect(install_query_collector)
+        if SLOW_QUERY_THRESHOLD:
+            connection_created.connect(install_slow_query_recorder)
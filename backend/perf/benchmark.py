@@ -0,0 +1,358 @@
+"""Describe an in-process benchmark of every API endpoint.
+
+Cases request the paths of docs/openapi-schema.yml with a test client
+against a seeded database. Every step of a case is measured separately:
+latency percentiles, queries per request and peak memory allocated by a
+request. All requests run in a transaction which is rolled back, so the
+database is left untouched and on commit tasks are never started.
+Uploaded images are kept in memory.
+"""
+import tracemalloc
+from statistics import median, quantiles
+from time import perf_counter
+from urllib.parse import quote
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+LATENCY_NOISE_MS = 3
+MEMORY_NOISE_KIB = 16
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAAD'
+    'ElEQVR4nGNgYGAAAAAEAAH2FzhVAAAAAElFTkSuQmCC'
+)
+
+
+def step(method, path, data=None, remember=None, token=None):
+    """Describe a request of a case.
+
+    Data is a function of fixtures and an iteration number. Remember is
+    a function of a response and fixtures which returns values for next
+    steps, a request may authenticate with a remembered token instead of
+    the benchmark user token.
+    """
+    return {
+        'method': method,
+        'path': path,
+        'data': data,
+        'remember': remember,
+        'token': token,
+    }
+
+
+def recipe_data(fixtures, iteration):
+    """Return a recipe which benchmark user creates and updates."""
+    return {
+        'name': f'Benchmark recipe {iteration}',
+        'text': 'Benchmark recipe description.',
+        'cooking_time': 10,
+        'image': IMAGE,
+        'tags': fixtures['tag_ids'],
+        'ingredients': [
+            {'id': pk, 'amount': 10} for pk in fixtures['ingredient_ids']
+        ],
+    }
+
+
+def created_recipe(response, fixtures):
+    """Remember a recipe created by the benchmark user."""
+    return {
+        'id': Recipe.objects.filter(
+            author_id=fixtures['user_id'],
+        ).latest('pk').pk,
+    }
+
+
+def issued_token(response, fixtures):
+    """Remember a token issued by a login."""
+    return {'auth_token': response.data['auth_token']}
+
+
+CASES = (
+    ('tags', (
+        step('GET', '/api/tags/'),
+        step('GET', '/api/tags/{tag_id}/'),
+    )),
+    ('ingredients', (
+        step('GET', '/api/ingredients/?name={ingredient_prefix}'),
+        step('GET', '/api/ingredients/{ingredient_id}/'),
+    )),
+    ('recipes', (
+        step('GET', '/api/recipes/'),
+        step('GET', '/api/recipes/?tags={tag_slug}'),
+        step('GET', '/api/recipes/?tags={tag_slug}&tags={other_tag_slug}'),
+        step('GET', '/api/recipes/?author={author_id}'),
+        step('GET', '/api/recipes/?is_favorited=1'),
+        step('GET', '/api/recipes/?is_in_shopping_cart=1'),
+        step(
+            'GET',
+            '/api/recipes/?fields=id,name,image,cooking_time,is_favorited',
+        ),
+        step('GET', '/api/recipes/{recipe_id}/'),
+        step('GET', '/api/recipes/?ids={recipe_ids}'),
+        step('GET', '/api/recipes/facets/?tags={tag_slug}'),
+    )),
+    ('recipe writes', (
+        step('POST', '/api/recipes/', recipe_data, remember=created_recipe),
+        step('PATCH', '/api/recipes/{id}/', recipe_data),
+        step('DELETE', '/api/recipes/{id}/'),
+    )),
+    ('favorite', (
+        step('POST', '/api/recipes/{free_recipe_id}/favorite/'),
+        step('DELETE', '/api/recipes/{free_recipe_id}/favorite/'),
+    )),
+    ('shopping cart', (
+        step('POST', '/api/recipes/{free_recipe_id}/shopping_cart/'),
+        step('DELETE', '/api/recipes/{free_recipe_id}/shopping_cart/'),
+        step('GET', '/api/recipes/download_shopping_cart/'),
+    )),
+    ('users', (
+        step('GET', '/api/users/'),
+        step('GET', '/api/users/{author_id}/'),
+        step('GET', '/api/users/me/'),
+        step('POST', '/api/users/', lambda fixtures, iteration: {
+            'email': f'benchmark{iteration}@example.com',
+            'username': f'benchmark{iteration}',
+            'first_name': 'Benchmark',
+            'last_name': 'User',
+            'password': BENCHMARK_PASSWORD,
+        }),
+        step('POST', '/api/users/set_password/', lambda *args: {
+            'current_password': BENCHMARK_PASSWORD,
+            'new_password': BENCHMARK_PASSWORD,
+        }),
+    )),
+    ('subscriptions', (
+        step('GET', '/api/users/subscriptions/?recipes_limit=3'),
+        step('GET', '/api/users/subscriptions/?fields=id,username,recipes'),
+        step('POST', '/api/users/{free_author_id}/subscribe/'),
+        step('DELETE', '/api/users/{free_author_id}/subscribe/'),
+    )),
+    ('token', (
+        step(
+            'POST',
+            '/api/auth/token/login/',
+            lambda fixtures, iteration: {
+                'email': fixtures['login_email'],
+                'password': BENCHMARK_PASSWORD,
+            },
+            remember=issued_token,
+        ),
+        step('POST', '/api/auth/token/logout/', token='auth_token'),
+    )),
+)
+
+
+class QueryCounter:
+    """Count queries executed through a connection."""
+
+    def __init__(self):
+        """Start counting from zero."""
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count a query and execute it."""
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def prepare_fixtures(user):
+    """Return ids used by cases, give users a known password.
+
+    A second user logs in and out, so the token of the benchmark user
+    survives the token case.
+    """
+    login_user = User.objects.exclude(pk=user.pk).order_by('pk').first()
+    author = User.objects.annotate(
+        recipes_count=Count('recipes'),
+    ).order_by('-recipes_count', 'pk').first()
+    free_recipe = Recipe.objects.exclude(
+        favorited_by__user=user,
+    ).exclude(added_to_cart__user=user).order_by('pk').first()
+    free_author = User.objects.exclude(pk=user.pk).exclude(
+        followings__follower=user,
+    ).order_by('pk').first()
+    tags = list(Tag.objects.order_by('pk')[:2])
+    ingredients = list(Ingredient.objects.order_by('pk')[:3])
+    if None in (login_user, author, free_recipe, free_author) or not (
+        len(tags) == 2 and ingredients
+    ):
+        return None
+    User.objects.filter(pk__in=(user.pk, login_user.pk)).update(
+        password=make_password(BENCHMARK_PASSWORD),
+    )
+    return {
+        'user_id': user.pk,
+        'token': Token.objects.get_or_create(user=user)[0].key,
+        'login_email': login_user.email,
+        'author_id': author.pk,
+        'recipe_id': Recipe.objects.order_by('pk').values_list(
+            'pk',
+            flat=True,
+        ).first(),
+        'recipe_ids': ','.join(
+            str(pk) for pk in Recipe.objects.order_by('-pk').values_list(
+                'pk',
+                flat=True,
+            )[:20]
+        ),
+        'free_recipe_id': free_recipe.pk,
+        'free_author_id': free_author.pk,
+        'tag_id': tags[0].pk,
+        'tag_ids': [tag.pk for tag in tags],
+        'tag_slug': tags[0].slug,
+        'other_tag_slug': tags[1].slug,
+        'ingredient_id': ingredients[0].pk,
+        'ingredient_ids': [ingredient.pk for ingredient in ingredients],
+        'ingredient_prefix': quote(ingredients[0].name[:2]),
+    }
+
+
+def request(client, fixtures, remembered, step, iteration):
+    """Send a request of a step, return its response and query count."""
+    if step['token']:
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {remembered[step["token"]]}',
+        )
+    data = step['data'](fixtures, iteration) if step['data'] else None
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        response = getattr(client, step['method'].lower())(
+            step['path'].format(**fixtures, **remembered),
+            data,
+            format='json',
+        )
+    if step['remember'] and response.status_code < 400:
+        remembered.update(step['remember'](response, fixtures))
+    return response, counter.count
+
+
+def percentile(values, number):
+    """Return a percentile of latencies in milliseconds."""
+    if len(values) < 2:
+        return round(values[0] * 1000, 2) if values else None
+    return round(quantiles(values, n=100)[number - 1] * 1000, 2)
+
+
+def run_case(client, fixtures, steps, iterations, warmup, allocation_runs):
+    """Run a case and return statistics of every step by its name."""
+    latencies = [[] for _ in steps]
+    queries = [0] * len(steps)
+    errors = [0] * len(steps)
+    memory = [[] for _ in steps]
+    for iteration in range(warmup + iterations + allocation_runs):
+        measured = iteration >= warmup
+        traced = iteration >= warmup + iterations
+        remembered = {}
+        for index, current in enumerate(steps):
+            if traced:
+                tracemalloc.start()
+            started = perf_counter()
+            response, count = request(
+                client,
+                fixtures,
+                remembered,
+                current,
+                iteration,
+            )
+            elapsed = perf_counter() - started
+            if traced:
+                memory[index].append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            if response.status_code >= 400:
+                errors[index] += 1
+            elif measured and not traced:
+                latencies[index].append(elapsed)
+                queries[index] = max(queries[index], count)
+    return {
+        f'{current["method"]} {current["path"]}': {
+            'requests': len(latencies[index]),
+            'errors': errors[index],
+            'p50_ms': percentile(latencies[index], 50),
+            'p95_ms': percentile(latencies[index], 95),
+            'p99_ms': percentile(latencies[index], 99),
+            'queries': queries[index],
+            'peak_kib': (
+                round(median(memory[index]) / 1024, 1)
+                if memory[index] else None
+            ),
+        }
+        for index, current in enumerate(steps)
+    }
+
+
+def run_benchmark(user, iterations, warmup, allocation_runs, match=None):
+    """Run cases as a user, yield names of cases and their statistics.
+
+    Nothing is yielded when the database lacks seeded rows.
+    """
+    with override_settings(STORAGES=STORAGES), transaction.atomic():
+        fixtures = prepare_fixtures(user)
+        if fixtures is not None:
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {fixtures["token"]}')
+            for name, steps in CASES:
+                if match and match not in name:
+                    continue
+                yield name, run_case(
+                    client,
+                    fixtures,
+                    steps,
+                    iterations,
+                    warmup,
+                    allocation_runs,
+                )
+        transaction.set_rollback(True)
+
+
+def compare(results, baseline, tolerance):
+    """Return descriptions of steps which regressed against a baseline.
+
+    Median latency and memory may grow by a tolerance share and a noise
+    floor, queries may not grow at all. Tail latencies are only reported,
+    they are too noisy to compare between runs.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['errors'] > previous['errors']:
+            regressions.append(f'{name}: {current["errors"]} errors')
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: {current["queries"]} queries, '
+                f'{previous["queries"]} in the baseline',
+            )
+        for key, noise in (
+            ('p50_ms', LATENCY_NOISE_MS),
+            ('peak_kib', MEMORY_NOISE_KIB),
+        ):
+            if current[key] is None or previous[key] is None:
+                continue
+            if current[key] > max(
+                previous[key] * (1 + tolerance),
+                previous[key] + noise,
+            ):
+                regressions.append(
+                    f'{name}: {key} {current[key]}, '
+                    f'{previous[key]} in the baseline',
+                )
+    return regressions
@@ -0,0 +1,156 @@
+"""Describe a command which benchmarks API endpoints in-process."""
+import json
+import platform
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import setup_test_environment
+
+from foodgram.settings import BASE_DIR
+from perf.benchmark import compare, run_benchmark
+from recipes.models import Recipe
+
+User = get_user_model()
+
+BASELINE_PATH = BASE_DIR / 'benchmarks' / 'endpoints-baseline.json'
+
+
+class Command(BaseCommand):
+    """Measure endpoints and compare them with a committed baseline."""
+
+    help = (
+        'Benchmark API endpoints against a seeded database and fail on '
+        'regressions against a baseline.'
+    )
+
+    def add_arguments(self, parser):
+        """Describe command arguments."""
+        parser.add_argument(
+            '--username',
+            help='Send requests as this user, '
+                 'a user with the biggest shopping cart by default.',
+        )
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--allocation-runs',
+            type=int,
+            default=3,
+            help='Extra iterations which trace allocated memory.',
+        )
+        parser.add_argument(
+            '--match',
+            help='Run only cases which names contain this text.',
+        )
+        parser.add_argument('--output', help='Save results as JSON.')
+        parser.add_argument('--baseline', default=str(BASELINE_PATH))
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed growth of median latency and memory as a share.',
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Save results as the new baseline instead of comparing.',
+        )
+
+    def get_user(self, username):
+        """Return a user who sends requests."""
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User {username} does not exist.')
+        user = User.objects.annotate(cart_size=Count('cart')).order_by(
+            '-cart_size',
+            'pk',
+        ).first()
+        if user is None:
+            raise CommandError('No users, run seed_foodgram first.')
+        return user
+
+    def handle(self, *args, **options):
+        """Run cases, save results and compare them with a baseline."""
+        setup_test_environment()
+        user = self.get_user(options['username'])
+        steps = {}
+        for name, statistics in run_benchmark(
+            user,
+            options['iterations'],
+            options['warmup'],
+            options['allocation_runs'],
+            match=options['match'],
+        ):
+            self.stdout.write(name)
+            for step, result in statistics.items():
+                steps[step] = result
+                self.stdout.write(
+                    f'  {step:60} '
+                    f'p50 {result["p50_ms"]} ms  '
+                    f'p95 {result["p95_ms"]} ms  '
+                    f'p99 {result["p99_ms"]} ms  '
+                    f'{result["queries"]} queries  '
+                    f'{result["peak_kib"]} KiB'
+                    + (
+                        f'  {result["errors"]} errors'
+                        if result['errors'] else ''
+                    ),
+                )
+        if not steps:
+            raise CommandError(
+                'Nothing was measured, run seed_foodgram first '
+                'or check --match.',
+            )
+        results = {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'iterations': options['iterations'],
+            },
+            'steps': steps,
+        }
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(
+                self.style.SUCCESS(f'Baseline is saved to {baseline_path}.'),
+            )
+            return
+        if not baseline_path.exists():
+            self.stdout.write(
+                self.style.WARNING(f'No baseline at {baseline_path}.'),
+            )
+            return
+        baseline = json.loads(baseline_path.read_text())
+        dataset = ('database', 'users', 'recipes')
+        if any(
+            baseline['meta'][key] != results['meta'][key] for key in dataset
+        ):
+            self.stdout.write(
+                self.style.WARNING(
+                    'The baseline was measured on '
+                    + ', '.join(
+                        f'{key} {baseline["meta"][key]}' for key in dataset
+                    )
+                    + ', results are not compared with it.',
+                ),
+            )
+            return
+        regressions = compare(steps, baseline['steps'], options['tolerance'])
+        if regressions:
+            raise CommandError(
+                'Regressions against the baseline:\n' + '\n'.join(regressions),
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,105 @@
+"""Describe a command which looks for N+1 queries in API routes."""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+from django.urls import URLResolver, reverse
+from rest_framework.test import APIClient
+
+from api import urls
+from foodgram.settings import NPLUSONE_THRESHOLD
+from perf.nplusone import QueryCollector, current_collector
+
+User = get_user_model()
+
+
+def api_routes(patterns):
+    """Yield url patterns of views which answer GET requests."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from api_routes(pattern.url_patterns)
+        elif 'get' in (getattr(pattern.callback, 'actions', None) or {}):
+            yield pattern
+
+
+def route_url(pattern, limit):
+    """Return an url of a route or None if it has no object to show."""
+    kwargs = {}
+    for name in pattern.pattern.regex.groupindex:
+        queryset = pattern.callback.cls.queryset
+        kwargs[name] = queryset.order_by('pk').values_list(
+            'pk',
+            flat=True,
+        ).first()
+        if kwargs[name] is None:
+            return None
+    url = reverse(pattern.name, kwargs=kwargs)
+    return f'{url}?limit={limit}' if not kwargs else url
+
+
+class Command(BaseCommand):
+    """Request every GET route of the API and report repeated queries."""
+
+    help = 'Find queries repeated within a request in every API route.'
+
+    def add_arguments(self, parser):
+        """Describe command arguments."""
+        parser.add_argument(
+            '--username',
+            help='Authenticate requests as this user.',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=int,
+            default=NPLUSONE_THRESHOLD,
+            help='Allowed executions of a query within a request.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Page size of list routes.',
+        )
+
+    def handle(self, *args, **options):
+        """Request routes one by one collecting their queries."""
+        setup_test_environment()
+        client = APIClient()
+        if options['username']:
+            try:
+                client.force_authenticate(
+                    User.objects.get(username=options['username']),
+                )
+            except User.DoesNotExist:
+                raise CommandError(
+                    f'User {options["username"]} does not exist.',
+                )
+
+        failed = []
+        for pattern in api_routes(urls.urlpatterns):
+            url = route_url(pattern, options['limit'])
+            if url is None:
+                self.stdout.write(f'SKIP  {pattern.name} has no objects')
+                continue
+            collector = QueryCollector(options['threshold'])
+            token = current_collector.set(collector)
+            try:
+                response = client.get(url)
+            finally:
+                current_collector.reset(token)
+            queries = sum(collector.counts.values())
+            report = collector.report(f'GET {pattern.name}')
+            if report:
+                failed.append(pattern.name)
+                self.stdout.write(
+                    f'FAIL  {url} {response.status_code}, '
+                    f'{queries} queries\n{report}',
+                )
+            else:
+                self.stdout.write(
+                    f'OK    {url} {response.status_code}, {queries} queries',
+                )
+
+        if failed:
+            raise CommandError(
+                f'Repeated queries in: {", ".join(failed)}',
+            )
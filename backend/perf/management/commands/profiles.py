@@ -0,0 +1,97 @@
+"""Describe a command which shows captured request profiles."""
+import pstats
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.settings import PROFILER_DIR, PROFILER_HEADER
+from perf.profiling import load_captures, sign_profile_request
+
+
+class Command(BaseCommand):
+    """List captures, render their flamegraph stacks and statistics."""
+
+    help = 'List request profiles and render them as collapsed stacks.'
+
+    def add_arguments(self, parser):
+        """Describe command arguments."""
+        parser.add_argument(
+            '--flamegraph',
+            metavar='ID',
+            help='Print collapsed stacks of a capture for flamegraph tools.',
+        )
+        parser.add_argument(
+            '--stats',
+            metavar='ID',
+            help='Print cProfile statistics of a capture.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write collapsed stacks to a file instead of stdout.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=30,
+            help='Amount of functions in statistics.',
+        )
+        parser.add_argument(
+            '--sign',
+            action='store_true',
+            help='Print a header which requests profiling of a request.',
+        )
+
+    def find_capture(self, capture_id):
+        """Return a single capture which id starts with a prefix."""
+        captures = [
+            capture for capture in load_captures()
+            if capture['id'].startswith(capture_id)
+        ]
+        if len(captures) != 1:
+            raise CommandError(
+                f'{len(captures)} captures match {capture_id}.',
+            )
+        return captures[0]
+
+    def handle(self, *args, **options):
+        """Run a requested action or list captures."""
+        if options['sign']:
+            self.stdout.write(f'{PROFILER_HEADER}: {sign_profile_request()}')
+        elif options['flamegraph']:
+            capture = self.find_capture(options['flamegraph'])
+            lines = '\n'.join(
+                f'{stack} {count}'
+                for stack, count in sorted(capture['stacks'].items())
+            )
+            if options['output']:
+                Path(options['output']).write_text(lines + '\n')
+            else:
+                self.stdout.write(lines)
+        elif options['stats']:
+            capture = self.find_capture(options['stats'])
+            path = Path(PROFILER_DIR) / f'{capture["id"]}.prof'
+            if not path.exists():
+                raise CommandError(
+                    f'Capture {capture["id"]} has no cProfile statistics.',
+                )
+            stream = StringIO()
+            pstats.Stats(str(path), stream=stream).sort_stats(
+                'cumulative',
+            ).print_stats(options['limit'])
+            self.stdout.write(stream.getvalue())
+        else:
+            for capture in load_captures():
+                peak_memory = capture['peak_memory']
+                self.stdout.write(
+                    f'{capture["id"]}  '
+                    f'{datetime.fromtimestamp(capture["created"]):%H:%M:%S}  '
+                    f'{capture["trigger"]:7} {capture["status"]} '
+                    f'{capture["duration_ms"]:8.1f} ms  '
+                    + (
+                        f'{peak_memory / 2 ** 20:6.1f} MiB  '
+                        if peak_memory is not None else ' ' * 12
+                    )
+                    + f'{capture["method"]} {capture["path"]}',
+                )
@@ -0,0 +1,99 @@
+"""Describe a command which summarizes the slow query log."""
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.settings import SLOW_QUERY_LOG_PATH
+
+SORTS = {
+    'total': lambda summary: summary['total_ms'],
+    'max': lambda summary: summary['max_ms'],
+    'count': lambda summary: summary['count'],
+}
+
+
+def read_entries(path):
+    """Yield entries of logs of all processes and their rotated backups."""
+    log = Path(path)
+    for file in sorted(log.parent.glob(f'{log.name}*'), reverse=True):
+        with open(file) as lines:
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(entries):
+    """Group entries by fingerprints."""
+    summaries = defaultdict(lambda: {
+        'count': 0,
+        'total_ms': 0.0,
+        'max_ms': 0.0,
+        'origins': Counter(),
+        'plan': None,
+        'params': None,
+    })
+    for entry in entries:
+        summary = summaries[entry['fingerprint']]
+        summary['count'] += 1
+        summary['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= summary['max_ms']:
+            summary['max_ms'] = entry['duration_ms']
+            summary['params'] = entry['params']
+        summary['origins'][
+            ' '.join(
+                filter(None, (entry['view'], entry['field'], entry['line'])),
+            ) or 'unknown'
+        ] += 1
+        summary['plan'] = entry['plan'] or summary['plan']
+    return summaries
+
+
+class Command(BaseCommand):
+    """Print the worst slow query fingerprints."""
+
+    help = 'Summarize slow queries by their fingerprints.'
+
+    def add_arguments(self, parser):
+        """Describe command arguments."""
+        parser.add_argument(
+            '--sort',
+            choices=tuple(SORTS),
+            default='total',
+            help='Order fingerprints by total or max time or by count.',
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Print captured query plans.',
+        )
+        parser.add_argument('--path', default=SLOW_QUERY_LOG_PATH)
+
+    def handle(self, *args, **options):
+        """Read the log and print the worst fingerprints."""
+        if not Path(options['path']).parent.is_dir():
+            raise CommandError(f'No slow query log at {options["path"]}.')
+        summaries = sorted(
+            summarize(read_entries(options['path'])).items(),
+            key=lambda item: SORTS[options['sort']](item[1]),
+            reverse=True,
+        )[:options['limit']]
+        for number, (key, summary) in enumerate(summaries, 1):
+            self.stdout.write(
+                f'{number}. {summary["count"]} x, '
+                f'total {summary["total_ms"]:.1f} ms, '
+                f'max {summary["max_ms"]:.1f} ms, '
+                f'mean {summary["total_ms"] / summary["count"]:.1f} ms\n'
+                f'   {key}\n'
+                f'   params of the slowest: {summary["params"]}',
+            )
+            for origin, count in summary['origins'].most_common(3):
+                self.stdout.write(f'   {count} x {origin}')
+            if options['plans'] and summary['plan']:
+                self.stdout.write(
+                    '   ' + summary['plan'].replace('\n', '\n   '),
+                )
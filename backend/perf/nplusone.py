@@ -0,0 +1,182 @@
+"""Describe detection of N+1 queries within a request.
+
+Queries are fingerprinted by their normalized SQL, so the same query with
+other params or another amount of IN values has one fingerprint. A
+fingerprint executed more than a threshold of times within a request is
+reported with serializer fields and code lines which executed it.
+"""
+import logging
+from collections import Counter
+from contextvars import ContextVar
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_finished, request_started
+from django.utils.deprecation import MiddlewareMixin
+
+from foodgram.settings import NPLUSONE_DETECTOR, NPLUSONE_THRESHOLD
+from perf.sql import fingerprint, query_origin
+
+logger = logging.getLogger(__name__)
+
+current_collector = ContextVar('current_collector', default=None)
+
+
+class QueryCollector:
+    """Count executions of query fingerprints."""
+
+    def __init__(self, threshold=NPLUSONE_THRESHOLD):
+        """Start collecting with a threshold of allowed executions."""
+        self.threshold = threshold
+        self.counts = Counter()
+        self.origins = {}
+
+    def add(self, sql):
+        """Count a query, remember where repeated queries come from."""
+        key = fingerprint(sql)
+        self.counts[key] += 1
+        if self.counts[key] > 1:
+            self.origins.setdefault(key, Counter())[query_origin()] += 1
+
+    def problems(self):
+        """Return fingerprints over the threshold with their origins."""
+        return [
+            (key, count, self.origins[key].most_common())
+            for key, count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+    def report(self, title):
+        """Describe problems as text, return an empty string without them."""
+        lines = []
+        for key, count, origins in self.problems():
+            lines.append(f'{title}: {count} x {key}')
+            for (field, line), repeats in origins:
+                lines.append(
+                    f'    {repeats} x '
+                    + ' at '.join(filter(None, (field, line))),
+                )
+        return '\n'.join(lines)
+
+
+def collect_query(execute, sql, params, many, context):
+    """Pass a query to a collector of a current request if there is one."""
+    collector = current_collector.get()
+    if collector is not None:
+        collector.add(sql)
+    return execute(sql, params, many, context)
+
+
+def install_query_collector(sender, connection, **kwargs):
+    """Wrap queries of a new connection once, wrappers survive reconnects."""
+    if collect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(collect_query)
+
+
+def request_title(request):
+    """Return a method and a route name of a request."""
+    match = request.resolver_match
+    return f'{request.method} {match.view_name if match else request.path}'
+
+
+class NPlusOneMiddleware(MiddlewareMixin):
+    """Log repeated queries of requests, enabled by NPLUSONE_DETECTOR.
+
+    An amount of repeated fingerprints is added as an X-N-Plus-One header.
+    """
+
+    def __init__(self, get_response):
+        """Turn the middleware off unless the detector is enabled."""
+        if not NPLUSONE_DETECTOR:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        """Start collecting queries unless a test collects them already."""
+        if current_collector.get() is None:
+            request.nplusone_collector = QueryCollector()
+            current_collector.set(request.nplusone_collector)
+
+    def process_response(self, request, response):
+        """Log repeated queries of a request."""
+        collector = getattr(request, 'nplusone_collector', None)
+        if collector is None:
+            return response
+        current_collector.set(None)
+        report = collector.report(request_title(request))
+        if report:
+            logger.warning('N+1 queries detected\n%s', report)
+            response['X-N-Plus-One'] = str(len(collector.problems()))
+        return response
+
+
+class NPlusOneTestMixin:
+    """Collect queries of every test client request of a test case.
+
+    Repeated queries fail a test after it finished unless
+    `nplusone_fail` is False, reports are kept in `nplusone_reports`.
+    Use `collect_queries` to check code outside of requests.
+    """
+
+    nplusone_threshold = NPLUSONE_THRESHOLD
+    nplusone_fail = True
+
+    def setUp(self):
+        """Collect queries of requests made by the test."""
+        super().setUp()
+        self.nplusone_reports = []
+        self.nplusone_request = None
+        request_started.connect(self.start_nplusone_request)
+        request_finished.connect(self.finish_nplusone_request)
+        self.addCleanup(self.check_nplusone)
+
+    def start_nplusone_request(self, sender, environ=None, **kwargs):
+        """Start a collector of a test client request."""
+        self.nplusone_request = (
+            f'{environ.get("REQUEST_METHOD")} {environ.get("PATH_INFO")}'
+            if environ else 'request'
+        )
+        current_collector.set(QueryCollector(self.nplusone_threshold))
+
+    def finish_nplusone_request(self, sender, **kwargs):
+        """Keep a report of a finished test client request."""
+        collector = current_collector.get()
+        current_collector.set(None)
+        if collector is not None:
+            report = collector.report(self.nplusone_request)
+            if report:
+                self.nplusone_reports.append(report)
+
+    def collect_queries(self, title='block'):
+        """Return a context manager checking queries of a block."""
+        return CollectQueries(self, title)
+
+    def check_nplusone(self):
+        """Stop collecting and fail a test which repeated queries."""
+        request_started.disconnect(self.start_nplusone_request)
+        request_finished.disconnect(self.finish_nplusone_request)
+        if self.nplusone_fail and self.nplusone_reports:
+            self.fail(
+                'N+1 queries detected\n' + '\n'.join(self.nplusone_reports),
+            )
+
+
+class CollectQueries:
+    """Collect queries of a block of a test into its reports."""
+
+    def __init__(self, test, title):
+        """Remember a test case and a title of a block."""
+        self.test = test
+        self.title = title
+        self.collector = QueryCollector(test.nplusone_threshold)
+
+    def __enter__(self):
+        """Start collecting queries."""
+        self.token = current_collector.set(self.collector)
+        return self.collector
+
+    def __exit__(self, *exc_info):
+        """Stop collecting and keep a report of repeated queries."""
+        current_collector.reset(self.token)
+        report = self.collector.report(self.title)
+        if report:
+            self.test.nplusone_reports.append(report)
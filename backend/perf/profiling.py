@@ -0,0 +1,236 @@
+"""Describe an opt-in profiler of sampled, requested and slow requests.
+
+Requests picked by PROFILER_SAMPLE_RATE or carrying a signed profiling
+header are profiled with cProfile and tracemalloc. When
+PROFILER_LATENCY_THRESHOLD is set, stacks of all requests are sampled
+cheaply from a background thread and kept for requests slower than the
+threshold. Captures are written to PROFILER_DIR, the oldest ones are
+removed over PROFILER_MAX_CAPTURES.
+"""
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+from foodgram.settings import (BASE_DIR, PROFILER_DIR, PROFILER_ENABLED,
+                               PROFILER_HEADER, PROFILER_LATENCY_THRESHOLD,
+                               PROFILER_MAX_CAPTURES, PROFILER_SAMPLE_INTERVAL,
+                               PROFILER_SAMPLE_RATE,
+                               PROFILER_SIGNATURE_MAX_AGE)
+
+SIGNING_SALT = 'perf.profiling'
+SIGNED_VALUE = 'profile'
+PATH_PREFIXES = ('site-packages/', str(BASE_DIR) + '/')
+
+deep_profile_lock = threading.Lock()
+frame_names = {}
+
+
+def sign_profile_request():
+    """Return a value of a header which requests profiling."""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(SIGNED_VALUE)
+
+
+def is_signed_profile_request(value):
+    """Check that a header value was signed recently by this project."""
+    try:
+        return signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            value,
+            max_age=PROFILER_SIGNATURE_MAX_AGE,
+        ) == SIGNED_VALUE
+    except signing.BadSignature:
+        return False
+
+
+def frame_name(code):
+    """Return a short name of a function of a code object."""
+    name = frame_names.get(code)
+    if name is None:
+        filename = code.co_filename
+        for prefix in PATH_PREFIXES:
+            if prefix in filename:
+                filename = filename.rpartition(prefix)[2]
+                break
+        name = frame_names[code] = f'{filename}:{code.co_name}'
+    return name
+
+
+def collapse(frame):
+    """Return a stack of a frame in the collapsed flamegraph format."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Sample stacks of registered threads from a background thread."""
+
+    def __init__(self, interval):
+        """Create a sampler which starts a thread on the first use."""
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.active = threading.Event()
+        self.stacks = {}
+        self.pid = None
+
+    def start(self, thread_id):
+        """Start sampling a thread."""
+        with self.lock:
+            self.stacks[thread_id] = Counter()
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                threading.Thread(
+                    target=self.run,
+                    name='stack-sampler',
+                    daemon=True,
+                ).start()
+            self.active.set()
+
+    def stop(self, thread_id):
+        """Stop sampling a thread and return its collapsed stacks."""
+        with self.lock:
+            stacks = self.stacks.pop(thread_id, Counter())
+            if not self.stacks:
+                self.active.clear()
+        return stacks
+
+    def run(self):
+        """Sample registered threads while there are any."""
+        while True:
+            self.active.wait()
+            time.sleep(self.interval)
+            with self.lock:
+                frames = sys._current_frames()
+                for thread_id, stacks in self.stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+
+
+sampler = StackSampler(PROFILER_SAMPLE_INTERVAL)
+
+
+def save_capture(meta, stacks, profile):
+    """Write a capture to the store and remove the oldest ones."""
+    directory = Path(PROFILER_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    capture_id = (
+        f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:8]}'
+    )
+    if profile is not None:
+        profile.dump_stats(directory / f'{capture_id}.prof')
+    (directory / f'{capture_id}.json').write_text(
+        json.dumps({'id': capture_id, **meta, 'stacks': stacks}),
+    )
+    for old in sorted(directory.glob('*.json'))[:-PROFILER_MAX_CAPTURES]:
+        old.unlink(missing_ok=True)
+        old.with_suffix('.prof').unlink(missing_ok=True)
+    return capture_id
+
+
+def load_captures():
+    """Return stored captures from the oldest to the newest."""
+    captures = []
+    for path in sorted(Path(PROFILER_DIR).glob('*.json')):
+        try:
+            captures.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return captures
+
+
+class ProfilerMiddleware(MiddlewareMixin):
+    """Profile requests of a worker thread, enabled by PROFILER_ENABLED.
+
+    The middleware is synchronous, so the thread which runs it also runs
+    the ORM and serializer work of async views.
+    """
+
+    async_capable = False
+
+    def __init__(self, get_response):
+        """Turn the middleware off unless the profiler is enabled."""
+        if not PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        """Start profiling a request which may be captured."""
+        trigger = None
+        if is_signed_profile_request(request.headers.get(PROFILER_HEADER, '')):
+            trigger = 'header'
+        elif PROFILER_SAMPLE_RATE and random.random() < PROFILER_SAMPLE_RATE:
+            trigger = 'sample'
+        elif not PROFILER_LATENCY_THRESHOLD:
+            return
+        capture = request.profiler_capture = {
+            'trigger': trigger,
+            'profile': None,
+            'traced': False,
+        }
+        if trigger is not None and deep_profile_lock.acquire(blocking=False):
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                capture['traced'] = True
+            tracemalloc.reset_peak()
+            capture['memory'] = tracemalloc.get_traced_memory()[0]
+            capture['profile'] = cProfile.Profile()
+        sampler.start(threading.get_ident())
+        capture['started'] = time.perf_counter()
+        if capture['profile'] is not None:
+            capture['profile'].enable()
+
+    def process_response(self, request, response):
+        """Save a profile of a requested, sampled or slow request."""
+        capture = getattr(request, 'profiler_capture', None)
+        if capture is None:
+            return response
+        profile = capture['profile']
+        if profile is not None:
+            profile.disable()
+        duration = time.perf_counter() - capture['started']
+        stacks = sampler.stop(threading.get_ident())
+        peak_memory = None
+        if profile is not None:
+            peak_memory = (
+                tracemalloc.get_traced_memory()[1] - capture['memory']
+            )
+            if capture['traced']:
+                tracemalloc.stop()
+            deep_profile_lock.release()
+        trigger = capture['trigger']
+        if trigger is None:
+            if duration * 1000 < PROFILER_LATENCY_THRESHOLD:
+                return response
+            trigger = 'latency'
+        match = request.resolver_match
+        save_capture(
+            {
+                'created': time.time(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'route': match.view_name if match else None,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'trigger': trigger,
+                'peak_memory': peak_memory,
+                'samples': sum(stacks.values()),
+                'interval_ms': PROFILER_SAMPLE_INTERVAL * 1000,
+            },
+            stacks,
+            profile,
+        )
+        return response
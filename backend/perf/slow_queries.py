@@ -0,0 +1,139 @@
+"""Describe a log of slow queries with plans of their fingerprints.
+
+Queries slower than SLOW_QUERY_THRESHOLD milliseconds are logged as JSON
+lines by the `perf.slow_queries` logger, which writes to a rotating file
+of every process. The first slow SELECT of every fingerprint in a process
+is explained with EXPLAIN (ANALYZE, BUFFERS) when SLOW_QUERY_EXPLAIN is
+enabled. The plan runs the query again inside a request which was already
+slow, so it is disabled by default and meant for a short investigation.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from time import perf_counter
+
+from foodgram.settings import SLOW_QUERY_EXPLAIN, SLOW_QUERY_THRESHOLD
+from perf.sql import fingerprint, query_origin, query_view
+
+EXPLAIN_PREFIX = 'EXPLAIN (ANALYZE, BUFFERS) '
+EXPLAIN_SAVEPOINT = 'slow_query_explain'
+MAXIMUM_EXPLAINED = 1000
+PLAIN_PARAMS = (bool, type(None))
+
+logger = logging.getLogger(__name__)
+
+explained = set()
+explained_lock = threading.Lock()
+
+
+class ProcessRotatingFileHandler(RotatingFileHandler):
+    """Describe a rotating log file of a single process.
+
+    Gunicorn workers inherit handlers from a master which preloads the
+    application, and rotating a file shared by them loses lines. So every
+    process writes and rotates its own file with a pid suffix, files of
+    recycled workers are kept until they are removed.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        """Remember a path which pid suffixes are added to."""
+        self.path = filename
+        self.pid = os.getpid()
+        super().__init__(f'{filename}.{self.pid}', *args, **kwargs)
+
+    def emit(self, record):
+        """Switch to a file of the current process after a fork."""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = os.path.abspath(f'{self.path}.{self.pid}')
+        super().emit(record)
+
+
+def redact(value):
+    """Replace a query param with its type and size."""
+    if isinstance(value, PLAIN_PARAMS):
+        return value
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f'<{type(value).__name__}:{len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def redact_params(params):
+    """Redact every param of a query."""
+    if isinstance(params, dict):
+        return {name: redact(value) for name, value in params.items()}
+    return [redact(value) for value in params or ()]
+
+
+def explain(connection, sql, params):
+    """Return a plan of a query or None if it can not be explained.
+
+    A raw cursor bypasses execute wrappers, a savepoint keeps an open
+    transaction usable when the plan fails.
+    """
+    in_transaction = connection.in_atomic_block
+    with connection.connection.cursor() as cursor:
+        if in_transaction:
+            cursor.execute(f'SAVEPOINT {EXPLAIN_SAVEPOINT}')
+        try:
+            cursor.execute(EXPLAIN_PREFIX + sql, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        except connection.Database.Error:
+            if in_transaction:
+                cursor.execute(f'ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}')
+            return None
+        if in_transaction:
+            cursor.execute(f'RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}')
+    return plan
+
+
+def should_explain(key, sql, many):
+    """Check that a query is a SELECT which fingerprint was not explained."""
+    if not SLOW_QUERY_EXPLAIN or many:
+        return False
+    if not sql.lstrip()[:6].upper() == 'SELECT':
+        return False
+    with explained_lock:
+        if key in explained or len(explained) >= MAXIMUM_EXPLAINED:
+            return False
+        explained.add(key)
+    return True
+
+
+def record_slow_query(execute, sql, params, many, context):
+    """Log a query which took longer than a threshold."""
+    started = perf_counter()
+    result = execute(sql, params, many, context)
+    duration = perf_counter() - started
+    if duration * 1000 < SLOW_QUERY_THRESHOLD:
+        return result
+    key = fingerprint(sql)
+    field, line = query_origin()
+    connection = context['connection']
+    logger.info(json.dumps({
+        'time': datetime.now(timezone.utc).isoformat(),
+        'duration_ms': round(duration * 1000, 2),
+        'fingerprint': key,
+        'params': None if many else redact_params(params),
+        'database': connection.alias,
+        'view': query_view(),
+        'field': field,
+        'line': line,
+        'plan': (
+            explain(connection, sql, params)
+            if should_explain(key, sql, many) else None
+        ),
+    }))
+    return result
+
+
+def install_slow_query_recorder(sender, connection, **kwargs):
+    """Wrap queries of a new connection once, wrappers survive reconnects."""
+    if record_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_query)
@@ -0,0 +1,82 @@
+"""Describe normalization of SQL and lookup of code which runs it."""
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+from django.apps import apps
+
+from foodgram.settings import BASE_DIR
+
+NORMALIZATIONS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),
+    (
+        re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE),
+        'IN (...)',
+    ),
+    (re.compile(r'\s+'), ' '),
+)
+PROJECT_DIR = str(BASE_DIR) + '/'
+SERIALIZERS_FILE = str(Path('rest_framework', 'serializers.py'))
+VIEWS_FILE = str(Path('rest_framework', 'views.py'))
+
+
+def fingerprint(sql):
+    """Return a template of a query without literals and IN lists."""
+    for pattern, replacement in NORMALIZATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+@lru_cache(maxsize=None)
+def app_dirs():
+    """Return directories of project apps, this app excluded."""
+    return tuple(
+        app.path + '/' for app in apps.get_app_configs()
+        if app.path.startswith(PROJECT_DIR) and app.name != __package__
+    )
+
+
+def query_origin(depth=2):
+    """Return a serializer field and an app code line of a query."""
+    field = line = None
+    frame = sys._getframe(depth)
+    while frame is not None and (field is None or line is None):
+        code = frame.f_code
+        if (
+            field is None
+            and code.co_name == 'to_representation'
+            and code.co_filename.endswith(SERIALIZERS_FILE)
+            and 'field' in frame.f_locals
+        ):
+            serializer = type(frame.f_locals['self']).__name__
+            field = f'{serializer}.{frame.f_locals["field"].field_name}'
+        if (
+            line is None
+            and code.co_filename.startswith(app_dirs())
+        ):
+            line = (
+                f'{code.co_filename[len(PROJECT_DIR):]}:{frame.f_lineno} '
+                f'in {code.co_name}'
+            )
+        frame = frame.f_back
+    return field, line
+
+
+def query_view(depth=2):
+    """Return a viewset action or a view method which runs a query."""
+    frame = sys._getframe(depth)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'dispatch' and code.co_filename.endswith(
+            VIEWS_FILE,
+        ):
+            view = frame.f_locals['self']
+            action = getattr(view, 'action', None)
+            return (
+                f'{type(view).__name__}.'
+                f'{action or frame.f_locals["request"].method.lower()}'
+            )
+        frame = frame.f_back
+    return None
@@ -0,0 +1,308 @@
+"""Describe per-request timings and their Prometheus histograms.
+
+Timings of a request live in a context variable, so queries and spans
+executed in threads of async views are counted too. Histograms are kept
+per route of a worker process. With TELEMETRY_METRICS_DIR set, workers
+flush them to files in a background thread and the metrics endpoint
+merges files of all workers.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from time import perf_counter
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from foodgram.settings import (TELEMETRY_ENABLED, TELEMETRY_FLUSH_SECONDS,
+                               TELEMETRY_METRICS_DIR, TELEMETRY_METRICS_PATH,
+                               TELEMETRY_SERVER_TIMING)
+
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+METRICS = {
+    'duration': (
+        'foodgram_request_duration_seconds',
+        'Time from the telemetry middleware to a response.',
+        SECONDS_BUCKETS,
+    ),
+    'queries': (
+        'foodgram_request_queries',
+        'Database queries of a request.',
+        QUERIES_BUCKETS,
+    ),
+    'db': (
+        'foodgram_request_db_seconds',
+        'Time spent executing database queries.',
+        SECONDS_BUCKETS,
+    ),
+    'serializer': (
+        'foodgram_request_serializer_seconds',
+        'Time spent in serializers, lazy queries included.',
+        SECONDS_BUCKETS,
+    ),
+    'render': (
+        'foodgram_request_render_seconds',
+        'Time spent rendering a response.',
+        SECONDS_BUCKETS,
+    ),
+}
+SERVER_TIMINGS = ('db', 'serializer', 'render')
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """Describe accumulated timings of a request."""
+
+    __slots__ = ('started', 'queries', 'durations', 'open_spans')
+
+    def __init__(self):
+        """Start timing a request."""
+        self.started = perf_counter()
+        self.queries = 0
+        self.durations = dict.fromkeys(SERVER_TIMINGS, 0.0)
+        self.open_spans = set()
+
+    def add(self, name, duration):
+        """Add a duration to a named timing."""
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+
+@contextmanager
+def span(name):
+    """Time a block as a named part of a current request.
+
+    Nested spans with the same name are not counted twice, so a nested
+    serializer is a part of its parent serializer time.
+    """
+    timings = current_timings.get()
+    if timings is None or name in timings.open_spans:
+        yield
+        return
+    timings.open_spans.add(name)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - started)
+        timings.open_spans.discard(name)
+
+
+class TimedSerializerMixin:
+    """Count representation and validation of a serializer as its time."""
+
+    def to_representation(self, instance):
+        """Represent an instance inside a serializer span."""
+        with span('serializer'):
+            return super().to_representation(instance)
+
+    def run_validation(self, *args, **kwargs):
+        """Validate data inside a serializer span."""
+        with span('serializer'):
+            return super().run_validation(*args, **kwargs)
+
+
+def record_query(execute, sql, params, many, context):
+    """Count a query and its time in timings of a current request."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.add('db', perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Wrap queries of a new connection once, wrappers survive reconnects."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsRegistry:
+    """Describe thread-safe histograms of a worker process."""
+
+    def __init__(self):
+        """Create an empty registry."""
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.dirty = False
+        self.flusher_pid = None
+
+    def observe(self, route, method, values):
+        """Add values of a request to histograms of its route."""
+        with self.lock:
+            for metric, value in values.items():
+                key = (metric, route, method)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    buckets = METRICS[metric][2]
+                    histogram = self.histograms[key] = [
+                        [0] * (len(buckets) + 1),
+                        0.0,
+                    ]
+                counts, _ = histogram
+                counts[bisect_left(METRICS[metric][2], value)] += 1
+                histogram[1] += value
+            self.dirty = True
+            if TELEMETRY_METRICS_DIR and self.flusher_pid != os.getpid():
+                self.flusher_pid = os.getpid()
+                threading.Thread(
+                    target=self.flush_periodically,
+                    name='metrics-flusher',
+                    daemon=True,
+                ).start()
+
+    def flush_periodically(self):
+        """Flush changed histograms of a worker in a background thread."""
+        while True:
+            time.sleep(TELEMETRY_FLUSH_SECONDS)
+            with self.lock:
+                if self.dirty:
+                    self.flush()
+
+    def snapshot(self):
+        """Return histograms as rows which can be stored as JSON."""
+        return [
+            [*key, list(counts), total]
+            for key, (counts, total) in self.histograms.items()
+        ]
+
+    def flush(self):
+        """Store histograms of a process in a metrics directory."""
+        directory = Path(TELEMETRY_METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        temporary = directory / f'.{os.getpid()}.tmp'
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, directory / f'{os.getpid()}.json')
+        self.dirty = False
+
+    def collect(self):
+        """Return histograms of this process or merged from all workers."""
+        with self.lock:
+            if not TELEMETRY_METRICS_DIR:
+                return self.snapshot()
+            self.flush()
+        merged = {}
+        for path in Path(TELEMETRY_METRICS_DIR).glob('*.json'):
+            try:
+                rows = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for metric, route, method, counts, total in rows:
+                key = (metric, route, method)
+                if key not in merged:
+                    merged[key] = [[0] * len(counts), 0.0]
+                merged_counts = merged[key][0]
+                for index, count in enumerate(counts):
+                    merged_counts[index] += count
+                merged[key][1] += total
+        return [
+            [*key, counts, total] for key, (counts, total) in merged.items()
+        ]
+
+    def render(self):
+        """Render histograms in the Prometheus text format."""
+        rows = sorted(self.collect())
+        lines = []
+        for metric, (name, description, buckets) in METRICS.items():
+            lines += [
+                f'# HELP {name} {description}',
+                f'# TYPE {name} histogram',
+            ]
+            for row_metric, route, method, counts, total in rows:
+                if row_metric != metric:
+                    continue
+                labels = f'route="{route}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), counts):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}',
+                    )
+                lines += [
+                    f'{name}_sum{{{labels}}} {total}',
+                    f'{name}_count{{{labels}}} {cumulative}',
+                ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class TelemetryMiddleware(MiddlewareMixin):
+    """Time requests per route and serve metrics of workers.
+
+    Timings are added to a Server-Timing header when
+    TELEMETRY_SERVER_TIMING is enabled.
+    """
+
+    def __init__(self, get_response):
+        """Turn the middleware off when telemetry is disabled."""
+        if not TELEMETRY_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        """Start timings of a request or answer a metrics scrape."""
+        if request.path == TELEMETRY_METRICS_PATH:
+            return HttpResponse(
+                registry.render(),
+                content_type='text/plain; version=0.0.4; charset=utf-8',
+            )
+        current_timings.set(RequestTimings())
+        return None
+
+    def process_template_response(self, request, response):
+        """Time rendering of a response which is rendered after a view."""
+        timings = current_timings.get()
+        if timings is not None:
+            started = perf_counter()
+
+            def finish_render(rendered):
+                timings.add('render', perf_counter() - started)
+
+            response.add_post_render_callback(finish_render)
+        return response
+
+    def process_response(self, request, response):
+        """Observe timings of a request in histograms of its route."""
+        timings = current_timings.get()
+        if timings is None:
+            return response
+        current_timings.set(None)
+        duration = perf_counter() - timings.started
+        match = request.resolver_match
+        registry.observe(
+            match.view_name if match else 'unmatched',
+            request.method,
+            {
+                'duration': duration,
+                'queries': timings.queries,
+                **{name: timings.durations[name] for name in SERVER_TIMINGS},
+            },
+        )
+        if TELEMETRY_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join(
+                [
+                    f'db;dur={timings.durations["db"] * 1000:.1f};'
+                    f'desc="{timings.queries} queries"',
+                    *(
+                        f'{name};dur={timings.durations[name] * 1000:.1f}'
+                        for name in SERVER_TIMINGS[1:]
+                    ),
+                    f'total;dur={duration * 1000:.1f}',
+                ],
+            )
+        return response
@@ -0,0 +1,93 @@
+"""Describe denormalized documents of recipes for reads.
+
+A document contains everything of a recipe representation which does
+not depend on a viewer: the recipe, its author, tags ordered by names
+and ingredients ordered by names and measurement units like in
+GetRecipeSerializer. Documents are written by a
+single statement building JSON in the database, they are refreshed
+when recipes, tags, ingredients or authors change. Documents are built
+on PostgreSQL only.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,
+                            RecipeDocument, Tag, TagRecipe)
+
+User = get_user_model()
+
+# Documents are built with JSON functions of PostgreSQL, recipes are
+# represented from relations on other databases.
+DOCUMENTS = connection.vendor == 'postgresql'
+
+
+def document_sql():
+    """Return SQL selecting recipe ids and their documents."""
+    quote_name = connection.ops.quote_name
+    recipe = quote_name(Recipe._meta.db_table)
+    user = quote_name(User._meta.db_table)
+    tag = quote_name(Tag._meta.db_table)
+    tag_recipe = quote_name(TagRecipe._meta.db_table)
+    ingredient = quote_name(Ingredient._meta.db_table)
+    ingredient_recipe = quote_name(IngredientRecipe._meta.db_table)
+    return (
+        f'SELECT {recipe}.id, jsonb_build_object('
+        f"'id', {recipe}.id, "
+        f"'tags', COALESCE((SELECT jsonb_agg(jsonb_build_object("
+        f"'id', {tag}.id, 'name', {tag}.name, "
+        f"'color', {tag}.color, 'slug', {tag}.slug) "
+        f'ORDER BY {tag}.name) FROM {tag_recipe} '
+        f'JOIN {tag} ON {tag}.id = {tag_recipe}.tag_id '
+        f"WHERE {tag_recipe}.recipe_id = {recipe}.id), '[]'), "
+        f"'author', jsonb_build_object("
+        f"'email', {user}.email, 'id', {user}.id, "
+        f"'username', {user}.username, "
+        f"'first_name', {user}.first_name, "
+        f"'last_name', {user}.last_name), "
+        f"'ingredients', COALESCE((SELECT jsonb_agg(jsonb_build_object("
+        f"'id', {ingredient}.id, 'name', {ingredient}.name, "
+        f"'measurement_unit', {ingredient}.measurement_unit, "
+        f"'amount', {ingredient_recipe}.quantity) "
+        f'ORDER BY {ingredient}.name, {ingredient}.measurement_unit) '
+        f'FROM {ingredient_recipe} '
+        f'JOIN {ingredient} '
+        f'ON {ingredient}.id = {ingredient_recipe}.ingredient_id '
+        f"WHERE {ingredient_recipe}.recipe_id = {recipe}.id), '[]'), "
+        f"'name', {recipe}.name, "
+        f"'image', {recipe}.image, "
+        f"'text', {recipe}.description, "
+        f"'cooking_time', {recipe}.cooking_time) "
+        f'FROM {recipe} JOIN {user} ON {user}.id = {recipe}.author_id'
+    )
+
+
+def refresh_documents(recipe_ids=None):
+    """Write documents of recipes, of all recipes without ids.
+
+    Return an amount of written documents.
+    """
+    if not DOCUMENTS:
+        return 0
+    quote_name = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {quote_name(RecipeDocument._meta.db_table)} '
+        f'(recipe_id, data) {document_sql()}'
+    )
+    params = ()
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return 0
+        sql += f' WHERE {quote_name(Recipe._meta.db_table)}.id = ANY(%s)'
+        params = (recipe_ids,)
+    sql += ' ON CONFLICT (recipe_id) DO UPDATE SET data = EXCLUDED.data'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def refresh_related_documents(**lookups):
+    """Write documents of recipes matching lookups."""
+    return refresh_documents(
+        Recipe.objects.filter(**lookups).values_list('pk', flat=True),
+    )
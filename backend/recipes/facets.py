@@ -0,0 +1,101 @@
+"""Describe faceted counts of tags and ingredients of filtered recipes.
+
+Every facet is one GROUP BY over a relation table restricted to a
+filtered set of recipes. Facets which do not depend on a viewer are
+cached under keys of a facets version, writes of recipes, tags and
+ingredients in the API or the admin replace the version, so older keys
+are never read again and expire. The cache is shared by all workers.
+"""
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from foodgram.settings import RECIPE_FACETS_INGREDIENTS, RECIPE_FACETS_TTL
+from recipes.models import IngredientRecipe, Tag, TagRecipe
+
+VERSION_KEY = 'recipe-facets:version'
+
+
+def tag_counts(recipes):
+    """Return all tags with amounts of recipes having them."""
+    counts = dict(
+        TagRecipe.objects.filter(recipe__in=recipes.values('pk')).values(
+            'tag_id',
+        ).annotate(count=Count('id')).order_by().values_list(
+            'tag_id',
+            'count',
+        ),
+    )
+    return [
+        {**tag, 'count': counts.get(tag['id'], 0)}
+        for tag in Tag.objects.values('id', 'name', 'color', 'slug')
+    ]
+
+
+def ingredient_counts(recipes, limit=RECIPE_FACETS_INGREDIENTS):
+    """Return the most used ingredients with amounts of recipes."""
+    return [
+        {
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'count': count,
+        }
+        for ingredient_id, name, measurement_unit, count in (
+            IngredientRecipe.objects.filter(
+                recipe__in=recipes.values('pk'),
+            ).values(
+                'ingredient_id',
+                'ingredient__name',
+                'ingredient__measurement_unit',
+            ).annotate(count=Count('id')).order_by(
+                '-count',
+                'ingredient__name',
+            ).values_list(
+                'ingredient_id',
+                'ingredient__name',
+                'ingredient__measurement_unit',
+                'count',
+            )[:limit]
+        )
+    ]
+
+
+def count_facets(tag_recipes, ingredient_recipes):
+    """Count tags and ingredients of recipes.
+
+    Tags are counted over recipes filtered by everything except tags, so
+    a count of a tag is an amount of recipes having the tag under the
+    other filters.
+    """
+    return {
+        'tags': tag_counts(tag_recipes),
+        'ingredients': ingredient_counts(ingredient_recipes),
+    }
+
+
+def facets_version():
+    """Return the current version of cached facets."""
+    return cache.get_or_set(VERSION_KEY, uuid4().hex, timeout=None)
+
+
+def invalidate_facets():
+    """Replace a version of cached facets after a transaction commits."""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid4().hex, timeout=None),
+    )
+
+
+def cached_facets(key, count):
+    """Return facets cached under a key of the current version.
+
+    Count is called to compute facets which are not cached yet.
+    """
+    key = f'recipe-facets:{facets_version()}:{key}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = count()
+        cache.set(key, facets, timeout=RECIPE_FACETS_TTL)
+    return facets
@@ -0,0 +1,127 @@
+"""Describe fan-out on write feed of followed authors' recipes."""
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from foodgram.settings import FEED_FANOUT_BATCH_SIZE, FEED_MAX_LENGTH
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+
+def trim_feeds(user_ids):
+    """Delete feed entries exceeding FEED_MAX_LENGTH for certain users."""
+    overflow = FeedEntry.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('user_id'),
+            order_by=(F('pub_date').desc(), F('recipe_id').desc()),
+        ),
+    ).filter(position__gt=FEED_MAX_LENGTH)
+    FeedEntry.objects.filter(pk__in=overflow.values('pk')).delete()
+
+
+def fan_out_recipe(recipe_id):
+    """Add a recipe in feeds of all followers of its author by batches."""
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'author_id',
+        'pub_date',
+    ).first()
+    if recipe is None:
+        return
+
+    followers = Follow.objects.filter(
+        following_id=recipe['author_id'],
+    ).order_by('follower_id').values_list('follower_id', flat=True)
+    last_follower_id = 0
+    while True:
+        batch = list(
+            followers.filter(
+                follower_id__gt=last_follower_id,
+            )[:FEED_FANOUT_BATCH_SIZE],
+        )
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=follower_id,
+                    recipe_id=recipe_id,
+                    pub_date=recipe['pub_date'],
+                )
+                for follower_id in batch
+            ],
+            ignore_conflicts=True,
+        )
+        trim_feeds(batch)
+        last_follower_id = batch[-1]
+
+
+def backfill_feed(user_id, author_id):
+    """Add latest recipes of a new followed author in a user feed."""
+    if not Follow.objects.filter(
+        follower_id=user_id,
+        following_id=author_id,
+    ).exists():
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date',
+    ).values_list('pk', 'pub_date')[:FEED_MAX_LENGTH]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+            for pk, pub_date in recipes
+        ],
+        ignore_conflicts=True,
+    )
+    trim_feeds((user_id,))
+
+
+def clear_feed(user_id, author_ids):
+    """Delete recipes of unfollowed authors from a user feed."""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        recipe__author_id__in=author_ids,
+    ).delete()
+
+
+def rebuild_feeds():
+    """Fill feeds of all users from follows in a single statement.
+
+    Every feed gets up to FEED_MAX_LENGTH latest recipes of followed
+    authors, existing entries are kept. On PostgreSQL only the latest
+    recipes of every author are read by the author and date index, other
+    databases number recipes of every author.
+    """
+    quote_name = connection.ops.quote_name
+    entry = quote_name(FeedEntry._meta.db_table)
+    follow = quote_name(Follow._meta.db_table)
+    recipe = quote_name(Recipe._meta.db_table)
+    if connection.vendor == 'postgresql':
+        latest = (
+            f'CROSS JOIN LATERAL ('
+            f'SELECT id, pub_date FROM {recipe} '
+            f'WHERE author_id = {follow}.following_id '
+            f'ORDER BY pub_date DESC LIMIT %s) AS latest'
+        )
+    else:
+        latest = (
+            f'JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            f') AS author_position FROM {recipe}) AS latest '
+            f'ON latest.author_id = {follow}.following_id '
+            f'AND latest.author_position <= %s'
+        )
+    sql = (
+        f'INSERT INTO {entry} (user_id, recipe_id, pub_date) '
+        f'SELECT user_id, recipe_id, pub_date FROM ('
+        f'SELECT {follow}.follower_id AS user_id, latest.id AS recipe_id, '
+        f'latest.pub_date, ROW_NUMBER() OVER ('
+        f'PARTITION BY {follow}.follower_id '
+        f'ORDER BY latest.pub_date DESC, latest.id DESC) AS position '
+        f'FROM {follow} {latest}'
+        f') AS ranked WHERE position <= %s '
+        f'ON CONFLICT DO NOTHING'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (FEED_MAX_LENGTH, FEED_MAX_LENGTH))
+        return cursor.rowcount
@@ -0,0 +1,64 @@
+"""Describe a command which precomputes similar recipes."""
+from django.core.management.base import BaseCommand
+
+from foodgram.settings import (SIMILAR_RECIPES_CHUNK_SIZE,
+                               SIMILAR_RECIPES_METRIC, SIMILAR_RECIPES_TOP_K)
+from recipes.similarity import (METRICS, rebuild_similar_recipes,
+                                update_similar_recipes)
+
+
+class Command(BaseCommand):
+    """Compute similar recipes by ingredients overlap and store them."""
+
+    help = 'Precompute top K similar recipes by ingredients overlap.'
+
+    def add_arguments(self, parser):
+        """Describe command arguments."""
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=SIMILAR_RECIPES_TOP_K,
+            help='Amount of similar recipes stored for every recipe.',
+        )
+        parser.add_argument(
+            '--metric',
+            choices=METRICS,
+            default=SIMILAR_RECIPES_METRIC,
+            help='Similarity of ingredient sets.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=SIMILAR_RECIPES_CHUNK_SIZE,
+            help='Amount of recipes compared with all others at once.',
+        )
+        parser.add_argument(
+            '--recipe',
+            type=int,
+            action='append',
+            dest='recipe_ids',
+            help='Update only certain recipes, may be repeated.',
+        )
+
+    def handle(self, *args, **options):
+        """Rebuild all similar recipes or update certain ones."""
+        if options['recipe_ids']:
+            update_similar_recipes(
+                options['recipe_ids'],
+                k=options['top_k'],
+                metric=options['metric'],
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Updated {len(options["recipe_ids"])} recipes.',
+                ),
+            )
+            return
+
+        for processed, total in rebuild_similar_recipes(
+            k=options['top_k'],
+            metric=options['metric'],
+            chunk_size=options['chunk_size'],
+        ):
+            self.stdout.write(f'Processed {processed} of {total} recipes.')
+        self.stdout.write(self.style.SUCCESS('Similar recipes are built.'))
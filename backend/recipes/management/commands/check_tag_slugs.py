@@ -0,0 +1,47 @@
+"""Describe a command which checks denormalized recipe tag slugs."""
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import TAG_SLUGS, Recipe
+
+
+class Command(BaseCommand):
+    """Compare Recipe.tag_slugs with TagRecipe and optionally repair them."""
+
+    help = 'Check that denormalized recipe tag slugs match TagRecipe.'
+
+    def add_arguments(self, parser):
+        """Describe command arguments."""
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rewrite tag slugs of inconsistent recipes.',
+        )
+
+    def handle(self, *args, **options):
+        """Find inconsistent recipes and report or repair them."""
+        if not TAG_SLUGS:
+            self.stdout.write(
+                self.style.WARNING('Tag slugs are stored on PostgreSQL only.'),
+            )
+            return
+
+        stale_ids = list(
+            Recipe.objects.with_stale_tag_slugs().values_list(
+                'pk',
+                flat=True,
+            ),
+        )
+        if not stale_ids:
+            self.stdout.write(self.style.SUCCESS('Tag slugs are consistent.'))
+            return
+
+        if not options['fix']:
+            raise CommandError(
+                f'{len(stale_ids)} recipes have stale tag slugs: '
+                f'{", ".join(map(str, stale_ids[:20]))}',
+            )
+
+        fixed = Recipe.objects.filter(pk__in=stale_ids).sync_tag_slugs()
+        self.stdout.write(
+            self.style.SUCCESS(f'Fixed tag slugs of {fixed} recipes.'),
+        )
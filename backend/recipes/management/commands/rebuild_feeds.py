@@ -0,0 +1,22 @@
+"""Describe a command which rebuilds feeds of followed authors."""
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild_feeds, trim_feeds
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    """Fill feeds of all users with latest recipes of followed authors."""
+
+    help = (
+        'Rebuild feeds from follows, meant to backfill feeds after a deploy '
+        'and to repair fan-outs lost by restarted workers.'
+    )
+
+    def handle(self, *args, **options):
+        """Insert missing feed entries and trim overflowing feeds."""
+        rows = rebuild_feeds()
+        trim_feeds(FeedEntry.objects.values('user_id').distinct())
+        self.stdout.write(
+            self.style.SUCCESS(f'Feeds got {rows} new entries.'),
+        )
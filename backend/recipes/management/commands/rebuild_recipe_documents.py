@@ -0,0 +1,21 @@
+"""Describe a command which rebuilds denormalized recipe documents."""
+from django.core.management.base import BaseCommand
+
+from recipes.documents import refresh_documents
+
+
+class Command(BaseCommand):
+    """Write documents of all recipes from their relations."""
+
+    help = (
+        'Rebuild documents of all recipes, meant to fill documents of '
+        'existing recipes and to repair them after writes outside of '
+        'the API and the admin.'
+    )
+
+    def handle(self, *args, **options):
+        """Replace documents of all recipes."""
+        documents = refresh_documents()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {documents} recipe documents.'),
+        )
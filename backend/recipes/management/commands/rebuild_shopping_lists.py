@@ -0,0 +1,20 @@
+"""Describe a command which rebuilds materialized shopping lists."""
+from django.core.management.base import BaseCommand
+
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    """Recompute shopping lists of all users from their carts."""
+
+    help = (
+        'Rebuild shopping lists from shopping carts, meant to repair lists '
+        'after carts or recipe ingredients were changed outside of the API.'
+    )
+
+    def handle(self, *args, **options):
+        """Replace all shopping list rows."""
+        rows = rebuild_shopping_lists()
+        self.stdout.write(
+            self.style.SUCCESS(f'Shopping lists have {rows} ingredients.'),
+        )
@@ -0,0 +1,65 @@
+"""Describe a command which fills the database with synthetic data."""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.settings import BASE_DIR
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.seed import USERS_PER_SCALE, flush, seed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Generate a deterministic dataset for load tests and benchmarks."""
+
+    help = 'Fill empty tables with a deterministic synthetic dataset.'
+
+    def add_arguments(self, parser):
+        """Describe command arguments."""
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=1,
+            help=f'Amount of thousands ({USERS_PER_SCALE}) of users.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the random generator.',
+        )
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Delete existing users, recipes, tags and ingredients.',
+        )
+        parser.add_argument(
+            '--ingredients',
+            default=BASE_DIR.parent / 'data' / 'ingredients.csv',
+            help='CSV file of ingredient names and measurement units.',
+        )
+
+    def handle(self, *args, **options):
+        """Flush tables if requested and generate the dataset."""
+        if options['scale'] < 1:
+            raise CommandError('Scale should be a positive number.')
+        if options['flush']:
+            flush()
+        elif any(
+            model.objects.exists() for model in (User, Tag, Ingredient, Recipe)
+        ):
+            raise CommandError(
+                'Tables are not empty, pass --flush to delete their rows.',
+            )
+        for table, rows in seed(
+            options['scale'],
+            options['ingredients'],
+            seed=options['seed'],
+        ):
+            self.stdout.write(f'Written {rows} rows of {table}.')
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Dataset is generated, run build_similar_recipes '
+                'to precompute similar recipes.',
+            ),
+        )
@@ -0,0 +1,32 @@
+"""Describe a command which updates popularity rankings of recipes."""
+from django.core.management.base import BaseCommand
+
+from recipes.ranking import refresh_rankings
+
+
+class Command(BaseCommand):
+    """Apply new favorites and cart additions to recipe rankings."""
+
+    help = (
+        'Update popular and trending rankings of recipes, '
+        'meant to be run periodically.'
+    )
+
+    def add_arguments(self, parser):
+        """Describe command arguments."""
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute rankings from scratch including removals.',
+        )
+
+    def handle(self, *args, **options):
+        """Refresh rankings from a watermark or from scratch."""
+        state = refresh_rankings(full=options['full'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rankings are updated up to favorite '
+                f'{state.last_favorite_id} and cart addition '
+                f'{state.last_cart_id}.',
+            ),
+        )
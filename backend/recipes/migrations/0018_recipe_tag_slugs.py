@@ -0,0 +1,49 @@
+# Generated by Django 4.2.1 on 2026-10-19 02:14
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import connection, migrations, models
+from django.db.models import OuterRef
+
+
+def fill_tag_slugs(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TagRecipe = apps.get_model('recipes', 'TagRecipe')
+    Recipe.objects.update(
+        tag_slugs=ArraySubquery(
+            TagRecipe.objects.filter(
+                recipe=OuterRef('pk'),
+            ).order_by('tag__slug').values('tag__slug'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0017_alter_ingredientrecipe_quantity_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_slugs',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.SlugField(),
+                blank=True,
+                default=list,
+                editable=False,
+                help_text='Contains denormalized sorted slugs of recipe tags',
+                size=None,
+                verbose_name='Tag slugs',
+            ),
+        ),
+        migrations.RunPython(fill_tag_slugs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['tag_slugs'],
+                name='recipe_tag_slugs_gin',
+            ),
+        ),
+    ] if connection.vendor == 'postgresql' else []
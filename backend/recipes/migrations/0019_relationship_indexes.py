@@ -0,0 +1,95 @@
+# Generated by Django 4.2.1 on 2026-10-19 02:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_tag_recipes(apps, schema_editor):
+    TagRecipe = apps.get_model('recipes', 'TagRecipe')
+    duplicates = (
+        TagRecipe.objects.values('recipe', 'tag')
+        .annotate(first_id=Min('id'), chains=Count('id'))
+        .filter(chains__gt=1)
+    )
+    for duplicate in duplicates:
+        TagRecipe.objects.filter(
+            recipe=duplicate['recipe'],
+            tag=duplicate['tag'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0018_recipe_tag_slugs'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='favorite',
+            options={
+                'verbose_name': 'Favorite',
+                'verbose_name_plural': 'Favorites',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='ingredient',
+            options={
+                'verbose_name': 'Ingredient',
+                'verbose_name_plural': 'Ingredients',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='shoppingcart',
+            options={
+                'verbose_name': 'Shopping cart',
+                'verbose_name_plural': 'Shopping carts',
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='favorite',
+            name='unique_favorite',
+        ),
+        migrations.RemoveConstraint(
+            model_name='shoppingcart',
+            name='unique_good',
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'favorite_recipe'),
+                name='unique_favorite',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'recipe_in_cart'),
+                name='unique_good',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['-pub_date', 'name'],
+                name='recipe_pub_date_name_idx',
+            ),
+        ),
+        migrations.RunPython(
+            delete_duplicate_tag_recipes,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='tagrecipe',
+            constraint=models.UniqueConstraint(
+                fields=('recipe', 'tag'),
+                name='unique_tag_in_recipe',
+            ),
+        ),
+    ]
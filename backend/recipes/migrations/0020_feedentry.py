@@ -0,0 +1,73 @@
+# Generated by Django 4.2.1 on 2026-10-19 02:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0019_relationship_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'pub_date',
+                    models.DateTimeField(
+                        help_text='Contains date when recipe was added',
+                        verbose_name='Date added',
+                    ),
+                ),
+                (
+                    'recipe',
+                    models.ForeignKey(
+                        help_text='Recipe of an author followed by a user',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='feed_entries',
+                        to='recipes.recipe',
+                        verbose_name='Recipe',
+                    ),
+                ),
+                (
+                    'user',
+                    models.ForeignKey(
+                        help_text='User who reads a feed',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='feed',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='User',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Feed entry',
+                'verbose_name_plural': 'Feed entries',
+                'indexes': [
+                    models.Index(
+                        fields=['user', '-pub_date', '-recipe'],
+                        name='feed_user_pub_date_idx',
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry',
+            ),
+        ),
+    ]
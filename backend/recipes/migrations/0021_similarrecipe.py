@@ -0,0 +1,73 @@
+# Generated by Django 4.2.1 on 2026-10-19 02:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0020_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarRecipe',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'score',
+                    models.FloatField(
+                        help_text=(
+                            'Contains ingredients overlap score from 0 to 1'
+                        ),
+                        verbose_name='Similarity',
+                    ),
+                ),
+                (
+                    'recipe',
+                    models.ForeignKey(
+                        help_text='Recipe which similar recipes are stored for',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='neighbours',
+                        to='recipes.recipe',
+                        verbose_name='Recipe',
+                    ),
+                ),
+                (
+                    'similar',
+                    models.ForeignKey(
+                        help_text='Recipe with overlapping ingredients',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='neighbour_of',
+                        to='recipes.recipe',
+                        verbose_name='Similar recipe',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Similar recipe',
+                'verbose_name_plural': 'Similar recipes',
+                'indexes': [
+                    models.Index(
+                        fields=['recipe', '-score'],
+                        name='similar_recipe_score_idx',
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarrecipe',
+            constraint=models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 4.2.1 on 2026-10-19 02:29
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0021_similarrecipe'),
+    ]
+
+    # Existing favorites and cart additions get a date long before any
+    # ranking epoch, so they count in popularity but not in trending.
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=datetime.datetime(
+                    2000, 1, 1, tzinfo=datetime.timezone.utc,
+                ),
+                help_text='Contains date when recipe was favorited',
+                verbose_name='Date added',
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=datetime.datetime(
+                    2000, 1, 1, tzinfo=datetime.timezone.utc,
+                ),
+                help_text='Contains date when recipe was added to cart',
+                verbose_name='Date added',
+            ),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RankingState',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'epoch',
+                    models.DateTimeField(
+                        help_text=(
+                            'Contains date which trending scores are '
+                            'relative to'
+                        ),
+                        verbose_name='Epoch',
+                    ),
+                ),
+                (
+                    'last_favorite_id',
+                    models.BigIntegerField(
+                        default=0,
+                        help_text=(
+                            'Contains the latest favorite applied to rankings'
+                        ),
+                        verbose_name='Last favorite',
+                    ),
+                ),
+                (
+                    'last_cart_id',
+                    models.BigIntegerField(
+                        default=0,
+                        help_text=(
+                            'Contains the latest cart addition applied to '
+                            'rankings'
+                        ),
+                        verbose_name='Last cart addition',
+                    ),
+                ),
+                (
+                    'updated',
+                    models.DateTimeField(
+                        help_text='Contains date when rankings were updated',
+                        null=True,
+                        verbose_name='Date updated',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Ranking state',
+                'verbose_name_plural': 'Ranking states',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                (
+                    'recipe',
+                    models.OneToOneField(
+                        help_text='Ranked recipe',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='ranking',
+                        serialize=False,
+                        to='recipes.recipe',
+                        verbose_name='Recipe',
+                    ),
+                ),
+                (
+                    'popular',
+                    models.FloatField(
+                        default=0,
+                        help_text=(
+                            'Contains weighted amount of favorites and cart '
+                            'additions'
+                        ),
+                        verbose_name='Popularity',
+                    ),
+                ),
+                (
+                    'trending',
+                    models.FloatField(
+                        default=0,
+                        help_text=(
+                            'Contains time-decayed popularity relative to an '
+                            'epoch'
+                        ),
+                        verbose_name='Trending score',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Recipe ranking',
+                'verbose_name_plural': 'Recipe rankings',
+                'indexes': [
+                    models.Index(
+                        fields=['-popular', '-recipe'],
+                        name='ranking_popular_idx',
+                    ),
+                    models.Index(
+                        fields=['-trending', '-recipe'],
+                        name='ranking_trending_idx',
+                    ),
+                ],
+            },
+        ),
+    ]
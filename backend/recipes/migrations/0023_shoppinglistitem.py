@@ -0,0 +1,91 @@
+# Generated by Django 4.2.1 on 2026-10-19 03:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+FILL_SHOPPING_LISTS = '''
+    INSERT INTO recipes_shoppinglistitem
+        (user_id, ingredient_id, total, recipes_count)
+    SELECT cart.user_id, ingredient.ingredient_id,
+        SUM(ingredient.quantity), COUNT(*)
+    FROM recipes_shoppingcart AS cart
+    JOIN recipes_ingredientrecipe AS ingredient
+        ON ingredient.recipe_id = cart.recipe_in_cart_id
+    GROUP BY cart.user_id, ingredient.ingredient_id
+'''
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0022_recipe_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'total',
+                    models.PositiveIntegerField(
+                        help_text=(
+                            'Contains a sum of quantities of recipes in a cart'
+                        ),
+                        verbose_name='Total quantity',
+                    ),
+                ),
+                (
+                    'recipes_count',
+                    models.PositiveIntegerField(
+                        help_text=(
+                            'Contains an amount of recipes in a cart '
+                            'which need it'
+                        ),
+                        verbose_name='Recipes amount',
+                    ),
+                ),
+                (
+                    'ingredient',
+                    models.ForeignKey(
+                        help_text='Ingredient of recipes in a shopping cart',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='shopping_list_items',
+                        to='recipes.ingredient',
+                        verbose_name='Ingredient',
+                    ),
+                ),
+                (
+                    'user',
+                    models.ForeignKey(
+                        help_text='User who buys an ingredient',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='shopping_list',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='User',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Shopping list item',
+                'verbose_name_plural': 'Shopping list items',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_ingredient',
+            ),
+        ),
+        migrations.RunSQL(FILL_SHOPPING_LISTS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.1 on 2026-10-19 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0023_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDocument',
+            fields=[
+                (
+                    'recipe',
+                    models.OneToOneField(
+                        help_text='Recipe which is represented by a document',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='document',
+                        serialize=False,
+                        to='recipes.recipe',
+                        verbose_name='Recipe',
+                    ),
+                ),
+                (
+                    'data',
+                    models.JSONField(
+                        help_text=(
+                            'Contains a recipe with its author, tags '
+                            'and ingredients'
+                        ),
+                        verbose_name='Document',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Recipe document',
+                'verbose_name_plural': 'Recipe documents',
+            },
+        ),
+    ]
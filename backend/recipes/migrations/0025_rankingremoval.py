@@ -0,0 +1,43 @@
+# Generated by Django 4.2.1 on 2026-10-19 05:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0024_recipedocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingRemoval',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'recipe',
+                    models.ForeignKey(
+                        help_text=(
+                            'Recipe which lost a favorite or a cart addition'
+                        ),
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='recipes.recipe',
+                        verbose_name='Recipe',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Ranking removal',
+                'verbose_name_plural': 'Ranking removals',
+            },
+        ),
+    ]
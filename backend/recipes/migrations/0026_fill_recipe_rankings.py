@@ -0,0 +1,27 @@
+# Generated by Django 4.2.1 on 2026-10-19 05:40
+
+from django.db import migrations
+
+
+def fill_rankings(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    RecipeRanking.objects.bulk_create(
+        (
+            RecipeRanking(recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.filter(
+                ranking__isnull=True,
+            ).values_list('pk', flat=True).iterator()
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0025_rankingremoval'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
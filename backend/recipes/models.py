@@ -1,13 +1,21 @@
 """Describe models of a Recipe app."""
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core import validators
-from django.db import models
+from django.db import connection, models
+from django.db.models import F, OuterRef
 
 from foodgram.settings import (MAXIMUM_COOKING_TIME, MAXIMUM_INGREDIENT_AMOUNT,
                                MINIMUM_COOKING_TIME, MINIMUM_INGREDIENT_AMOUNT)
 
 User = get_user_model()
 
+# Tag slugs are denormalized into an array on PostgreSQL only, other
+# databases filter recipes by tags through TagRecipe.
+TAG_SLUGS = connection.vendor == 'postgresql'
+
 
 class Ingredient(models.Model):
     """Describe a model which stores information about ingredients."""
@@ -26,7 +34,6 @@ class Ingredient(models.Model):
     class Meta:
         """Describe settings for the Ingredient model."""
 
-        ordering = ('name', 'measurement_unit')
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
 
@@ -69,6 +76,33 @@ class Tag(models.Model):
         return self.name
 
 
+def tag_slugs_subquery():
+    """Build a sorted array of recipe tag slugs taken from TagRecipe."""
+    return ArraySubquery(
+        TagRecipe.objects.filter(
+            recipe=OuterRef('pk'),
+        ).order_by('tag__slug').values('tag__slug'),
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Describe custom queries for the Recipe model."""
+
+    def sync_tag_slugs(self):
+        """Rewrite denormalized tag slugs from TagRecipe in one statement."""
+        if not TAG_SLUGS:
+            return 0
+        return self.update(tag_slugs=tag_slugs_subquery())
+
+    def with_stale_tag_slugs(self):
+        """Select recipes which tag slugs differ from TagRecipe."""
+        if not TAG_SLUGS:
+            return self.none()
+        return self.annotate(
+            actual_tag_slugs=tag_slugs_subquery(),
+        ).exclude(tag_slugs=F('actual_tag_slugs'))
+
+
 class Recipe(models.Model):
     """Describe a model which stores recipes."""
 
@@ -118,11 +152,35 @@ class Recipe(models.Model):
         verbose_name='Date added',
         help_text='Contains date when recipe was added',
     )
+    if TAG_SLUGS:
+        tag_slugs = ArrayField(
+            models.SlugField(max_length=50),
+            verbose_name='Tag slugs',
+            help_text='Contains denormalized sorted slugs of recipe tags',
+            default=list,
+            blank=True,
+            editable=False,
+        )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         """Describe settings for the Recipe model."""
 
         ordering = ('-pub_date', 'name')
+        indexes = (
+            (GinIndex(fields=('tag_slugs',), name='recipe_tag_slugs_gin'),)
+            if TAG_SLUGS else ()
+        ) + (
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('-pub_date', 'name'),
+                name='recipe_pub_date_name_idx',
+            ),
+        )
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
 
@@ -184,6 +242,16 @@ class TagRecipe(models.Model):
         """Show a tag - recipe chain."""
         return f'{self.tag} {self.recipe}'
 
+    class Meta:
+        """Describe settings for the TagRecipe model."""
+
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'tag'),
+                name='unique_tag_in_recipe',
+            ),
+        )
+
 
 class Favorite(models.Model):
     """Describe a model which stores favorited recipes for a certain user."""
@@ -202,16 +270,20 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorites',
     )
+    created = models.DateTimeField(
+        verbose_name='Date added',
+        help_text='Contains date when recipe was favorited',
+        auto_now_add=True,
+    )
 
     class Meta:
         """Describe settings for the Favorite model."""
 
-        ordering = ('user', 'favorite_recipe')
         verbose_name = 'Favorite'
         verbose_name_plural = 'Favorites'
         constraints = (
             models.UniqueConstraint(
-                fields=('favorite_recipe', 'user'),
+                fields=('user', 'favorite_recipe'),
                 name='unique_favorite',
             ),
         )
@@ -238,16 +310,20 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='cart',
     )
+    created = models.DateTimeField(
+        verbose_name='Date added',
+        help_text='Contains date when recipe was added to cart',
+        auto_now_add=True,
+    )
 
     class Meta:
         """Describe settings for the ShoppingCart model."""
 
-        ordering = ('user', 'recipe_in_cart')
         verbose_name = 'Shopping cart'
         verbose_name_plural = 'Shopping carts'
         constraints = (
             models.UniqueConstraint(
-                fields=('recipe_in_cart', 'user'),
+                fields=('user', 'recipe_in_cart'),
                 name='unique_good',
             ),
         )
@@ -257,3 +333,268 @@ class ShoppingCart(models.Model):
         return (
             f'Recipe {self.recipe_in_cart} in shopping cart for {self.user}'
         )
+
+
+class RecipeDocument(models.Model):
+    """Describe a model which stores a denormalized recipe for reads."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Recipe',
+        help_text='Recipe which is represented by a document',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+    )
+    data = models.JSONField(
+        verbose_name='Document',
+        help_text='Contains a recipe with its author, tags and ingredients',
+    )
+
+    class Meta:
+        """Describe settings for the RecipeDocument model."""
+
+        verbose_name = 'Recipe document'
+        verbose_name_plural = 'Recipe documents'
+
+    def __str__(self):
+        """Show a recipe of a document."""
+        return f'Document of recipe {self.recipe_id}'
+
+
+class ShoppingListItem(models.Model):
+    """Describe a model which stores ingredients of a user shopping cart."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='User',
+        help_text='User who buys an ingredient',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ingredient',
+        help_text='Ingredient of recipes in a shopping cart',
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    total = models.PositiveIntegerField(
+        verbose_name='Total quantity',
+        help_text='Contains a sum of quantities of recipes in a cart',
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Recipes amount',
+        help_text='Contains an amount of recipes in a cart which need it',
+    )
+
+    class Meta:
+        """Describe settings for the ShoppingListItem model."""
+
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list items'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_ingredient',
+            ),
+        )
+
+    def __str__(self):
+        """Show an ingredient in a shopping list of a certain user."""
+        return f'{self.total} of {self.ingredient} for {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Describe a model which stores recipes of followed authors."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='User',
+        help_text='User who reads a feed',
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Recipe',
+        help_text='Recipe of an author followed by a user',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Date added',
+        help_text='Contains date when recipe was added',
+    )
+
+    class Meta:
+        """Describe settings for the FeedEntry model."""
+
+        verbose_name = 'Feed entry'
+        verbose_name_plural = 'Feed entries'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        """Show a feed entry for a certain user."""
+        return f'Recipe {self.recipe} in feed of {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """Describe a model which stores precomputed similar recipes."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Recipe',
+        help_text='Recipe which similar recipes are stored for',
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Similar recipe',
+        help_text='Recipe with overlapping ingredients',
+        on_delete=models.CASCADE,
+        related_name='neighbour_of',
+    )
+    score = models.FloatField(
+        verbose_name='Similarity',
+        help_text='Contains ingredients overlap score from 0 to 1',
+    )
+
+    class Meta:
+        """Describe settings for the SimilarRecipe model."""
+
+        verbose_name = 'Similar recipe'
+        verbose_name_plural = 'Similar recipes'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx',
+            ),
+        )
+
+    def __str__(self):
+        """Show a similar recipes pair."""
+        return f'Recipe {self.similar} is similar to {self.recipe}'
+
+
+class RecipeRanking(models.Model):
+    """Describe a model which stores precomputed popularity of a recipe."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Recipe',
+        help_text='Ranked recipe',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+    )
+    popular = models.FloatField(
+        verbose_name='Popularity',
+        help_text='Contains weighted amount of favorites and cart additions',
+        default=0,
+    )
+    trending = models.FloatField(
+        verbose_name='Trending score',
+        help_text='Contains time-decayed popularity relative to an epoch',
+        default=0,
+    )
+
+    class Meta:
+        """Describe settings for the RecipeRanking model."""
+
+        verbose_name = 'Recipe ranking'
+        verbose_name_plural = 'Recipe rankings'
+        indexes = (
+            models.Index(
+                fields=('-popular', '-recipe'),
+                name='ranking_popular_idx',
+            ),
+            models.Index(
+                fields=('-trending', '-recipe'),
+                name='ranking_trending_idx',
+            ),
+        )
+
+    def __str__(self):
+        """Show a ranking of a recipe."""
+        return f'Ranking of {self.recipe}'
+
+
+class RankingRemoval(models.Model):
+    """Describe a recipe which lost a favorite or a cart addition.
+
+    Rankings of such recipes are recomputed by the next refresh.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Recipe',
+        help_text='Recipe which lost a favorite or a cart addition',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+
+    class Meta:
+        """Describe settings for the RankingRemoval model."""
+
+        verbose_name = 'Ranking removal'
+        verbose_name_plural = 'Ranking removals'
+
+    def __str__(self):
+        """Show a recipe waiting for its ranking to be recomputed."""
+        return f'Removal from {self.recipe}'
+
+
+class RankingState(models.Model):
+    """Describe a model which stores progress of ranking updates."""
+
+    epoch = models.DateTimeField(
+        verbose_name='Epoch',
+        help_text='Contains date which trending scores are relative to',
+    )
+    last_favorite_id = models.BigIntegerField(
+        verbose_name='Last favorite',
+        help_text='Contains the latest favorite applied to rankings',
+        default=0,
+    )
+    last_cart_id = models.BigIntegerField(
+        verbose_name='Last cart addition',
+        help_text='Contains the latest cart addition applied to rankings',
+        default=0,
+    )
+    updated = models.DateTimeField(
+        verbose_name='Date updated',
+        help_text='Contains date when rankings were updated',
+        null=True,
+    )
+
+    class Meta:
+        """Describe settings for the RankingState model."""
+
+        verbose_name = 'Ranking state'
+        verbose_name_plural = 'Ranking states'
+
+    def __str__(self):
+        """Show a ranking watermark."""
+        return (
+            f'Rankings up to favorite {self.last_favorite_id} '
+            f'and cart addition {self.last_cart_id}'
+        )
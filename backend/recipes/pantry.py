@@ -0,0 +1,445 @@
+"""Describe in-memory inverted index of recipes by ingredients.
+
+Every worker process holds its own index. Writes of ingredients of
+recipes in the API or the admin replace a version shared by workers in
+the cache, and a worker whose index was built under an older version
+rebuilds it on a next pantry request once the index is older than
+PANTRY_INDEX_MIN_AGE. So other workers may serve matches which miss
+writes for that long plus a duration of a build, the worker which
+handled a write applies it at once.
+"""
+import threading
+import time
+from fractions import Fraction
+from itertools import chain
+from uuid import uuid4
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram.settings import PANTRY_INDEX_MIN_AGE, PANTRY_INDEX_TTL
+from recipes.models import IngredientRecipe
+
+VERSION_KEY = 'pantry-index:version'
+CAPACITY_STEP = 1 << 16
+DENSE_RATIO = 32
+EMPTY_POSTING = np.empty(0, dtype=np.uint32)
+PREFIX_SIZE = 1 << 14
+
+
+def round_capacity(size):
+    """Round an amount of recipes up to a whole capacity step."""
+    return (size // CAPACITY_STEP + 1) * CAPACITY_STEP
+
+
+def coverage_levels(sizes):
+    """Return every possible share of owned ingredients in descending order.
+
+    A level is a (owned, size) pair of a reduced fraction.
+    """
+    levels = {
+        Fraction(owned, size)
+        for size in sizes
+        for owned in range(1, min(size, 255) + 1)
+    }
+    return [
+        (level.numerator, level.denominator)
+        for level in sorted(levels, reverse=True)
+    ]
+
+
+def leading_positions(values, value, amount):
+    """Return first `amount` positions of values equal to value.
+
+    A prefix is scanned first and grown only if it has too few of them.
+    """
+    stop = PREFIX_SIZE
+    while True:
+        found = np.flatnonzero(values[:stop] == value)
+        if len(found) >= amount or stop >= len(values):
+            return found[:amount]
+        stop *= 8
+
+
+class PantryIndex:
+    """Describe an inverted index from ingredients to recipes.
+
+    Every ingredient maps to recipe positions stored either as a sorted
+    uint32 array or, for frequent ingredients, as a packed bitmap when it
+    is smaller. Matching sums owned containers into per recipe counters.
+
+    Recipes are positioned in groups of the same size and by id inside a
+    group, so coverage thresholds are checked as integer counts of whole
+    groups. Recipes whose size changed or which were added after a build
+    are outliers which are checked one by one until the next build.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.built_at = None
+        self.version = None
+        self.refreshed = None
+        self.capacity = CAPACITY_STEP
+        self.recipe_ids = np.empty(0, dtype=np.int64)
+        self.positions = {}
+        self.divisors = np.empty(0, dtype=np.float32)
+        self.ingredients = {}
+        self.sparse = {}
+        self.dense = {}
+        self.groups = []
+        self.grouped = 0
+        self.outliers = set()
+        self.sizes = set()
+        self.levels = []
+
+    @staticmethod
+    def load_pairs(queryset):
+        """Load (recipe id, ingredient id) rows sorted by recipe."""
+        rows = queryset.order_by('recipe_id').values_list(
+            'recipe_id',
+            'ingredient_id',
+        )
+        pairs = np.fromiter(
+            chain.from_iterable(rows.iterator(chunk_size=20000)),
+            dtype=np.int64,
+        )
+        return pairs.reshape(-1, 2)
+
+    def build(self):
+        """Build the whole index from IngredientRecipe.
+
+        The version is read before rows are loaded, so writes committed
+        during a build make the index stale again. Recipes refreshed in
+        this worker during a build are applied again after the swap.
+        """
+        version = pantry_version()
+        with self.lock:
+            self.refreshed = set()
+        try:
+            self.build_from_pairs(
+                self.load_pairs(IngredientRecipe.objects.all()),
+            )
+            self.version = version
+        finally:
+            with self.lock:
+                refreshed, self.refreshed = self.refreshed, None
+        if refreshed:
+            self.refresh_recipes(refreshed)
+
+    def build_from_pairs(self, pairs):
+        """Build the whole index from (recipe id, ingredient id) rows."""
+        recipe_ids, recipe_indexes, sizes = np.unique(
+            pairs[:, 0],
+            return_inverse=True,
+            return_counts=True,
+        )
+        grouped = np.argsort(sizes, kind='stable')
+        recipe_positions = np.empty_like(grouped)
+        recipe_positions[grouped] = np.arange(len(grouped))
+        group_sizes, group_starts = np.unique(
+            sizes[grouped],
+            return_index=True,
+        )
+        group_stops = np.append(group_starts[1:], len(grouped))
+        capacity = round_capacity(len(recipe_ids))
+        order = np.lexsort((recipe_positions[recipe_indexes], pairs[:, 1]))
+        ingredient_ids, starts = np.unique(
+            pairs[order, 1],
+            return_index=True,
+        )
+        postings = np.split(
+            recipe_positions[recipe_indexes[order]].astype(np.uint32),
+            starts[1:],
+        )
+        sparse, dense = {}, {}
+        for ingredient_id, posting in zip(ingredient_ids.tolist(), postings):
+            if len(posting) * DENSE_RATIO > capacity:
+                bits = np.zeros(capacity, dtype=np.bool_)
+                bits[posting] = True
+                dense[ingredient_id] = np.packbits(bits)
+            else:
+                sparse[ingredient_id] = posting
+        ingredients = np.split(pairs[:, 1], np.cumsum(sizes)[:-1])
+
+        with self.lock:
+            self.capacity = capacity
+            self.recipe_ids = recipe_ids[grouped]
+            self.positions = {
+                recipe_id: position
+                for position, recipe_id in enumerate(self.recipe_ids.tolist())
+            }
+            self.divisors = sizes[grouped].astype(np.float32)
+            self.ingredients = {
+                position: frozenset(recipe_ingredients.tolist())
+                for position, recipe_ingredients in zip(
+                    recipe_positions.tolist(),
+                    ingredients,
+                )
+            }
+            self.sparse = sparse
+            self.dense = dense
+            self.groups = list(
+                zip(
+                    group_sizes.tolist(),
+                    group_starts.tolist(),
+                    group_stops.tolist(),
+                ),
+            )
+            self.grouped = len(grouped)
+            self.outliers = set()
+            self.sizes = set(group_sizes.tolist())
+            self.levels = coverage_levels(self.sizes)
+            self.built_at = time.monotonic()
+
+    def is_stale(self, version):
+        """Check if the index was never built, is too old or outdated.
+
+        An index built under another version than the given one is
+        outdated once it is older than PANTRY_INDEX_MIN_AGE.
+        """
+        if self.built_at is None:
+            return True
+        age = time.monotonic() - self.built_at
+        return age > PANTRY_INDEX_TTL or (
+            version != self.version and age > PANTRY_INDEX_MIN_AGE
+        )
+
+    def add_position(self, recipe_id):
+        """Append a new recipe and grow bitmaps if capacity is exceeded."""
+        position = len(self.recipe_ids)
+        if position >= self.capacity:
+            capacity = round_capacity(position)
+            padding = np.zeros((capacity - self.capacity) // 8, np.uint8)
+            self.dense = {
+                ingredient_id: np.concatenate((bitmap, padding))
+                for ingredient_id, bitmap in self.dense.items()
+            }
+            self.capacity = capacity
+        self.positions[recipe_id] = position
+        self.recipe_ids = np.append(self.recipe_ids, recipe_id)
+        self.divisors = np.append(self.divisors, np.float32(1))
+        return position
+
+    def set_recipe(self, recipe_id, ingredient_ids):
+        """Replace ingredients of a recipe, an empty set removes it."""
+        with self.lock:
+            position = self.positions.get(recipe_id)
+            if position is None:
+                if not ingredient_ids:
+                    return
+                position = self.add_position(recipe_id)
+
+            byte, bit = position // 8, np.uint8(0x80 >> position % 8)
+            old_ingredients = self.ingredients.get(position, frozenset())
+            for ingredient_id in old_ingredients - ingredient_ids:
+                if ingredient_id in self.dense:
+                    self.dense[ingredient_id][byte] &= ~bit
+                else:
+                    posting = self.sparse[ingredient_id]
+                    self.sparse[ingredient_id] = posting[posting != position]
+            for ingredient_id in ingredient_ids - old_ingredients:
+                if ingredient_id in self.dense:
+                    self.dense[ingredient_id][byte] |= bit
+                else:
+                    self.sparse[ingredient_id] = np.union1d(
+                        self.sparse.get(ingredient_id, EMPTY_POSTING),
+                        np.array((position,), dtype=np.uint32),
+                    )
+            self.ingredients[position] = ingredient_ids
+            size = max(len(ingredient_ids), 1)
+            if size != self.divisors[position] and position < self.grouped:
+                self.outliers.add(position)
+            self.divisors[position] = size
+            if size not in self.sizes:
+                self.sizes.add(size)
+                self.levels = coverage_levels(self.sizes)
+
+    def refresh_recipes(self, recipe_ids):
+        """Reload ingredients of certain recipes from IngredientRecipe."""
+        with self.lock:
+            if self.refreshed is not None:
+                self.refreshed.update(recipe_ids)
+        pairs = self.load_pairs(
+            IngredientRecipe.objects.filter(recipe_id__in=recipe_ids),
+        )
+        ingredients = {recipe_id: set() for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in pairs.tolist():
+            ingredients[recipe_id].add(ingredient_id)
+        for recipe_id, ingredient_ids in ingredients.items():
+            self.set_recipe(recipe_id, frozenset(ingredient_ids))
+
+    def members(self, ingredient_id, size):
+        """Return recipe positions or a recipe mask of an ingredient."""
+        if ingredient_id in self.dense:
+            return np.unpackbits(self.dense[ingredient_id], count=size)
+        return self.sparse.get(ingredient_id)
+
+    def match(self, owned, excluded=(), limit=20):
+        """Rank recipes by a share of their ingredients which are owned.
+
+        Return (recipe id, coverage, owned ingredients amount) tuples,
+        recipes with any excluded ingredient are skipped. Owned ingredients
+        are expected to be fewer than 256.
+        """
+        with self.lock:
+            size = len(self.recipe_ids)
+            counts = np.zeros(size, dtype=np.uint8)
+            found = False
+            for ingredient_id in set(owned):
+                members = self.members(ingredient_id, size)
+                if members is None:
+                    continue
+                found = True
+                if members.dtype == np.uint8:
+                    counts += members
+                else:
+                    counts[members] += 1
+            if not found:
+                return []
+            for ingredient_id in set(excluded):
+                members = self.members(ingredient_id, size)
+                if members is None:
+                    continue
+                if members.dtype == np.uint8:
+                    members = members.view(np.bool_)
+                counts[members] = 0
+
+            outliers = np.fromiter(
+                chain(sorted(self.outliers), range(self.grouped, size)),
+                dtype=np.intp,
+            )
+            outlier_counts = counts[outliers]
+            counts[outliers] = 0
+            best = self.select_best(
+                counts,
+                outliers,
+                outlier_counts,
+                self.divisors[outliers].astype(np.int64),
+                limit,
+            )
+            counts[outliers] = outlier_counts
+            counts = counts[best]
+            coverage = counts / self.divisors[best]
+            recipe_ids = self.recipe_ids[best]
+
+        order = np.lexsort((recipe_ids, -counts, -coverage))[:limit]
+        return list(
+            zip(
+                recipe_ids[order].tolist(),
+                coverage[order].tolist(),
+                counts[order].tolist(),
+            ),
+        )
+
+    def select_best(self, counts, outliers, outlier_counts, outlier_sizes,
+                    limit):
+        """Select positions of at least `limit` best covered recipes.
+
+        A binary search over possible coverage levels finds the lowest one
+        which still has `limit` recipes at or above it. Recipes above it
+        are all taken, ties at it are taken by size and id, so sorting
+        the result and cutting it to `limit` gives the exact ranking.
+        """
+        groups = [
+            (group_size, start, stop, int(counts[start:stop].max()))
+            for group_size, start, stop in self.groups
+        ]
+        outlier_counts = outlier_counts.astype(np.int64)
+
+        def at_least(level):
+            owned, size = level
+            total = np.count_nonzero(
+                outlier_counts * size >= outlier_sizes * owned,
+            )
+            for group_size, start, stop, top in groups:
+                needed = -(-owned * group_size // size)
+                if needed <= top:
+                    total += np.count_nonzero(counts[start:stop] >= needed)
+                if total >= limit:
+                    break
+            return total
+
+        levels = self.levels
+        low, high = 0, len(levels) - 1
+        if at_least(levels[high]) < limit:
+            threshold = levels[high]
+            strict = False
+        else:
+            while low < high:
+                middle = (low + high) // 2
+                if at_least(levels[middle]) >= limit:
+                    high = middle
+                else:
+                    low = middle + 1
+            threshold = levels[low]
+            strict = True
+
+        owned, size = threshold
+        outlier_levels = outlier_counts * size - outlier_sizes * owned
+        if strict:
+            selected = [outliers[outlier_levels > 0]]
+            ties = [outliers[outlier_levels == 0]]
+        else:
+            selected, ties = [outliers[outlier_levels >= 0]], []
+        group_ties = []
+        for group_size, start, stop, top in groups:
+            needed = -(-owned * group_size // size)
+            if needed > top:
+                continue
+            above = needed + (owned * group_size % size == 0 and strict)
+            if above <= top:
+                selected.append(
+                    np.flatnonzero(counts[start:stop] >= above) + start,
+                )
+            if above > needed:
+                group_ties.append((needed, start, stop))
+        amount = limit - sum(map(len, selected))
+        for needed, start, stop in group_ties if amount > 0 else ():
+            ties.append(
+                leading_positions(counts[start:stop], needed, amount) + start,
+            )
+        return np.concatenate(selected + ties)
+
+
+pantry_index = PantryIndex()
+
+
+def pantry_version():
+    """Return the current version of ingredients of recipes."""
+    return cache.get_or_set(VERSION_KEY, uuid4().hex, timeout=None)
+
+
+def invalidate_pantry_index():
+    """Replace a version of pantry indexes after a transaction commits."""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid4().hex, timeout=None),
+    )
+
+
+def get_pantry_index():
+    """Return the process-wide index, rebuild it if it is stale.
+
+    Only the first build blocks requests, later rebuilds are done by one
+    thread while others keep reading the previous index.
+    """
+    if not pantry_index.is_stale(pantry_version()):
+        return pantry_index
+    if pantry_index.built_at is None:
+        with pantry_index.build_lock:
+            if pantry_index.built_at is None:
+                pantry_index.build()
+    elif pantry_index.build_lock.acquire(blocking=False):
+        try:
+            pantry_index.build()
+        finally:
+            pantry_index.build_lock.release()
+    return pantry_index
+
+
+def refresh_pantry_index(recipe_ids):
+    """Apply changed recipes to the index if it is already built."""
+    if pantry_index.built_at is not None:
+        pantry_index.refresh_recipes(recipe_ids)
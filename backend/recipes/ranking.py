@@ -0,0 +1,196 @@
+"""Describe periodic popularity rankings of recipes."""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from foodgram.settings import (RANKING_CART_WEIGHT, RANKING_FAVORITE_WEIGHT,
+                               RANKING_HALF_LIFE_HOURS,
+                               RANKING_REBASE_HALF_LIVES,
+                               RANKING_WATERMARK_LAG_SECONDS)
+from recipes.models import (Favorite, RankingRemoval, RankingState, Recipe,
+                            RecipeRanking, ShoppingCart)
+
+POPULAR = 'popular'
+TRENDING = 'trending'
+RANKINGS = (POPULAR, TRENDING)
+
+HALF_LIFE = timedelta(hours=RANKING_HALF_LIFE_HOURS)
+NEGLIGIBLE_HALF_LIVES = 1000
+WATERMARK_LAG = timedelta(seconds=RANKING_WATERMARK_LAG_SECONDS)
+SOURCES = (
+    (Favorite, 'favorite_recipe', 'last_favorite_id', RANKING_FAVORITE_WEIGHT),
+    (ShoppingCart, 'recipe_in_cart', 'last_cart_id', RANKING_CART_WEIGHT),
+)
+
+
+def quote_column(model, name):
+    """Return a quoted column name of a model field."""
+    return connection.ops.quote_name(model._meta.get_field(name).column)
+
+
+def quote_table(model):
+    """Return a quoted table name of a model."""
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def add_missing_rankings():
+    """Create zero rankings for recipes which have none."""
+    ranking_recipe = quote_column(RecipeRanking, 'recipe')
+    recipe_id = quote_column(Recipe, 'id')
+    sql = (
+        f'INSERT INTO {quote_table(RecipeRanking)} '
+        f'({ranking_recipe}, popular, trending) '
+        f'SELECT {recipe_id}, 0, 0 FROM {quote_table(Recipe)} '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {quote_table(RecipeRanking)} '
+        f'WHERE {ranking_recipe} = {quote_table(Recipe)}.{recipe_id})'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+def seconds_since(column):
+    """Return SQL of seconds from a moment parameter to a datetime column.
+
+    Other databases than PostgreSQL are expected to be SQLite.
+    """
+    if connection.vendor == 'postgresql':
+        return f'EXTRACT(EPOCH FROM {column} - %s)::float8'
+    return f'(julianday({column}) - julianday(%s)) * 86400.0'
+
+
+def apply_events(model, recipe_field, weight, epoch, first_id, last_id,
+                 removed_id=None):
+    """Add events with ids in (first_id, last_id] to rankings.
+
+    Every event adds its weight to popularity and its weight doubled
+    for every half-life passed from an epoch to a trending score, so
+    scores of all recipes decay together without being rewritten. Events
+    older than NEGLIGIBLE_HALF_LIVES half-lives before the epoch, such as
+    ones made before dates were stored, add nothing to trending scores
+    instead of underflowing. With `removed_id` only events of recipes of
+    RankingRemoval rows up to that id are added.
+    """
+    ranking = quote_table(RecipeRanking)
+    recipe = quote_column(model, recipe_field)
+    created = quote_column(model, 'created')
+    event_id = quote_column(model, 'id')
+    params = [
+        weight,
+        weight,
+        connection.ops.adapt_datetimefield_value(
+            epoch - HALF_LIFE * NEGLIGIBLE_HALF_LIVES,
+        ),
+        connection.ops.adapt_datetimefield_value(epoch),
+        HALF_LIFE.total_seconds(),
+        first_id,
+        last_id,
+    ]
+    removed = ''
+    if removed_id is not None:
+        removed = (
+            f'AND {recipe} IN (SELECT '
+            f'{quote_column(RankingRemoval, "recipe")} '
+            f'FROM {quote_table(RankingRemoval)} '
+            f'WHERE {quote_column(RankingRemoval, "id")} <= %s) '
+        )
+        params.append(removed_id)
+    sql = (
+        f'INSERT INTO {ranking} '
+        f'({quote_column(RecipeRanking, "recipe")}, popular, trending) '
+        f'SELECT {recipe}, %s * COUNT(*), %s * SUM(CASE WHEN {created} > %s '
+        f'THEN POWER(2.0, {seconds_since(created)} / %s) ELSE 0 END) '
+        f'FROM {quote_table(model)} '
+        f'WHERE {event_id} > %s AND {event_id} <= %s '
+        f'{removed}'
+        f'GROUP BY {recipe} '
+        f'ON CONFLICT ({quote_column(RecipeRanking, "recipe")}) DO UPDATE '
+        f'SET popular = {ranking}.popular + EXCLUDED.popular, '
+        f'trending = {ranking}.trending + EXCLUDED.trending'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def rebase_trending(state, now):
+    """Move an epoch to now and scale trending scores accordingly."""
+    half_lives = (now - state.epoch) / HALF_LIFE
+    RecipeRanking.objects.update(trending=F('trending') * 2 ** -half_lives)
+    state.epoch = now
+
+
+def record_removals(recipe_ids):
+    """Queue recipes which lost favorites or cart additions."""
+    RankingRemoval.objects.bulk_create(
+        RankingRemoval(recipe_id=recipe_id) for recipe_id in set(recipe_ids)
+    )
+
+
+def recompute_removals(state, removed_id):
+    """Recompute rankings of queued recipes from all applied events."""
+    RecipeRanking.objects.filter(
+        recipe__in=RankingRemoval.objects.filter(
+            pk__lte=removed_id,
+        ).values('recipe_id'),
+    ).update(popular=0, trending=0)
+    for model, recipe_field, watermark, weight in SOURCES:
+        apply_events(
+            model,
+            recipe_field,
+            weight,
+            state.epoch,
+            0,
+            getattr(state, watermark),
+            removed_id=removed_id,
+        )
+
+
+def refresh_rankings(full=False):
+    """Apply favorites and cart additions made since the last refresh.
+
+    Events are read incrementally after stored watermark ids. Events newer
+    than RANKING_WATERMARK_LAG_SECONDS wait for the next refresh, because
+    transactions with lower ids may still be uncommitted. Recipes which
+    lost favorites or cart additions are queued by record_removals, their
+    rankings are recomputed from all events up to the watermarks.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        RankingState.objects.get_or_create(pk=1, defaults={'epoch': now})
+        state = RankingState.objects.select_for_update().get(pk=1)
+        if full:
+            RecipeRanking.objects.update(popular=0, trending=0)
+            state.epoch = now
+            state.last_favorite_id = state.last_cart_id = 0
+        elif now - state.epoch > HALF_LIFE * RANKING_REBASE_HALF_LIVES:
+            rebase_trending(state, now)
+        add_missing_rankings()
+
+        for model, recipe_field, watermark, weight in SOURCES:
+            first_id = getattr(state, watermark)
+            last_id = model.objects.filter(
+                pk__gt=first_id,
+                created__lte=now - WATERMARK_LAG,
+            ).aggregate(last_id=Max('pk'))['last_id']
+            if last_id is None:
+                continue
+            apply_events(
+                model,
+                recipe_field,
+                weight,
+                state.epoch,
+                first_id,
+                last_id,
+            )
+            setattr(state, watermark, last_id)
+        removed_id = RankingRemoval.objects.aggregate(
+            removed_id=Max('pk'),
+        )['removed_id']
+        if removed_id is not None:
+            if not full:
+                recompute_removals(state, removed_id)
+            RankingRemoval.objects.filter(pk__lte=removed_id).delete()
+        state.updated = now
+        state.save()
+    return state
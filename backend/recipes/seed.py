@@ -0,0 +1,366 @@
+"""Describe a deterministic synthetic dataset of a given scale.
+
+Every scale unit adds USERS_PER_SCALE users with their recipes, follows,
+favorites and shopping carts. Authors, followed users, ingredients and
+favorite recipes are drawn from power-law distributions. Rows are
+generated by a seeded numpy generator and written with COPY, so the same
+scale and seed always give the same data.
+"""
+import base64
+import csv
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.backends.postgresql.base import is_psycopg3
+
+from recipes.documents import refresh_documents
+from recipes.feed import rebuild_feeds
+from recipes.models import (TAG_SLUGS, Favorite, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, ShoppingListItem, Tag,
+                            TagRecipe)
+from recipes.ranking import refresh_rankings
+from recipes.shopping_list import rebuild_shopping_lists
+from users.models import Follow
+
+User = get_user_model()
+
+USERS_PER_SCALE = 1000
+RECIPES_PER_USER = 5
+FOLLOWS_PER_USER = 20
+FAVORITES_PER_USER = 20
+CART_RECIPES_PER_USER = 4
+INGREDIENTS_PER_RECIPE = (3, 15)
+TAGS_PER_RECIPE = (1, 3)
+POWER_LAW_EXPONENT = 1.1
+BATCH_SIZE = 5000
+
+SEED_END = datetime(2026, 1, 1, tzinfo=timezone.utc)
+SEED_PERIOD = timedelta(days=730)
+SEED_PASSWORD = 'foodgram-seed'
+SEED_PASSWORD_SALT = 'foodgramseed'
+PLACEHOLDER_IMAGE = 'media/seed-placeholder.png'
+PLACEHOLDER_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAADElEQVR4nGNgYGAAAAAEAAH2F'
+    'zhVAAAAAElFTkSuQmCC',
+)
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2C94C', 'dessert'),
+    ('Выпечка', '#B07D62', 'baking'),
+    ('Суп', '#2D9CDB', 'soup'),
+    ('Салат', '#6FCF97', 'salad'),
+    ('Вегетарианское', '#27AE60', 'vegetarian'),
+    ('Быстро', '#EB5757', 'quick'),
+    ('Праздник', '#BB6BD9', 'holiday'),
+)
+DISHES = (
+    'Салат', 'Суп', 'Пирог', 'Рагу', 'Запеканка', 'Паста', 'Каша', 'Омлет',
+    'Соус', 'Жаркое', 'Котлеты', 'Смузи',
+)
+FIRST_NAMES = (
+    'Анна', 'Иван', 'Мария', 'Пётр', 'Елена', 'Алексей', 'Ольга', 'Дмитрий',
+    'Наталья', 'Сергей', 'Татьяна', 'Андрей',
+)
+LAST_NAMES = (
+    'Иванова', 'Смирнов', 'Кузнецова', 'Попов', 'Васильева', 'Петров',
+    'Соколова', 'Михайлов', 'Новикова', 'Фёдоров', 'Морозова', 'Волков',
+)
+SEEDED_MODELS = (
+    Tag,
+    Ingredient,
+    User,
+    Follow,
+    Recipe,
+    IngredientRecipe,
+    TagRecipe,
+    Favorite,
+    ShoppingCart,
+)
+
+
+def copy_rows(model, fields, rows):
+    """Write rows of field values with COPY or batched raw inserts.
+
+    Raw inserts keep given values of auto_now_add fields like COPY does.
+    """
+    if connection.vendor != 'postgresql' or not is_psycopg3:
+        fields = [model._meta.get_field(name) for name in fields]
+        rows = iter(rows)
+        while batch := list(islice(rows, BATCH_SIZE)):
+            objs = [
+                model(**{
+                    field.attname: value for field, value in zip(fields, row)
+                })
+                for row in batch
+            ]
+            size = connection.ops.bulk_batch_size(fields, objs)
+            for start in range(0, len(objs), size):
+                model._base_manager._insert(
+                    objs[start:start + size],
+                    fields,
+                    raw=True,
+                )
+        return
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(
+        quote_name(model._meta.get_field(name).column) for name in fields
+    )
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(
+            f'COPY {quote_name(model._meta.db_table)} ({columns}) FROM STDIN',
+        ) as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+def power_law_weights(rng, size):
+    """Return probabilities of items decaying with their random rank."""
+    ranks = rng.permutation(size) + 1
+    weights = ranks.astype(np.float64) ** -POWER_LAW_EXPONENT
+    return weights / weights.sum()
+
+
+def sample_pairs(rng, sources, degrees, weights):
+    """Return unique (source, target) pairs with targets drawn by weights.
+
+    Repeated targets of a source are dropped, so sources get up to their
+    degree of targets.
+    """
+    repeated = np.repeat(np.arange(sources), degrees)
+    targets = rng.choice(len(weights), size=len(repeated), p=weights)
+    pairs = np.unique(repeated * len(weights) + targets)
+    return pairs // len(weights), pairs % len(weights)
+
+
+def moments(rng, size, start):
+    """Return random moments from a start to the end of a seed period."""
+    start = np.asarray(start, dtype=np.float64)
+    return start + rng.random(size) * (SEED_PERIOD.total_seconds() - start)
+
+
+def timestamp(seconds):
+    """Convert seconds from a seed period start to a datetime."""
+    return SEED_END - SEED_PERIOD + timedelta(seconds=seconds)
+
+
+def read_ingredients(path):
+    """Return (name, measurement unit) rows of an ingredients CSV file."""
+    with open(path, encoding='utf-8') as file:
+        return [tuple(row) for row in csv.reader(file) if len(row) == 2]
+
+
+def flush():
+    """Delete users, recipes and everything referencing them, restart ids."""
+    connection.ops.execute_sql_flush(
+        connection.ops.sql_flush(
+            no_style(),
+            [model._meta.db_table for model in SEEDED_MODELS],
+            reset_sequences=True,
+            allow_cascade=True,
+        ),
+    )
+
+
+def seed(scale, ingredients_path, seed=0):
+    """Generate a dataset, yield names and row amounts of written tables.
+
+    Tables must be empty, ids are assigned from 1 and sequences are moved
+    after them. Feeds and rankings are rebuilt after, similar recipes are
+    left to the build_similar_recipes command which is much slower.
+    """
+    rng = np.random.default_rng(seed)
+    users = USERS_PER_SCALE * scale
+    recipes = users * RECIPES_PER_USER
+    password = make_password(SEED_PASSWORD, salt=SEED_PASSWORD_SALT)
+    if not default_storage.exists(PLACEHOLDER_IMAGE):
+        default_storage.save(PLACEHOLDER_IMAGE, ContentFile(PLACEHOLDER_PNG))
+
+    with transaction.atomic():
+        copy_rows(
+            Tag,
+            ('id', 'name', 'color', 'slug'),
+            ((pk, *tag) for pk, tag in enumerate(TAGS, 1)),
+        )
+        yield Tag._meta.db_table, len(TAGS)
+
+        ingredient_rows = read_ingredients(ingredients_path)
+        copy_rows(
+            Ingredient,
+            ('id', 'name', 'measurement_unit'),
+            (
+                (pk, name, unit)
+                for pk, (name, unit) in enumerate(ingredient_rows, 1)
+            ),
+        )
+        yield Ingredient._meta.db_table, len(ingredient_rows)
+
+        first_names = rng.integers(len(FIRST_NAMES), size=users).tolist()
+        last_names = rng.integers(len(LAST_NAMES), size=users).tolist()
+        joined = SEED_END - SEED_PERIOD
+        copy_rows(
+            User,
+            (
+                'id', 'password', 'username', 'first_name', 'last_name',
+                'email', 'is_staff', 'is_active', 'is_superuser',
+                'date_joined',
+            ),
+            (
+                (
+                    pk + 1, password, f'user{pk + 1}',
+                    FIRST_NAMES[first_names[pk]], LAST_NAMES[last_names[pk]],
+                    f'user{pk + 1}@example.com', False, True, False, joined,
+                )
+                for pk in range(users)
+            ),
+        )
+        yield User._meta.db_table, users
+
+        user_weights = power_law_weights(rng, users)
+        followers, followings = sample_pairs(
+            rng,
+            users,
+            rng.geometric(1 / FOLLOWS_PER_USER, size=users),
+            user_weights,
+        )
+        not_self = followers != followings
+        followers, followings = followers[not_self], followings[not_self]
+        copy_rows(
+            Follow,
+            ('id', 'follower', 'following'),
+            zip(
+                range(1, len(followers) + 1),
+                (followers + 1).tolist(),
+                (followings + 1).tolist(),
+            ),
+        )
+        yield Follow._meta.db_table, len(followers)
+
+        recipe_ingredients, ingredient_ids = sample_pairs(
+            rng,
+            recipes,
+            rng.integers(*INGREDIENTS_PER_RECIPE, endpoint=True, size=recipes),
+            power_law_weights(rng, len(ingredient_rows)),
+        )
+        recipe_tags, tag_ids = sample_pairs(
+            rng,
+            recipes,
+            rng.integers(*TAGS_PER_RECIPE, endpoint=True, size=recipes),
+            np.full(len(TAGS), 1 / len(TAGS)),
+        )
+        tag_slugs = [[] for _ in range(recipes)]
+        for recipe, tag in zip(recipe_tags.tolist(), tag_ids.tolist()):
+            tag_slugs[recipe].append(TAGS[tag][2])
+        main_ingredients = np.full(recipes, -1)
+        main_ingredients[recipe_ingredients[::-1]] = ingredient_ids[::-1]
+        authors = rng.choice(users, size=recipes, p=user_weights)
+        published = moments(rng, recipes, 0)
+        cooking_times = rng.integers(5, 180, endpoint=True, size=recipes)
+        dishes = rng.integers(len(DISHES), size=recipes)
+        copy_rows(
+            Recipe,
+            (
+                'id', 'author', 'name', 'image', 'description',
+                'cooking_time', 'pub_date',
+                *(('tag_slugs',) if TAG_SLUGS else ()),
+            ),
+            (
+                (
+                    pk + 1,
+                    author + 1,
+                    f'{DISHES[dish]}: {ingredient_rows[main][0]}'[:150],
+                    PLACEHOLDER_IMAGE,
+                    f'Рецепт {pk + 1}, {ingredient_rows[main][0]}.',
+                    cooking_time,
+                    timestamp(seconds),
+                    *((sorted(tag_slugs[pk]),) if TAG_SLUGS else ()),
+                )
+                for pk, (author, dish, main, cooking_time, seconds) in
+                enumerate(
+                    zip(
+                        authors.tolist(),
+                        dishes.tolist(),
+                        main_ingredients.tolist(),
+                        cooking_times.tolist(),
+                        published.tolist(),
+                    ),
+                )
+            ),
+        )
+        yield Recipe._meta.db_table, recipes
+
+        copy_rows(
+            IngredientRecipe,
+            ('id', 'recipe', 'ingredient', 'quantity'),
+            zip(
+                range(1, len(recipe_ingredients) + 1),
+                (recipe_ingredients + 1).tolist(),
+                (ingredient_ids + 1).tolist(),
+                rng.integers(
+                    1,
+                    500,
+                    endpoint=True,
+                    size=len(recipe_ingredients),
+                ).tolist(),
+            ),
+        )
+        yield IngredientRecipe._meta.db_table, len(recipe_ingredients)
+
+        copy_rows(
+            TagRecipe,
+            ('id', 'recipe', 'tag'),
+            zip(
+                range(1, len(recipe_tags) + 1),
+                (recipe_tags + 1).tolist(),
+                (tag_ids + 1).tolist(),
+            ),
+        )
+        yield TagRecipe._meta.db_table, len(recipe_tags)
+
+        recipe_weights = power_law_weights(rng, recipes)
+        for model, recipe_field, per_user in (
+            (Favorite, 'favorite_recipe', FAVORITES_PER_USER),
+            (ShoppingCart, 'recipe_in_cart', CART_RECIPES_PER_USER),
+        ):
+            owners, owned = sample_pairs(
+                rng,
+                users,
+                rng.geometric(1 / per_user, size=users),
+                recipe_weights,
+            )
+            created = moments(rng, len(owners), published[owned])
+            copy_rows(
+                model,
+                ('id', 'user', recipe_field, 'created'),
+                zip(
+                    range(1, len(owners) + 1),
+                    (owners + 1).tolist(),
+                    (owned + 1).tolist(),
+                    map(timestamp, created.tolist()),
+                ),
+            )
+            yield model._meta.db_table, len(owners)
+        yield ShoppingListItem._meta.db_table, rebuild_shopping_lists()
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(),
+                SEEDED_MODELS,
+            ):
+                cursor.execute(sql)
+            for model in SEEDED_MODELS:
+                table = connection.ops.quote_name(model._meta.db_table)
+                cursor.execute(f'ANALYZE {table}')
+
+    yield 'feed', rebuild_feeds()
+    yield 'documents', refresh_documents()
+    refresh_rankings(full=True)
+    yield 'rankings', recipes
@@ -0,0 +1,173 @@
+"""Describe shopping lists materialized from shopping carts.
+
+A shopping list keeps a total quantity of every ingredient of recipes in
+a user cart and an amount of those recipes. Lists are changed in the
+transactions which change carts or ingredients of carted recipes, rows
+without recipes are deleted. Changes of ingredients lock a recipe for
+update, cart rows referencing it lock it for key share, so changes of
+carts wait for a concurrent change of ingredients of their recipes and
+read its result. Databases without row locks, like SQLite, lock a whole
+database for writes instead.
+"""
+from django.db import connection, transaction
+
+from recipes.models import (IngredientRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem)
+
+
+def tables():
+    """Return quoted names of tables used by shopping lists."""
+    quote_name = connection.ops.quote_name
+    return {
+        'item': quote_name(ShoppingListItem._meta.db_table),
+        'cart': quote_name(ShoppingCart._meta.db_table),
+        'ingredient': quote_name(IngredientRecipe._meta.db_table),
+        'recipe': quote_name(Recipe._meta.db_table),
+    }
+
+
+def id_placeholders(ids):
+    """Return placeholders of ids for an IN list."""
+    return ', '.join(['%s'] * len(ids))
+
+
+def user_recipes(recipe_ids):
+    """Return SQL of (user_id, recipe_id) pairs of a user and recipe ids."""
+    return (
+        f'SELECT CAST(%s AS bigint) AS user_id, id AS recipe_id '
+        f'FROM {tables()["recipe"]} '
+        f'WHERE id IN ({id_placeholders(recipe_ids)})'
+    )
+
+
+def recipe_carts():
+    """Return SQL of (user_id, recipe_id) pairs of carts with a recipe."""
+    return (
+        f'SELECT user_id, recipe_in_cart_id AS recipe_id '
+        f'FROM {tables()["cart"]} WHERE recipe_in_cart_id = %s'
+    )
+
+
+def quantities(pairs):
+    """Return SQL of ingredient totals of (user_id, recipe_id) pairs."""
+    return (
+        f'SELECT pairs.user_id, quantity.ingredient_id, '
+        f'SUM(quantity.quantity) AS total, COUNT(*) AS recipes_count '
+        f'FROM ({pairs}) AS pairs '
+        f'JOIN {tables()["ingredient"]} AS quantity '
+        f'ON quantity.recipe_id = pairs.recipe_id '
+        f'GROUP BY pairs.user_id, quantity.ingredient_id'
+    )
+
+
+def add(pairs, params):
+    """Add ingredients of (user_id, recipe_id) pairs to shopping lists."""
+    item = tables()['item']
+    sql = (
+        f'INSERT INTO {item} (user_id, ingredient_id, total, recipes_count) '
+        f'{quantities(pairs)} '
+        f'ON CONFLICT (user_id, ingredient_id) DO UPDATE SET '
+        f'total = {item}.total + EXCLUDED.total, '
+        f'recipes_count = {item}.recipes_count + EXCLUDED.recipes_count'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def subtract(pairs, params):
+    """Subtract ingredients of (user_id, recipe_id) pairs from lists.
+
+    Ingredients which are not needed by any recipe are deleted.
+    """
+    item = tables()['item']
+    sql = (
+        f'UPDATE {item} SET '
+        f'total = {item}.total - delta.total, '
+        f'recipes_count = {item}.recipes_count - delta.recipes_count '
+        f'FROM ({quantities(pairs)}) AS delta '
+        f'WHERE {item}.user_id = delta.user_id '
+        f'AND {item}.ingredient_id = delta.ingredient_id '
+        f'RETURNING {item}.id, {item}.recipes_count'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        empty = [pk for pk, count in cursor.fetchall() if not count]
+    if empty:
+        ShoppingListItem.objects.filter(pk__in=empty).delete()
+
+
+def lock_recipes(recipe_ids):
+    """Wait for changes of ingredients of recipes to commit.
+
+    Deleted cart rows do not lock their recipes, so they are locked
+    explicitly.
+    """
+    if not connection.features.has_select_for_update:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM {tables()["recipe"]} '
+            f'WHERE id IN ({id_placeholders(recipe_ids)}) FOR KEY SHARE',
+            recipe_ids,
+        )
+
+
+def add_recipes(user_id, recipe_ids):
+    """Add ingredients of recipes added in a user cart.
+
+    Inserted cart rows already hold key share locks of their recipes.
+    """
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        add(user_recipes(recipe_ids), (user_id, *recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Subtract ingredients of recipes deleted from a user cart."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        lock_recipes(recipe_ids)
+        subtract(user_recipes(recipe_ids), (user_id, *recipe_ids))
+
+
+def clear_list(user_id):
+    """Delete a shopping list of a user with an emptied cart."""
+    ShoppingListItem.objects.filter(user_id=user_id).delete()
+
+
+def remove_recipe_from_carts(recipe_id):
+    """Subtract ingredients of a recipe from lists of carts containing it.
+
+    The recipe is locked until a transaction ends, so carts can not
+    change while its ingredients are replaced or it is deleted. Callers
+    run it in a transaction.
+    """
+    if connection.features.has_select_for_update:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {tables()["recipe"]} '
+                f'WHERE id = %s FOR UPDATE',
+                (recipe_id,),
+            )
+    subtract(recipe_carts(), (recipe_id,))
+
+
+def add_recipe_to_carts(recipe_id):
+    """Add ingredients of a recipe to lists of carts containing it."""
+    add(recipe_carts(), (recipe_id,))
+
+
+def rebuild_shopping_lists():
+    """Recompute all shopping lists from carts, return amount of rows."""
+    item = tables()['item']
+    cart = (
+        f'SELECT user_id, recipe_in_cart_id AS recipe_id '
+        f'FROM {tables()["cart"]}'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {item}')
+        cursor.execute(
+            f'INSERT INTO {item} (user_id, ingredient_id, total, '
+            f'recipes_count) {quantities(cart)}',
+        )
+        return cursor.rowcount
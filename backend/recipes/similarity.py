@@ -0,0 +1,218 @@
+"""Describe computation of similar recipes from ingredients overlap."""
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, Min, Window
+from django.db.models.functions import RowNumber
+from scipy import sparse
+
+from foodgram.settings import (SIMILAR_RECIPES_CHUNK_SIZE,
+                               SIMILAR_RECIPES_METRIC, SIMILAR_RECIPES_TOP_K)
+from recipes.models import IngredientRecipe, SimilarRecipe
+
+JACCARD = 'jaccard'
+COSINE = 'cosine'
+METRICS = (JACCARD, COSINE)
+
+
+class IngredientMatrix:
+    """Describe a sparse recipe x ingredient incidence matrix."""
+
+    def __init__(self, pairs):
+        """Build a matrix from an array of (recipe id, ingredient id) rows."""
+        self.recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        ingredient_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+            shape=(len(self.recipe_ids), len(ingredient_ids)),
+        )
+        self.sizes = np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Load recipe - ingredient chains of an IngredientRecipe queryset."""
+        rows = queryset.order_by().values_list('recipe_id', 'ingredient_id')
+        pairs = np.fromiter(
+            chain.from_iterable(rows.iterator(chunk_size=20000)),
+            dtype=np.int64,
+        )
+        return cls(pairs.reshape(-1, 2))
+
+    def __len__(self):
+        """Return an amount of recipes in a matrix."""
+        return len(self.recipe_ids)
+
+    def positions(self, recipe_ids):
+        """Return matrix rows of recipes which are present in a matrix."""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids)
+        positions = positions[positions < len(self.recipe_ids)]
+        return positions[np.isin(self.recipe_ids[positions], recipe_ids)]
+
+    def scores(self, positions, metric):
+        """Compute similarity of rows with every other recipe in a matrix.
+
+        Return (row, column, score) arrays of pairs with common ingredients,
+        rows are indexes in `positions` and columns are matrix rows.
+        """
+        overlap = (self.matrix[positions] @ self.matrix.T).tocoo()
+        rows, columns = overlap.row, overlap.col
+        common = overlap.data.astype(np.float64)
+        other = columns != positions[rows]
+        rows, columns, common = rows[other], columns[other], common[other]
+
+        own_sizes = self.sizes[positions][rows]
+        other_sizes = self.sizes[columns]
+        if metric == COSINE:
+            scores = common / np.sqrt(own_sizes * other_sizes)
+        else:
+            scores = common / (own_sizes + other_sizes - common)
+        return rows, columns, scores
+
+
+def top_k(rows, columns, scores, k):
+    """Keep k best scored columns for every row with vectorized ranking."""
+    order = np.lexsort((columns, -scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    best = rank < k
+    return rows[best], columns[best], scores[best]
+
+
+def save_neighbours(recipe_ids, recipes, similar, scores):
+    """Replace stored similar recipes of certain recipes."""
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+        SimilarRecipe.objects.bulk_create(
+            [
+                SimilarRecipe(recipe_id=recipe, similar_id=other, score=score)
+                for recipe, other, score in zip(
+                    recipes.tolist(),
+                    similar.tolist(),
+                    scores.tolist(),
+                )
+            ],
+            batch_size=5000,
+        )
+
+
+def trim_neighbours(recipe_ids, k):
+    """Delete similar recipes exceeding top k for certain recipes."""
+    overflow = SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('recipe_id'),
+            order_by=(F('score').desc(), F('similar_id').asc()),
+        ),
+    ).filter(position__gt=k)
+    SimilarRecipe.objects.filter(pk__in=overflow.values('pk')).delete()
+
+
+def rebuild_similar_recipes(
+    k=SIMILAR_RECIPES_TOP_K,
+    metric=SIMILAR_RECIPES_METRIC,
+    chunk_size=SIMILAR_RECIPES_CHUNK_SIZE,
+):
+    """Compute top k similar recipes of every recipe by chunks of rows.
+
+    Yield amounts of processed and all recipes after every chunk.
+    """
+    matrix = IngredientMatrix.from_queryset(IngredientRecipe.objects.all())
+    SimilarRecipe.objects.exclude(
+        recipe_id__in=matrix.recipe_ids.tolist(),
+    ).delete()
+    for start in range(0, len(matrix), chunk_size):
+        positions = np.arange(start, min(start + chunk_size, len(matrix)))
+        rows, columns, scores = top_k(
+            *matrix.scores(positions, metric),
+            k,
+        )
+        save_neighbours(
+            matrix.recipe_ids[positions].tolist(),
+            matrix.recipe_ids[positions[rows]],
+            matrix.recipe_ids[columns],
+            scores,
+        )
+        yield start + len(positions), len(matrix)
+
+
+def pushed_neighbours(changed, others, scores, k):
+    """Return rows of changed recipes which enter top k of other recipes.
+
+    A changed recipe enters a row which has less than k recipes or a
+    stored score it beats. Changed recipes must be deleted from rows of
+    other recipes before, so their own outdated scores do not count.
+    """
+    stored = {
+        row['recipe_id']: (row['lowest'], row['amount'])
+        for row in SimilarRecipe.objects.filter(
+            recipe_id__in=np.unique(others).tolist(),
+        ).values('recipe_id').annotate(
+            lowest=Min('score'),
+            amount=Count('id'),
+        )
+    }
+    return [
+        SimilarRecipe(recipe_id=other, similar_id=recipe, score=score)
+        for recipe, other, score in zip(
+            changed.tolist(),
+            others.tolist(),
+            scores.tolist(),
+        )
+        if other not in stored
+        or stored[other][1] < k
+        or score >= stored[other][0]
+    ]
+
+
+def update_similar_recipes(
+    recipe_ids,
+    k=SIMILAR_RECIPES_TOP_K,
+    metric=SIMILAR_RECIPES_METRIC,
+):
+    """Recompute similar recipes after ingredients of recipes are changed.
+
+    Own rows of changed recipes are computed exactly against recipes which
+    share an ingredient with them. Changed recipes are pushed into rows of
+    those recipes when they beat a stored score, a recipe which loses its
+    place is not replaced until the next full rebuild.
+    """
+    recipe_ids = list(recipe_ids)
+    candidates = IngredientRecipe.objects.filter(
+        ingredient__in=IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).values('ingredient_id'),
+    ).values('recipe_id')
+    matrix = IngredientMatrix.from_queryset(
+        IngredientRecipe.objects.filter(recipe_id__in=candidates),
+    )
+    if not len(matrix):
+        SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+        return
+
+    positions = matrix.positions(recipe_ids)
+    rows, columns, scores = matrix.scores(positions, metric)
+    changed = matrix.recipe_ids[positions[rows]]
+    others = matrix.recipe_ids[columns]
+    reverse = ~np.isin(others, recipe_ids)
+    changed, others, reverse_scores = (
+        changed[reverse],
+        others[reverse],
+        scores[reverse],
+    )
+
+    own_rows, own_columns, own_scores = top_k(rows, columns, scores, k)
+    with transaction.atomic():
+        save_neighbours(
+            recipe_ids,
+            matrix.recipe_ids[positions[own_rows]],
+            matrix.recipe_ids[own_columns],
+            own_scores,
+        )
+        SimilarRecipe.objects.filter(similar_id__in=recipe_ids).exclude(
+            recipe_id__in=recipe_ids,
+        ).delete()
+        pushed = pushed_neighbours(changed, others, reverse_scores, k)
+        SimilarRecipe.objects.bulk_create(pushed, batch_size=5000)
+        trim_neighbours({entry.recipe_id for entry in pushed}, k)
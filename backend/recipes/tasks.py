@@ -0,0 +1,47 @@
+"""Describe background tasks runner of a Recipe app.
+
+Tasks run in threads of a worker process and are not durable, tasks
+queued when gunicorn recycles or loses a worker are dropped. Lost feed
+fan-outs and backfills and lost updates of similar recipes are repaired
+by the rebuild_feeds and build_similar_recipes commands which
+run_periodic.sh runs every PERIODIC_TASKS_INTERVAL seconds. Rankings are
+updated by it every RANKINGS_INTERVAL seconds.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+
+from foodgram.settings import BACKGROUND_TASKS_SYNC, BACKGROUND_TASKS_WORKERS
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=BACKGROUND_TASKS_WORKERS,
+    thread_name_prefix='foodgram-task',
+)
+
+
+def run_task(function, *args):
+    """Run a task and release database connections of a worker thread."""
+    close_old_connections()
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Background task %s failed.', function.__name__)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(function, *args):
+    """Run a function outside of a request after a transaction commits.
+
+    Tasks are executed synchronously when BACKGROUND_TASKS_SYNC is set.
+    """
+    def submit():
+        if BACKGROUND_TASKS_SYNC:
+            function(*args)
+        else:
+            executor.submit(run_task, function, *args)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,7 @@
+#!/bin/bash
+set -e
+python manage.py migrate --noinput;
+python manage.py createcachetable;
+python manage.py collectstatic --noinput;
+python manage.py rebuild_recipe_documents;
+python manage.py rebuild_feeds;
@@ -0,0 +1,12 @@
+#!/bin/bash
+set -e
+repaired_at=-1
+while true; do
+    python manage.py update_rankings;
+    if (( repaired_at < 0 || SECONDS - repaired_at >= ${PERIODIC_TASKS_INTERVAL:-3600} )); then
+        repaired_at=$SECONDS;
+        python manage.py rebuild_feeds;
+        python manage.py build_similar_recipes;
+    fi
+    sleep "${RANKINGS_INTERVAL:-300}";
+done
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.1 on 2026-10-19 02:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    duplicates = (
+        Follow.objects.values('follower', 'following')
+        .annotate(first_id=Min('id'), chains=Count('id'))
+        .filter(chains__gt=1)
+    )
+    for duplicate in duplicates:
+        Follow.objects.filter(
+            follower=duplicate['follower'],
+            following=duplicate['following'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='follow',
+            options={
+                'verbose_name': 'Follow',
+                'verbose_name_plural': 'Follows',
+            },
+        ),
+        migrations.RunPython(
+            delete_duplicate_follows,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(
+                fields=('follower', 'following'),
+                name='unique_follow',
+            ),
+        ),
+    ]
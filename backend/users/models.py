@@ -35,9 +35,14 @@ class Follow(models.Model):
     class Meta:
         """Change a behavior of the Follow model fields."""
 
-        ordering = ('follower',)
         verbose_name = 'Follow'
         verbose_name_plural = 'Follows'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('follower', 'following'),
+                name='unique_follow',
+            ),
+        )
 
     def __str__(self):
         """Show a follow - follower chain."""